@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 from dotenv import load_dotenv
 import dj_database_url
@@ -66,17 +67,30 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Yük atılan (503) istekler de sayılsın diye en başta
+    'production.middleware.MetricsMiddleware',
+    # Yük altında istekleri başka hiçbir iş yapmadan reddetmek için en başta
+    'production.middleware.LoadSheddingMiddleware',
+    'production.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'production.middleware.StickyPrimaryMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise statik dosyaları kendisi sıkıştırır; bu yalnızca uygulama yanıtlarını sıkıştırır
+    'production.middleware.ThresholdGZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Yalnızca admin X-Profile: 1 / ?_profile=1 gönderdiğinde devreye girer
+    'production.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Bu boyutun (byte) altındaki yanıtlar sıkıştırılmaz
+GZIP_MIN_LENGTH = int(os.getenv('GZIP_MIN_LENGTH', '860'))
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -110,6 +124,96 @@ DATABASES = {
         conn_max_age=600,
     )
 }
+# SQLite (yalnızca yerel geliştirme ve loadtest.py --serve; PostgreSQL'e etkisi yok): yazma
+# view'ları transaction içinde önce okuyup sonra yazar. Ertelenmiş (DEFERRED) transaction'da
+# okuma kilidini yazma kilidine yükseltemeyen istek timeout'u beklemeden "database is locked"
+# verir; birden çok gunicorn worker'ıyla yük testinde yazmaların bir kısmı böyle düşüyordu.
+# IMMEDIATE ile yazma kilidi BEGIN'de alınır ve eşzamanlı transaction'lar timeout süresince
+# sırayla bekler. Bedeli: salt okuyan atomic() blokları da yazma kilidini alır.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default'].setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+
+# Okuma replikası (opsiyonel, bkz. production/routers.py). Yerelde denemek için
+# DATABASE_REPLICA_URL aynı SQLite dosyasını gösterebilir.
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.parse(os.getenv('DATABASE_REPLICA_URL'), conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['production.routers.ReplicaRouter']
+# Yazma yapan istemci bu kadar saniye primary'den okur
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '5'))
+
+
+# Cache
+# Worker başına bellek içi önbellek; cached_db oturumları da bunu kullanır
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'line-of-product'),
+    },
+    # İstek sınırlama kovaları her zaman worker'ın kendi belleğinde tutulur
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle',
+    },
+}
+
+# Dashboard / makine listesi gibi paylaşılan API yanıtlarının önbellek süresi (sn), 0 = kapalı
+API_CACHE_TTL = int(os.getenv('API_CACHE_TTL', '10'))
+
+# ?since= ile bundan fazla kart değişmişse tam dashboard döner
+DASHBOARD_DELTA_LIMIT = 200
+
+# İstemciye verilen dashboard sürümü bu süreden (sn) yeni kart değişikliklerini geçmez;
+# geç commit olan küçük id'li değişiklik bir sonraki ?since= isteğinde atlanmasın
+DASHBOARD_SETTLE_SECONDS = int(os.getenv('DASHBOARD_SETTLE_SECONDS', '2'))
+
+
+# Sessions & identity
+# db | cached_db | signed_cookies (signed_cookies: oturum için hiç sorgu yok)
+SESSION_ENGINE = 'django.contrib.sessions.backends.' + os.getenv('SESSION_BACKEND', 'cached_db')
+
+# Oturumdaki kullanıcı worker başına kısa süre önbellekte tutulur (0 = kapalı). Geçersiz kılma sürümü
+# 'default' önbellektedir (bkz. production/auth.py); o önbellek paylaşılmıyorsa başka worker'da
+# yapılan şifre, aktiflik ve is_staff/is_superuser değişiklikleri bu süre kadar geç uygulanır.
+AUTHENTICATION_BACKENDS = ['production.auth.CachedModelBackend']
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '5'))
+AUTH_USER_CACHE_MAX_ENTRIES = 1000
+
+# Makine/takım/malzeme tipi ve kullanıcı adları worker başına önbellekte (bkz. production/refdata.py), 0 = kapalı.
+# Geçersiz kılma sürümü 'default' önbellektedir; o önbellek worker'lar arasında paylaşılmıyorsa
+# (varsayılan LocMem) başka worker'da değişen ad bu süre kadar eski görünür, bu yüzden API_CACHE_TTL kadardır.
+REFDATA_CACHE_TTL = int(os.getenv('REFDATA_CACHE_TTL', str(API_CACHE_TTL)))
+REFDATA_CACHE_MAX_ENTRIES = 5000
+
+# Cihaz anahtarlarının last_seen_at alanı en fazla bu aralıkla (sn) yazılır
+DEVICE_LAST_SEEN_INTERVAL = int(os.getenv('DEVICE_LAST_SEEN_INTERVAL', '60'))
+
+# Tablet operatör PIN'i: kullanıcı başına bu kadar hatalı denemeden sonra PIN bu süre (sn) kabul edilmez
+OPERATOR_PIN_MAX_FAILURES = int(os.getenv('OPERATOR_PIN_MAX_FAILURES', '5'))
+OPERATOR_PIN_LOCKOUT_SECONDS = int(os.getenv('OPERATOR_PIN_LOCKOUT_SECONDS', '900'))
+
+# Değişiklik akışı bu süreden yeni olayları vermez; geç commit olan küçük id'li olaylar atlanmasın.
+# PostgreSQL'de akış ayrıca açık transaction'ların başlangıcında durur (bkz. production/outbox.py)
+OUTBOX_SETTLE_SECONDS = int(os.getenv('OUTBOX_SETTLE_SECONDS', '2'))
+
+# Worker'ı bu süre (sn) heartbeat göndermeyen çalışan iş tekrar kuyruğa alınır (bkz. production/jobs.py)
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', '300'))
+
+# Vardiya takvimi değişince özetleri yeniden hesaplanan gün sayısı (bkz. production/shifts.py)
+SHIFT_REBUILD_DAYS = int(os.getenv('SHIFT_REBUILD_DAYS', '31'))
+
+# Silinen makine/takım tipinin geçmişi arka planda bu kadar satırlık parçalarla silinir (bkz. production/purge.py)
+PURGE_CHUNK_SIZE = int(os.getenv('PURGE_CHUNK_SIZE', '1000'))
+
+# Saklanan en fazla istek profili (bkz. production/profiling.py)
+PROFILE_MAX_ENTRIES = int(os.getenv('PROFILE_MAX_ENTRIES', '50'))
+
+# /api/metrics/ için Bearer token (Prometheus); boşsa yalnızca admin oturumu okuyabilir
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Bu süreyi (ms) aşan sorgular SlowQuery'ye yazılır (0 = kapalı); en pahalı SLOW_QUERY_MAX_ENTRIES şekil tutulur
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', '300'))
+SLOW_QUERY_MAX_ENTRIES = int(os.getenv('SLOW_QUERY_MAX_ENTRIES', '100'))
 
 
 # Password validation
@@ -156,6 +260,44 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Django REST framework
+# JSON orjson ile üretilir; msgpack kuruluysa `Accept: application/msgpack` da desteklenir
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'production.renderers.ORJSONRenderer',
+        *(['production.renderers.MessagePackRenderer'] if importlib.util.find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Tabletler cihaz anahtarıyla gelir (bkz. production/devices.py)
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'production.devices.DeviceTokenAuthentication',
+    ],
+    # Token bucket oranları (bkz. production/throttling.py); boş değer = sınırsız
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.getenv('THROTTLE_LOGIN_RATE', '10/min') or None,
+        'login_user': os.getenv('THROTTLE_LOGIN_USER_RATE', '5/min') or None,
+        'write': os.getenv('THROTTLE_WRITE_RATE', '120/min') or None,
+        'device_switch': os.getenv('THROTTLE_DEVICE_SWITCH_RATE', '10/min') or None,
+    },
+    # İstemci IP'si (IP başına throttle) X-Forwarded-For'un sondan bu kadarıncı adresinden
+    # okunur; Railway önünde tek proxy vardır. Ayarlanmazsa istemcinin gönderdiği başlığa güvenilir.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
+}
+THROTTLE_CACHE = 'throttle'
+
+# Yük atma (bkz. production/middleware.py): worker'da bu kadar istek işlenirken
+# ya da proxy'nin X-Request-Start başlığına göre istek bu kadar ms kuyrukta
+# beklemişse 503 + Retry-After döner. İkisi de 0 ise (varsayılan) middleware
+# yüklenmez. Sayaç worker başınadır ve gunicorn worker'ı aynı anda en fazla
+# WEB_THREADS istek işler (bkz. start.sh): sınır ancak thread sayısından küçükse
+# devreye girer. Kuyruk süresi, başlığı gönderen bir proxy gerektirir.
+WEB_THREADS = int(os.getenv('WEB_THREADS', '2'))
+LOAD_SHED_MAX_IN_FLIGHT = int(os.getenv('LOAD_SHED_MAX_IN_FLIGHT', '0'))
+LOAD_SHED_MAX_QUEUE_MS = int(os.getenv('LOAD_SHED_MAX_QUEUE_MS', '0'))
+LOAD_SHED_RETRY_AFTER = int(os.getenv('LOAD_SHED_RETRY_AFTER', '5'))
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [o.strip() for o in os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if o.strip()]
 if not CORS_ALLOWED_ORIGINS and DEBUG:
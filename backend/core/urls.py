@@ -18,17 +18,17 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
 from django.views.decorators.csrf import ensure_csrf_cookie
-from production.views import machine_detail
+from production.pages import BootstrapTemplateView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('production.urls')),
     # Public routes
     path('login/', ensure_csrf_cookie(TemplateView.as_view(template_name='login.html')), name='login-page'),
-    # Ensure CSRF cookie is set for frontend POSTs (serves backend/templates/index.html)
-    path('', ensure_csrf_cookie(TemplateView.as_view(template_name='index.html'))),
-    path('sessions/', ensure_csrf_cookie(TemplateView.as_view(template_name='sessions.html')), name='sessions-page'),
-    path('machine/<int:machine_id>/', ensure_csrf_cookie(TemplateView.as_view(template_name='machine_detail.html')), name='machine-detail-page'),
-    path('material/<int:material_id>/', ensure_csrf_cookie(TemplateView.as_view(template_name='material_detail.html')), name='material-detail-page'),
-    path('personnel/', ensure_csrf_cookie(TemplateView.as_view(template_name='personnel.html')), name='personnel-page'),
+    # Ensure CSRF cookie is set for frontend POSTs; pages embed their initial API data (production/pages.py)
+    path('', ensure_csrf_cookie(BootstrapTemplateView.as_view(template_name='index.html', sections=('dashboard', 'machines')))),
+    path('sessions/', ensure_csrf_cookie(BootstrapTemplateView.as_view(template_name='sessions.html', sections=('activity_logs',))), name='sessions-page'),
+    path('machine/<int:machine_id>/', ensure_csrf_cookie(BootstrapTemplateView.as_view(template_name='machine_detail.html', sections=('machine_detail',))), name='machine-detail-page'),
+    path('material/<int:material_id>/', ensure_csrf_cookie(BootstrapTemplateView.as_view(template_name='material_detail.html', sections=('material_detail',))), name='material-detail-page'),
+    path('personnel/', ensure_csrf_cookie(BootstrapTemplateView.as_view(template_name='personnel.html', sections=('personnel_users', 'absences', 'advances', 'payroll_summary'))), name='personnel-page'),
 ]
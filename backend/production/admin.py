@@ -1,10 +1,33 @@
-from django.contrib import admin
+from django.conf import settings
+from django.contrib import admin, messages
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from django.utils.html import format_html
-from .models import Machine, ToolType, ToolChangeBatch, ToolChangeBatchItem, DailyProduction, WorkSession, ActivityLog, MaterialType, MaterialEntry, MaterialShipment
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .auth import invalidate_cached_users
+from .caching import bump_version
+from .devices import issue_key, set_operator_pin
+from .jobs import enqueue
+from .outbox import record_many
+from .purge import mark_machine_deleted, mark_tool_type_deleted
+from .routers import ReplicaChangelistMixin, read_replica
+from .stock import evaluate_on_commit as evaluate_stock_on_commit
+from .models import Machine, ToolType, ToolChangeBatch, ToolChangeBatchItem, DailyProduction, WorkSession, ActivityLog, MaterialType, MaterialEntry, MaterialShipment, DeviceToken, OperatorPin, Plant, Line, Job, RequestProfile, SlowQuery, Shift, StockAlert, ShipmentAllocation
+
+
+def update_with_outbox(queryset, **values):
+    """queryset.update() sends no post_save; write the outbox events in the same transaction."""
+    with transaction.atomic():
+        ids = list(queryset.values_list("pk", flat=True))
+        updated = queryset.model.objects.filter(pk__in=ids).update(**values)
+        record_many(queryset.model.objects.filter(pk__in=ids), "updated")
+    return updated
 
 
 # Admin Site Customization
@@ -13,65 +36,105 @@ admin.site.site_title = "AYD Robotic Admin"
 admin.site.index_title = "Üretim Yönetim Sistemi"
 
 
+class LineInline(admin.TabularInline):
+    model = Line
+    extra = 0
+    fields = ("name", "code", "order_in_plant", "is_active")
+
+
+@admin.register(Plant)
+class PlantAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "code", "is_active")
+    list_display_links = ("id", "name")
+    list_filter = ("is_active",)
+    search_fields = ("name", "code")
+    inlines = [LineInline]
+
+
+@admin.register(Line)
+class LineAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "code", "plant", "order_in_plant", "is_active")
+    list_display_links = ("id", "name")
+    list_filter = ("plant", "is_active")
+    list_editable = ("order_in_plant",)
+    search_fields = ("name", "code", "plant__name")
+    ordering = ("plant__code", "order_in_plant")
+
+
 @admin.register(Machine)
 class MachineAdmin(admin.ModelAdmin):
-    list_display = ("id", "short_name", "name", "location", "order_in_line", "active_status")
+    list_display = ("id", "short_name", "name", "line", "location", "order_in_line", "active_status")
     list_display_links = ("id", "short_name", "name")
-    list_filter = ("is_active",)
+    list_filter = ("line", "is_active", ("deleted_at", admin.EmptyFieldListFilter))
     list_editable = ("order_in_line",)
     search_fields = ("name", "short_name", "location")
-    ordering = ("order_in_line",)
-    readonly_fields = ("id",)
+    list_select_related = ("line__plant",)
+    ordering = ("line__plant__code", "line__order_in_plant", "order_in_line")
+    readonly_fields = ("id", "deleted_at")
     
     fieldsets = (
         ("Temel Bilgiler", {
             "fields": ("id", "name", "short_name")
         }),
         ("Konum ve Sıralama", {
-            "fields": ("location", "order_in_line")
+            "fields": ("line", "location", "order_in_line")
         }),
         ("Durum", {
-            "fields": ("is_active",)
+            "fields": ("is_active", "deleted_at")
         }),
     )
     
-    actions = ["activate_machines", "deactivate_machines"]
+    actions = ["activate_machines", "deactivate_machines", "purge_machines"]
     
     def active_status(self, obj):
+        if obj.deleted_at:
+            return format_html('<span style="color: gray;">Siliniyor</span>')
         if obj.is_active:
             return format_html('<span style="color: green;">✓ Aktif</span>')
         return format_html('<span style="color: red;">✗ Pasif</span>')
     active_status.short_description = "Durum"
     
     def activate_machines(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = update_with_outbox(queryset.filter(deleted_at__isnull=True), is_active=True)
+        bump_version("dashboard", "machines")
         self.message_user(request, f"{updated} makine aktif edildi.")
     activate_machines.short_description = "Seçili makineleri aktif et"
     
     def deactivate_machines(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = update_with_outbox(queryset, is_active=False)
+        bump_version("dashboard", "machines")
         self.message_user(request, f"{updated} makine pasif edildi.")
     deactivate_machines.short_description = "Seçili makineleri pasif et"
+    
+    def purge_machines(self, request, queryset):
+        # Geçmişi çok olan makinede .delete() istek içinde zaman aşımına uğrar (bkz. purge.py)
+        machines = list(queryset.filter(deleted_at__isnull=True))
+        with transaction.atomic():
+            for machine in machines:
+                mark_machine_deleted(machine)
+                enqueue("purge_machine", {"machine_id": machine.id}, user=request.user)
+        self.message_user(request, f"{len(machines)} makine silinmek üzere kuyruğa alındı (Jobs bölümünden izlenebilir).")
+    purge_machines.short_description = "Seçili makineleri arka planda sil"
 
 
 @admin.register(ToolType)
 class ToolTypeAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "machine", "active_status")
     list_display_links = ("id", "name")
-    list_filter = ("is_active", "machine")
+    list_filter = ("is_active", ("deleted_at", admin.EmptyFieldListFilter), "machine")
     search_fields = ("name", "machine__name", "machine__short_name")
-    readonly_fields = ("id",)
+    readonly_fields = ("id", "deleted_at")
     
     fieldsets = (
         ("Temel Bilgiler", {
             "fields": ("id", "machine", "name")
         }),
         ("Durum", {
-            "fields": ("is_active",)
+            "fields": ("is_active", "deleted_at")
         }),
     )
     
-    actions = ["activate_tools", "deactivate_tools"]
+    actions = ["activate_tools", "deactivate_tools", "purge_tools"]
     
     # Enable autocomplete for inline forms
     def get_search_results(self, request, queryset, search_term):
@@ -81,20 +144,33 @@ class ToolTypeAdmin(admin.ModelAdmin):
         return queryset, use_distinct
     
     def active_status(self, obj):
+        if obj.deleted_at:
+            return format_html('<span style="color: gray;">Siliniyor</span>')
         if obj.is_active:
             return format_html('<span style="color: green;">✓ Aktif</span>')
         return format_html('<span style="color: red;">✗ Pasif</span>')
     active_status.short_description = "Durum"
     
     def activate_tools(self, request, queryset):
-        updated = queryset.update(is_active=True)
+        updated = update_with_outbox(queryset.filter(deleted_at__isnull=True), is_active=True)
+        bump_version("dashboard", "machines")
         self.message_user(request, f"{updated} takım tipi aktif edildi.")
     activate_tools.short_description = "Seçili takım tiplerini aktif et"
     
     def deactivate_tools(self, request, queryset):
-        updated = queryset.update(is_active=False)
+        updated = update_with_outbox(queryset, is_active=False)
+        bump_version("dashboard", "machines")
         self.message_user(request, f"{updated} takım tipi pasif edildi.")
     deactivate_tools.short_description = "Seçili takım tiplerini pasif et"
+    
+    def purge_tools(self, request, queryset):
+        tool_types = list(queryset.filter(deleted_at__isnull=True))
+        with transaction.atomic():
+            for tool_type in tool_types:
+                mark_tool_type_deleted(tool_type)
+                enqueue("purge_tool_type", {"tool_type_id": tool_type.id}, user=request.user)
+        self.message_user(request, f"{len(tool_types)} takım tipi silinmek üzere kuyruğa alındı (Jobs bölümünden izlenebilir).")
+    purge_tools.short_description = "Seçili takım tiplerini arka planda sil"
 
 
 class ToolChangeBatchItemInline(admin.TabularInline):
@@ -105,7 +181,7 @@ class ToolChangeBatchItemInline(admin.TabularInline):
 
 
 @admin.register(ToolChangeBatch)
-class ToolChangeBatchAdmin(admin.ModelAdmin):
+class ToolChangeBatchAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "machine", "changed_by", "timestamp", "current_counter", "tools_changed")
     list_display_links = ("id", "machine")
     list_filter = ("machine", "changed_by", "timestamp")
@@ -133,7 +209,7 @@ class ToolChangeBatchAdmin(admin.ModelAdmin):
 
 
 @admin.register(DailyProduction)
-class DailyProductionAdmin(admin.ModelAdmin):
+class DailyProductionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "machine", "date", "total_count", "recorded_by", "created_at")
     list_display_links = ("id", "machine")
     list_filter = ("machine", "date", "recorded_by")
@@ -165,22 +241,23 @@ class DailyProductionAdmin(admin.ModelAdmin):
         writer = csv.writer(response)
         writer.writerow(['ID', 'Makine', 'Tarih', 'Toplam Sayım', 'Kaydeden', 'Kayıt Zamanı'])
         
-        for obj in queryset:
-            writer.writerow([
-                obj.id,
-                obj.machine.name,
-                obj.date,
-                obj.total_count,
-                obj.recorded_by.username if obj.recorded_by else '-',
-                obj.created_at
-            ])
+        with read_replica(request):
+            for obj in queryset:
+                writer.writerow([
+                    obj.id,
+                    obj.machine.name,
+                    obj.date,
+                    obj.total_count,
+                    obj.recorded_by.username if obj.recorded_by else '-',
+                    obj.created_at
+                ])
         
         return response
     export_to_csv.short_description = "CSV olarak dışa aktar"
 
 
 @admin.register(WorkSession)
-class WorkSessionAdmin(admin.ModelAdmin):
+class WorkSessionAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "user", "machine", "start_time", "end_time", "duration", "produced_count")
     list_display_links = ("id", "user")
     list_filter = ("machine", "user", "start_time")
@@ -210,7 +287,7 @@ class WorkSessionAdmin(admin.ModelAdmin):
 
 
 @admin.register(ActivityLog)
-class ActivityLogAdmin(admin.ModelAdmin):
+class ActivityLogAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("id", "user", "action_display", "machine", "created_at", "details_short")
     list_display_links = ("id", "user")
     list_filter = ("action", "machine", "user", "created_at")
@@ -260,18 +337,18 @@ class ActivityLogAdmin(admin.ModelAdmin):
 
 @admin.register(MaterialType)
 class MaterialTypeAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "code", "active_status", "stock_summary")
+    list_display = ("id", "name", "code", "line", "active_status", "stock_summary", "reorder_level")
     list_display_links = ("id", "name")
-    list_filter = ("is_active",)
+    list_filter = ("line", "is_active")
     search_fields = ("name", "code")
     readonly_fields = ("id", "stock_info")
     
     fieldsets = (
         ("Temel Bilgiler", {
-            "fields": ("id", "name", "code")
+            "fields": ("id", "name", "code", "line")
         }),
         ("Durum", {
-            "fields": ("is_active",)
+            "fields": ("is_active", "reorder_level")
         }),
         ("Stok Bilgisi", {
             "fields": ("stock_info",),
@@ -316,31 +393,45 @@ class MaterialTypeAdmin(admin.ModelAdmin):
     stock_info.short_description = "Stok Detayları"
     
     def activate_materials(self, request, queryset):
+        material_ids = list(queryset.values_list("id", flat=True))
         updated = queryset.update(is_active=True)
+        bump_version("dashboard")
+        # update() sinyal göndermez; pasif malzemenin uyarısı olmaz
+        evaluate_stock_on_commit(*material_ids)
         self.message_user(request, f"{updated} malzeme tipi aktif edildi.")
     activate_materials.short_description = "Seçili malzeme tiplerini aktif et"
     
     def deactivate_materials(self, request, queryset):
+        material_ids = list(queryset.values_list("id", flat=True))
         updated = queryset.update(is_active=False)
+        bump_version("dashboard")
+        evaluate_stock_on_commit(*material_ids)
         self.message_user(request, f"{updated} malzeme tipi pasif edildi.")
     deactivate_materials.short_description = "Seçili malzeme tiplerini pasif et"
 
 
+class LotMaterialReadonlyMixin:
+    # Çıkış dağıtımları (bkz. lots.py) malzemeye bağlı; kayıttan sonra malzeme değiştirilemez
+    def get_readonly_fields(self, request, obj=None):
+        readonly = super().get_readonly_fields(request, obj)
+        return (*readonly, "material_type") if obj is not None else readonly
+
+
 @admin.register(MaterialEntry)
-class MaterialEntryAdmin(admin.ModelAdmin):
-    list_display = ("id", "material_type", "boxes_count", "units_per_box", "total_units", "created_by", "created_at")
+class MaterialEntryAdmin(LotMaterialReadonlyMixin, ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "material_type", "boxes_count", "units_per_box", "total_units", "remaining_units", "created_by", "created_at")
     list_display_links = ("id", "material_type")
     list_filter = ("material_type", "created_by", "created_at")
     search_fields = ("material_type__name", "created_by__username")
     date_hierarchy = "created_at"
-    readonly_fields = ("id", "created_at", "total_units")
+    readonly_fields = ("id", "created_at", "total_units", "remaining_units")
     
     fieldsets = (
         ("Malzeme Bilgisi", {
             "fields": ("id", "material_type")
         }),
         ("Miktar", {
-            "fields": ("boxes_count", "units_per_box", "total_units")
+            "fields": ("boxes_count", "units_per_box", "total_units", "remaining_units")
         }),
         ("Kayıt Bilgisi", {
             "fields": ("created_by", "created_at")
@@ -355,18 +446,31 @@ class MaterialEntryAdmin(admin.ModelAdmin):
     total_units.short_description = "Toplam Adet"
 
 
+class ShipmentAllocationInline(admin.TabularInline):
+    model = ShipmentAllocation
+    fields = ("lot", "units")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    verbose_name_plural = "Lot dağıtımı (FIFO)"
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(MaterialShipment)
-class MaterialShipmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "material_type", "boxes_count", "note_short", "created_by", "created_at")
+class MaterialShipmentAdmin(LotMaterialReadonlyMixin, ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "material_type", "boxes_count", "note_short", "unallocated_units", "created_by", "created_at")
     list_display_links = ("id", "material_type")
     list_filter = ("material_type", "created_by", "created_at")
     search_fields = ("material_type__name", "created_by__username", "note")
     date_hierarchy = "created_at"
-    readonly_fields = ("id", "created_at")
+    readonly_fields = ("id", "created_at", "unallocated_units")
+    inlines = [ShipmentAllocationInline]
     
     fieldsets = (
         ("Sevkiyat Bilgisi", {
-            "fields": ("id", "material_type", "boxes_count")
+            "fields": ("id", "material_type", "boxes_count", "unallocated_units")
         }),
         ("Notlar", {
             "fields": ("note",)
@@ -383,7 +487,266 @@ class MaterialShipmentAdmin(admin.ModelAdmin):
     note_short.short_description = "Not"
 
 
+@admin.register(StockAlert)
+class StockAlertAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("id", "material_type", "stock_units", "reorder_level", "opened_at", "resolved_at")
+    list_display_links = ("id", "material_type")
+    list_filter = (("resolved_at", admin.EmptyFieldListFilter), "material_type")
+    date_hierarchy = "opened_at"
+    list_select_related = ("material_type",)
+    readonly_fields = ("material_type", "stock_units", "reorder_level", "opened_at", "resolved_at")
+
+    # Uyarılar stok hareketlerinden açılıp kapanır (bkz. stock.py)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 # Custom user admin with simple role selector (admin/user)
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ("name", "key_prefix", "line", "current_user", "last_seen_at", "token_status", "created_at")
+    list_filter = ("revoked_at",)
+    search_fields = ("name", "key_prefix")
+    readonly_fields = ("key_prefix", "current_user", "created_by", "created_at", "last_seen_at", "revoked_at")
+    exclude = ("key_hash",)
+    actions = ["revoke_tokens"]
+
+    def token_status(self, obj):
+        if obj.revoked_at:
+            return format_html('<span style="color: red;">✗ İptal</span>')
+        return format_html('<span style="color: green;">✓ Geçerli</span>')
+    token_status.short_description = "Durum"
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        key = issue_key(obj)
+        obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        self.message_user(
+            request,
+            f"Cihaz anahtarı: {key} — yalnızca şimdi gösterilir, tablete girin.",
+            level=messages.WARNING,
+        )
+
+    def revoke_tokens(self, request, queryset):
+        updated = queryset.filter(revoked_at__isnull=True).update(revoked_at=timezone.now(), current_user=None)
+        self.message_user(request, f"{updated} cihaz anahtarı iptal edildi.")
+    revoke_tokens.short_description = "Seçili cihaz anahtarlarını iptal et"
+
+
+class OperatorPinForm(forms.ModelForm):
+    # Yeni PIN'ler en az 6 hane; eski 4-5 haneli PIN'ler kilitlenme sınırıyla geçerli kalır
+    pin = forms.RegexField(regex=r"^\d{6,12}$", label="PIN", widget=forms.PasswordInput, help_text="6-12 haneli sayı")
+
+    class Meta:
+        model = OperatorPin
+        fields = ("user",)
+
+
+@admin.register(OperatorPin)
+class OperatorPinAdmin(admin.ModelAdmin):
+    form = OperatorPinForm
+    list_display = ("user", "updated_at", "failed_attempts", "locked_until")
+    search_fields = ("user__username", "user__first_name", "user__last_name")
+    autocomplete_fields = ("user",)
+
+    def save_model(self, request, obj, form, change):
+        set_operator_pin(obj.user, form.cleaned_data["pin"])
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "job_status", "progress", "message", "attempts", "created_by", "created_at", "finished_at")
+    list_display_links = ("id", "kind")
+    list_filter = ("status", "kind")
+    search_fields = ("kind", "message")
+    readonly_fields = (
+        "kind", "params", "status", "progress", "message", "result", "error", "attempts", "max_attempts",
+        "run_after", "locked_by", "heartbeat_at", "created_by", "created_at", "started_at", "finished_at",
+    )
+    actions = ["retry_jobs", "cancel_jobs"]
+
+    STATUS_COLORS = {"queued": "gray", "running": "blue", "succeeded": "green", "failed": "red", "cancelled": "orange"}
+
+    # İşler API'den ya da kod içinden (jobs.enqueue) eklenir
+    def has_add_permission(self, request):
+        return False
+
+    def job_status(self, obj):
+        return format_html('<span style="color: {};">{}</span>', self.STATUS_COLORS[obj.status], obj.get_status_display())
+    job_status.short_description = "Durum"
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status__in=("failed", "cancelled")).update(
+            status="queued", attempts=0, run_after=timezone.now(), locked_by="", error="", finished_at=None
+        )
+        self.message_user(request, f"{updated} iş tekrar kuyruğa alındı.")
+    retry_jobs.short_description = "Seçili işleri tekrar çalıştır"
+
+    def cancel_jobs(self, request, queryset):
+        # Çalışan iş bir sonraki ctx.progress() çağrısında durur
+        updated = queryset.filter(status__in=("queued", "running")).update(status="cancelled", finished_at=timezone.now())
+        self.message_user(request, f"{updated} iş iptal edildi.")
+    cancel_jobs.short_description = "Seçili işleri iptal et"
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ("id", "method", "path", "status_code", "duration_ms_display", "query_count", "sql_ms_display", "user", "created_at")
+    list_display_links = ("id", "path")
+    list_filter = ("method", "status_code")
+    search_fields = ("path",)
+    fields = (
+        "method", "path", "user", "status_code", "duration_ms", "query_count", "sql_ms", "created_at",
+        "download", "summary_display", "sql_timeline",
+    )
+    readonly_fields = fields
+
+    # Profiller ProfilingMiddleware tarafından kaydedilir
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path("<int:profile_id>/download/", self.admin_site.admin_view(self.download_view), name="production_requestprofile_download"),
+        ] + super().get_urls()
+
+    def download_view(self, request, profile_id):
+        profile = get_object_or_404(RequestProfile, pk=profile_id)
+        response = HttpResponse(bytes(profile.stats), content_type="application/octet-stream")
+        response["Content-Disposition"] = f'attachment; filename="request-{profile.pk}.prof"'
+        return response
+
+    def duration_ms_display(self, obj):
+        return f"{obj.duration_ms:.1f} ms"
+    duration_ms_display.short_description = "Süre"
+
+    def sql_ms_display(self, obj):
+        return f"{obj.sql_ms:.1f} ms"
+    sql_ms_display.short_description = "SQL süresi"
+
+    def download(self, obj):
+        url = reverse("admin:production_requestprofile_download", args=[obj.pk])
+        return format_html('<a href="{}">request-{}.prof</a> (snakeviz ya da python -m pstats ile açın)', url, obj.pk)
+    download.short_description = "Profil dosyası"
+
+    def summary_display(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.summary)
+    summary_display.short_description = "Fonksiyonlar (kümülatif)"
+
+    def sql_timeline(self, obj):
+        rows = format_html_join(
+            "", "<tr><td>{}</td><td>{}</td><td>{}</td><td><code>{}</code></td></tr>",
+            ((f"{start:.1f}", f"{duration:.2f}", alias, sql) for start, duration, alias, sql in obj.sql),
+        )
+        return format_html(
+            "<table><thead><tr><th>Başlangıç (ms)</th><th>Süre (ms)</th><th>DB</th><th>SQL</th></tr></thead>"
+            "<tbody>{}</tbody></table>",
+            rows,
+        )
+    sql_timeline.short_description = "SQL zaman çizelgesi"
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ("fingerprint_short", "view", "db", "calls", "avg_ms", "max_ms_display", "total_ms_display", "last_seen", "has_plan")
+    list_display_links = ("fingerprint_short",)
+    list_filter = ("db", "view")
+    search_fields = ("sql", "view")
+    fields = (
+        "fingerprint", "db", "view", "calls", "total_ms", "max_ms", "first_seen", "last_seen",
+        "sql_display", "example_display", "plan_display", "plan_captured_at",
+    )
+    readonly_fields = fields
+    actions = ["capture_plans"]
+
+    # Kayıtlar SlowQueryMiddleware tarafından yazılır
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def fingerprint_short(self, obj):
+        return obj.fingerprint[:12]
+    fingerprint_short.short_description = "Fingerprint"
+
+    def avg_ms(self, obj):
+        return f"{obj.total_ms / obj.calls:.1f} ms" if obj.calls else "-"
+    avg_ms.short_description = "Ortalama"
+
+    def max_ms_display(self, obj):
+        return f"{obj.max_ms:.1f} ms"
+    max_ms_display.short_description = "En uzun"
+    max_ms_display.admin_order_field = "max_ms"
+
+    def total_ms_display(self, obj):
+        return f"{obj.total_ms:.0f} ms"
+    total_ms_display.short_description = "Toplam"
+    total_ms_display.admin_order_field = "total_ms"
+
+    def has_plan(self, obj):
+        return obj.plan_captured_at is not None
+    has_plan.boolean = True
+    has_plan.short_description = "Plan"
+
+    def sql_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.sql)
+    sql_display.short_description = "SQL"
+
+    def example_display(self, obj):
+        return format_html('<pre style="white-space: pre-wrap;">{}</pre>', obj.example)
+    example_display.short_description = "Örnek"
+
+    def plan_display(self, obj):
+        return format_html('<pre style="white-space: pre; overflow-x: auto;">{}</pre>', obj.plan or "-")
+    plan_display.short_description = "EXPLAIN"
+
+    def capture_plans(self, request, queryset):
+        ids = list(queryset.values_list("id", flat=True))
+        for query_id in ids:
+            enqueue("capture_query_plan", {"query_id": query_id}, user=request.user)
+        self.message_user(request, f"{len(ids)} sorgu için plan alma işi kuyruğa eklendi.")
+    capture_plans.short_description = "Seçili sorguların planını yeniden al"
+
+
+@admin.register(Shift)
+class ShiftAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "start_time", "end_time", "is_active")
+    list_display_links = ("id", "name")
+    list_filter = ("is_active",)
+    actions = ["rebuild_rollups"]
+
+    # Takvim değişince geçmiş vardiya özetleri arka planda yeniden hesaplanır (bkz. shifts.rebuild)
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._enqueue_rebuild(request)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self._enqueue_rebuild(request)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        self._enqueue_rebuild(request)
+
+    def _enqueue_rebuild(self, request):
+        # Diğer worker'lar eski takvimi önbellekten en fazla API_CACHE_TTL sn kullanır
+        enqueue("rebuild_shift_rollups", {}, user=request.user, delay=getattr(settings, "API_CACHE_TTL", 10))
+        self.message_user(request, "Vardiya özetlerini yeniden hesaplama işi kuyruğa eklendi.")
+
+    def rebuild_rollups(self, request, queryset):
+        self._enqueue_rebuild(request)
+    rebuild_rollups.short_description = "Vardiya özetlerini yeniden hesapla"
+
+
 class CustomUserCreationForm(UserCreationForm):
     ROLE_CHOICES = (("user", "Kullanıcı"), ("admin", "Admin"))
     role = forms.ChoiceField(choices=ROLE_CHOICES, initial="user")
@@ -473,22 +836,30 @@ class CustomUserAdmin(BaseUserAdmin):
     user_role.short_description = "Rol"
     
     def make_admin(self, request, queryset):
+        user_ids = list(queryset.values_list("pk", flat=True))
         updated = queryset.update(is_staff=True, is_superuser=True)
+        invalidate_cached_users(user_ids)
         self.message_user(request, f"{updated} kullanıcı admin yapıldı.")
     make_admin.short_description = "Seçili kullanıcıları admin yap"
     
     def make_user(self, request, queryset):
+        user_ids = list(queryset.values_list("pk", flat=True))
         updated = queryset.update(is_staff=False, is_superuser=False)
+        invalidate_cached_users(user_ids)
         self.message_user(request, f"{updated} kullanıcı normal kullanıcı yapıldı.")
     make_user.short_description = "Seçili kullanıcıları normal kullanıcı yap"
     
     def activate_users(self, request, queryset):
+        user_ids = list(queryset.values_list("pk", flat=True))
         updated = queryset.update(is_active=True)
+        invalidate_cached_users(user_ids)
         self.message_user(request, f"{updated} kullanıcı aktif edildi.")
     activate_users.short_description = "Seçili kullanıcıları aktif et"
     
     def deactivate_users(self, request, queryset):
+        user_ids = list(queryset.values_list("pk", flat=True))
         updated = queryset.update(is_active=False)
+        invalidate_cached_users(user_ids)
         self.message_user(request, f"{updated} kullanıcı pasif edildi.")
     deactivate_users.short_description = "Seçili kullanıcıları pasif et"
 
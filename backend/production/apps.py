@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'production'
+
+    def ready(self):
+        # Sinyal alıcılarını kaydet (kullanıcı ve API önbelleği geçersizleştirme)
+        from . import auth, signals  # noqa: F401
@@ -0,0 +1,108 @@
+"""
+Kimlik çözümleme yardımcıları.
+
+Her API isteğinde AuthenticationMiddleware oturumdaki kullanıcıyı
+veritabanından tekrar yükler. CachedModelBackend bu yüklemeyi worker
+başına kısa ömürlü (AUTH_USER_CACHE_TTL saniye) bir önbellekten yapar.
+
+Her kayıt caching.py'deki "auth.user.<id>" sürümüyle birlikte tutulur;
+kullanıcı kaydedildiğinde/silindiğinde, admin toplu işlemlerinde ve çıkışta
+sürüm artırılır ve kayıt bir sonraki istekte veritabanından tekrar okunur.
+Sürüm 'default' önbellekte tutulur: CACHE_BACKEND paylaşılan bir önbellekse
+(Redis, Memcached) değişiklik tüm worker'lara hemen yansır. Varsayılan
+LocMem önbelleği worker'lar arasında paylaşılmaz; diğer worker'larda kayıt
+en fazla TTL kadar eski kalabilir.
+
+Bu durumda diğer worker'larda: şifresi değişen kullanıcının eski
+oturumları açık kalır (oturum özeti önbellekteki eski şifreden hesaplanır),
+pasif yapılan kullanıcı istek atmaya devam eder ve kaldırılan
+is_staff/is_superuser yetkisi geçerli sayılır. Bu yüzden TTL birkaç
+saniyedir. Grup/izin verisi önbelleğe girmez; has_perm() her örnekte
+veritabanından okunur.
+"""
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_version, get_version
+
+_lock = threading.Lock()
+_users = {}  # user_id -> (expires_at, version, User)
+
+
+def _ttl():
+    return getattr(settings, "AUTH_USER_CACHE_TTL", 5)
+
+
+def _max_entries():
+    return getattr(settings, "AUTH_USER_CACHE_MAX_ENTRIES", 1000)
+
+
+def version_name(user_id):
+    return f"auth.user.{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    invalidate_cached_users([user_id])
+
+
+def invalidate_cached_users(user_ids):
+    """Drop the cached users here and, through their versions, on every worker sharing the cache."""
+    user_ids = list(user_ids)
+    bump_version(*(version_name(pk) for pk in user_ids))
+    with _lock:
+        for pk in user_ids:
+            _users.pop(pk, None)
+
+
+def clear_user_cache():
+    with _lock:
+        _users.clear()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend with a per-worker, short-TTL cache in front of get_user()."""
+
+    def get_user(self, user_id):
+        ttl = _ttl()
+        if ttl <= 0:
+            return super().get_user(user_id)
+
+        # Sürüm yüklemeden önce okunur: yükleme sırasında yapılan değişiklik bir sonraki istekte görülür
+        version = get_version(version_name(user_id))
+        now = time.monotonic()
+        with _lock:
+            hit = _users.get(user_id)
+        if hit and hit[0] > now and hit[1] == version:
+            # İstekler aynı örneği paylaşmasın (ör. login sırasında last_login güncellenir)
+            return copy.copy(hit[2])
+
+        user = super().get_user(user_id)
+        if user is None:
+            return None
+        for attr in ("_perm_cache", "_user_perm_cache", "_group_perm_cache"):
+            user.__dict__.pop(attr, None)
+        with _lock:
+            if len(_users) >= _max_entries():
+                _users.clear()
+            _users[user_id] = (now + ttl, version, user)
+        return copy.copy(user)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _drop_cached_user_on_change(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def _drop_cached_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        invalidate_cached_user(user.pk)
@@ -0,0 +1,637 @@
+"""
+API yanıt gövdelerini üreten fonksiyonlar.
+
+Hem API view'ları hem de sayfa bootstrap'i (pages.py) aynı fonksiyonları
+kullanır; böylece sayfaya gömülen ilk veri ile API yanıtı birebir aynıdır.
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum
+from django.utils import timezone
+
+from django.conf import settings
+
+from . import refdata, search
+from .caching import cached
+from .changes import card_versions, changes_since
+from .fast_serializers import ValuesSerializer
+from .history import history_page
+from .lots import open_lots
+from .models import (
+    Plant,
+    Line,
+    Machine,
+    ToolType,
+    ToolChangeBatch,
+    DailyProduction,
+    WorkSession,
+    ActivityLog,
+    MaterialType,
+    MaterialEntry,
+    MaterialShipment,
+    Absence,
+    Advance,
+    Shift,
+    StockAlert,
+    ShiftRollup,
+    ShiftOperatorRollup,
+)
+from .payroll import add_months, month_start, payroll_summary
+from .shifts import current_shift
+from .stock import open_alerts
+from .serializers import (
+    MachineSerializer,
+    MachineWithToolTypesSerializer,
+    ToolTypeSerializer,
+    ActivityLogSerializer,
+    ShiftSerializer,
+    ShiftSummaryQuerySerializer,
+    MaterialTypeSerializer,
+    MaterialLotSerializer,
+    StockAlertSerializer,
+    MaterialEntrySerializer,
+    MaterialShipmentSerializer,
+    AbsenceSerializer,
+    AdvanceSerializer,
+)
+
+
+# Yüksek hacimli listeler .values() satırlarından üretilir (aynı çıktı şeması)
+activity_log_rows = ValuesSerializer(ActivityLogSerializer)
+absence_rows = ValuesSerializer(AbsenceSerializer)
+advance_rows = ValuesSerializer(AdvanceSerializer)
+material_entry_rows = ValuesSerializer(MaterialEntrySerializer)
+material_shipment_rows = ValuesSerializer(MaterialShipmentSerializer)
+stock_alert_rows = ValuesSerializer(StockAlertSerializer)
+material_lot_rows = ValuesSerializer(MaterialLotSerializer)
+
+
+def is_admin(user):
+    return bool(user and user.is_authenticated and (user.is_staff or user.is_superuser))
+
+
+def build_whoami(user):
+    if user and user.is_authenticated:
+        return {
+            "is_authenticated": True,
+            "id": user.id,
+            "username": user.username,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "is_admin": is_admin(user),
+        }
+    return {
+        "is_authenticated": False,
+        "id": None,
+        "username": "anonymous",
+        "first_name": "",
+        "last_name": "",
+        "is_admin": False,
+    }
+
+
+def active_machines(line_id=None):
+    """Active machines of a line in line order; all lines (plant / line order first) when line_id is None."""
+    machines = Machine.objects.filter(is_active=True)
+    if line_id:
+        return machines.filter(line_id=line_id).order_by("order_in_line")
+    return machines.order_by("line__plant__code", "line__order_in_plant", "line_id", "order_in_line")
+
+
+def active_material_types(line_id=None):
+    """Active material types of a line plus the shared ones (no line)."""
+    types = MaterialType.objects.filter(is_active=True)
+    if line_id:
+        types = types.filter(Q(line_id=line_id) | Q(line__isnull=True))
+    return types
+
+
+SHIFT_CARD_FIELDS = ("produced_count", "tool_changes", "tool_items", "work_sessions")
+
+
+def _latest(queryset, *order, field="id"):
+    """Subquery for one field of the newest row of queryset (ties broken by id)."""
+    return Subquery(queryset.order_by(*order, "-id").values(field)[:1])
+
+
+def _build_dashboard(line_id=None, shift=None):
+    today = timezone.localdate()
+    # Sürümler veriden önce okunur: okuma sırasında gelen değişiklikler bir sonraki delta'da tekrar gönderilir
+    versions, settled = card_versions()
+
+    # Makine başına en son kayıtlar tüm geçmiş yerine (machine, -zaman, -id) indeksinden alt sorguyla seçilir
+    machines = list(active_machines(line_id).annotate(
+        last_batch_id=_latest(ToolChangeBatch.objects.filter(machine=OuterRef("pk")), "-timestamp"),
+        last_session_id=_latest(WorkSession.objects.filter(machine=OuterRef("pk")), "-end_time"),
+        today_total=_latest(DailyProduction.objects.filter(machine=OuterRef("pk"), date=today), field="total_count"),
+    ))
+
+    machine_cards = []
+
+    last_batch_map = {
+        b.machine_id: b
+        for b in ToolChangeBatch.objects.filter(pk__in=[m.last_batch_id for m in machines if m.last_batch_id])
+        .prefetch_related("items")
+    }
+    last_sessions_map = {
+        s.machine_id: s for s in WorkSession.objects.filter(pk__in=[m.last_session_id for m in machines if m.last_session_id])
+    }
+
+    # Adlar join/nesne başına sorgu yerine worker önbelleğinden (bkz. refdata.py)
+    tool_types = refdata.resolve(
+        ToolType, {item.tool_type_id for b in last_batch_map.values() for item in b.items.all()}
+    )
+    users = refdata.resolve(
+        User,
+        {b.changed_by_id for b in last_batch_map.values()} | {s.user_id for s in last_sessions_map.values()},
+    )
+    # O anki vardiyanın toplamları ham kayıtlar yerine özet tablosundan (bkz. shifts.py)
+    shift_totals = {}
+    if shift is not None:
+        rollups = ShiftRollup.objects.filter(shift_id=shift["id"], shift_date=shift["date"], machine__in=machines)
+        shift_totals = {row.pop("machine_id"): row for row in rollups.values("machine_id", *SHIFT_CARD_FIELDS)}
+
+    for m in machines:
+        last_batch = last_batch_map.get(m.id)
+
+        if last_batch:
+            item_names = [refdata.value(tool_types, item.tool_type_id, "name") for item in last_batch.items.all()]
+            last_change_teams = " + ".join(item_names)
+            last_counter = last_batch.current_counter
+            last_change_time = last_batch.timestamp
+            last_change_user = refdata.value(users, last_batch.changed_by_id, "username", "")
+        else:
+            last_change_teams = ""
+            last_counter = None
+            last_change_time = None
+            last_change_user = ""
+
+        last_session = last_sessions_map.get(m.id)
+        if last_session:
+            last_session_user = refdata.value(users, last_session.user_id, "username")
+            last_session_range = f"{last_session.start_time.strftime('%H:%M')}–{last_session.end_time.strftime('%H:%M')}"
+        else:
+            last_session_user = ""
+            last_session_range = ""
+
+        machine_cards.append({
+            "version": versions.get(("machine", m.id), 0),
+            "machine_id": m.id,
+            "machine_name": m.name,
+            "machine_short_name": m.short_name,
+            "last_counter": last_counter,
+            "last_change_teams": last_change_teams,
+            "last_change_time": last_change_time,
+            "last_change_user": last_change_user,
+            "today_total": m.today_total,
+            "last_session_user": last_session_user,
+            "last_session_range": last_session_range,
+            "shift": shift_totals.get(m.id, dict.fromkeys(SHIFT_CARD_FIELDS, 0)) if shift is not None else None,
+        })
+
+    # Malzeme özetleri tür başına ayrı sorgular yerine tek gruplu toplamdan
+    material_types = list(active_material_types(line_id).annotate(
+        latest_entry_id=_latest(MaterialEntry.objects.filter(material_type=OuterRef("pk")), "-created_at"),
+    ))
+    material_summary = []
+    alerts = open_alerts([mat_type.id for mat_type in material_types])
+    totals = {
+        row["material_type_id"]: row
+        for row in MaterialEntry.objects.filter(material_type__in=[mat_type.id for mat_type in material_types])
+        .order_by().values("material_type_id")
+        .annotate(
+            total_boxes=Sum("boxes_count"),
+            total_units=Sum(F("boxes_count") * F("units_per_box")),
+            entry_count=Count("id"),
+        )
+    }
+    latest_entries = {
+        e["id"]: e
+        for e in MaterialEntry.objects.filter(pk__in=[t.latest_entry_id for t in material_types if t.latest_entry_id])
+        .values("id", "created_at", "created_by_id")
+    }
+
+    for mat_type in material_types:
+        # Girişi olmayan malzeme yalnızca açık stok uyarısı varsa gösterilir
+        if mat_type.id not in alerts and mat_type.latest_entry_id is None:
+            continue
+
+        total = totals.get(mat_type.id, {})
+        latest_entry = latest_entries.get(mat_type.latest_entry_id)
+
+        material_summary.append({
+            "version": versions.get(("material", mat_type.id), 0),
+            "material_id": mat_type.id,
+            "material_name": mat_type.name,
+            "material_code": mat_type.code or "",
+            "total_boxes": total.get("total_boxes") or 0,
+            "total_units": total.get("total_units") or 0,
+            "entry_count": total.get("entry_count", 0),
+            "last_updated": latest_entry["created_at"] if latest_entry else None,
+            "last_updated_by": refdata.lookup(User, latest_entry["created_by_id"], "username", "—") if latest_entry else "—",
+            "reorder_level": mat_type.reorder_level,
+            "stock_alert": _stock_alert_card(alerts.get(mat_type.id)),
+        })
+
+    # Sort by last updated (most recent first)
+    material_summary.sort(key=lambda x: (x["last_updated"] is not None, x["last_updated"] or datetime.min), reverse=True)
+
+    return {
+        "version": settled,
+        "shift": shift,
+        "machines": machine_cards,
+        "material_summary": material_summary
+    }
+
+
+def _stock_alert_card(alert):
+    if alert is None:
+        return None
+    return {"stock_units": alert.stock_units, "reorder_level": alert.reorder_level, "opened_at": alert.opened_at}
+
+
+def _shift_key(shift):
+    return f"{shift['id']}@{shift['date']}" if shift is not None else "-"
+
+
+def build_dashboard(refresh=False, line_id=None):
+    # "today_total" güne, kartların "shift" alanı o anki vardiyaya bağlı olduğundan ikisi de anahtara girer;
+    # her hattın kendi girdisi vardır
+    shift = current_shift()
+    return cached(
+        "dashboard", lambda: _build_dashboard(line_id, shift), timezone.localdate(), _shift_key(shift),
+        line_id or "all", refresh=refresh,
+    )
+
+
+def build_dashboard_delta(since, line_id=None):
+    """
+    Only the cards whose version is newer than `since`.
+
+    Değişiklik yoksa tek bir indeksli sorguyla {"version", "unchanged": true}
+    döner. Çok fazla kart değiştiyse (ya da istemci çok eskiyse) tam
+    dashboard döner; istemci yanıttaki "delta" alanına bakar.
+
+    Sürümler tüm hatlar için ortaktır; başka hattaki değişiklikler bu hattın
+    kartlarında yoktur ve "removed_*" listelerine düşer (istemcide zaten yoklar).
+
+    Vardiya değişimi kart sürümü üretmez; yanıttaki "shift" istemcinin
+    elindekinden farklıysa istemci tam dashboard'u yeniden yükler.
+    """
+    changes = changes_since(since, getattr(settings, "DASHBOARD_DELTA_LIMIT", 200))
+    if changes is None:
+        return {**build_dashboard(line_id=line_id), "delta": False}
+    settled, changed = changes
+    if not changed:
+        return {"version": since, "delta": True, "unchanged": True, "shift": current_shift()}
+
+    full = build_dashboard(line_id=line_id)
+    if full["version"] < settled:
+        # Bu worker'ın önbelleği görülen değişiklikten eski (ör. başka worker yazdı)
+        full = build_dashboard(refresh=True, line_id=line_id)
+
+    machine_ids = {oid for card, oid in changed if card == "machine"}
+    material_ids = {oid for card, oid in changed if card == "material"}
+    machines = [c for c in full["machines"] if c["machine_id"] in machine_ids]
+    materials = [m for m in full["material_summary"] if m["material_id"] in material_ids]
+    return {
+        "version": full["version"],
+        "delta": True,
+        "unchanged": False,
+        "shift": full["shift"],
+        "machines": machines,
+        "material_summary": materials,
+        "removed_machines": sorted(machine_ids - {c["machine_id"] for c in machines}),
+        "removed_materials": sorted(material_ids - {m["material_id"] for m in materials}),
+        # Sıralama değişmiş olabilir; istemci kartları bu sıraya göre dizer
+        "machine_order": [c["machine_id"] for c in full["machines"]],
+        "material_order": [m["material_id"] for m in full["material_summary"]],
+    }
+
+
+def _build_machines(line_id=None):
+    machines = active_machines(line_id).prefetch_related(
+        Prefetch("tool_types", queryset=ToolType.objects.filter(deleted_at__isnull=True))
+    )
+    return MachineWithToolTypesSerializer(machines, many=True).data
+
+
+def build_machines(line_id=None):
+    return cached("machines", lambda: _build_machines(line_id), line_id or "all")
+
+
+def _build_lines():
+    plants = Plant.objects.filter(is_active=True).order_by("code").prefetch_related(
+        Prefetch("lines", queryset=Line.objects.filter(is_active=True).order_by("order_in_plant", "id"))
+    )
+    return [
+        {
+            "id": plant.id,
+            "name": plant.name,
+            "code": plant.code,
+            "lines": [{"id": line.id, "name": line.name, "code": line.code} for line in plant.lines.all()],
+        }
+        for plant in plants
+    ]
+
+
+def build_lines():
+    return cached("lines", _build_lines)
+
+
+def build_machine_detail(machine):
+    today = timezone.localdate()
+
+    last_batches = history_page(machine.id, "batches", 10)
+    dp_today = DailyProduction.objects.filter(machine=machine, date=today).first()
+    recent_daily = history_page(machine.id, "daily", 14)
+    recent_sessions = history_page(machine.id, "sessions", 10)
+
+    # MachineDetailSerializer ile aynı alan sırası; "cursors" ile eski kayıtlar
+    # /api/machines/<id>/history/ üzerinden sayfa sayfa yüklenir
+    return {
+        "machine": MachineSerializer(machine).data,
+        "tool_types": ToolTypeSerializer(machine.tool_types.filter(is_active=True), many=True).data,
+        "last_batches": last_batches["results"],
+        "today_total": dp_today.total_count if dp_today else None,
+        "recent_daily": recent_daily["results"],
+        "recent_sessions": recent_sessions["results"],
+        "cursors": {
+            "batches": last_batches["next_cursor"],
+            "daily": recent_daily["next_cursor"],
+            "sessions": recent_sessions["next_cursor"],
+        },
+    }
+
+
+def _totals(model, material):
+    totals = model.objects.filter(material_type=material).aggregate(
+        boxes=Sum("boxes_count"), units=Sum(F("boxes_count") * F("units_per_box"))
+    )
+    return totals["boxes"] or 0, totals["units"] or 0
+
+
+def build_material_lots(material_id, after=0, limit=50):
+    """One keyset page of a material's open lots (FIFO order); next_after is null on the last page."""
+    lots = material_lot_rows.serialize(open_lots(material_id, after, limit + 1))
+    next_after = lots[limit - 1]["id"] if len(lots) > limit else None
+    return {"results": lots[:limit], "next_after": next_after}
+
+
+def build_material_detail(material):
+    # Get all entries and shipments
+    entries = MaterialEntry.objects.filter(material_type=material).order_by("-created_at")[:50]
+    shipments = MaterialShipment.objects.filter(material_type=material).order_by("-created_at")[:50]
+
+    # Toplamlar satırlar belleğe alınmadan veritabanında hesaplanır
+    total_boxes_in, total_units_in = _totals(MaterialEntry, material)
+    total_boxes_out, total_units_out = _totals(MaterialShipment, material)
+
+    stock_boxes = total_boxes_in - total_boxes_out
+    stock_units = total_units_in - total_units_out
+
+    # Lot stoğu open_lots indeksinden: yalnızca stoğu kalan lotlar okunur
+    lot_totals = MaterialEntry.objects.filter(material_type=material, remaining_units__gt=0).aggregate(
+        count=Count("id"), units=Sum("remaining_units")
+    )
+    unallocated = MaterialShipment.objects.filter(material_type=material, unallocated_units__gt=0).aggregate(
+        units=Sum("unallocated_units")
+    )
+
+    return {
+        "material": MaterialTypeSerializer(material).data,
+        "entries": material_entry_rows.serialize(entries),
+        "shipments": material_shipment_rows.serialize(shipments),
+        "summary": {
+            "total_boxes_in": total_boxes_in,
+            "total_units_in": total_units_in,
+            "total_boxes_out": total_boxes_out,
+            "total_units_out": total_units_out,
+            "stock_boxes": stock_boxes,
+            "stock_units": stock_units,
+        },
+        # Sonraki sayfalar /api/materials/<id>/lots/?after=<next_after> ile
+        "lots": {
+            "open_count": lot_totals["count"],
+            "remaining_units": lot_totals["units"] or 0,
+            "unallocated_units": unallocated["units"] or 0,
+            **build_material_lots(material.id),
+        },
+    }
+
+
+def build_stock_alerts(line_id=None, status="open"):
+    """Open low-stock alerts (or the whole history with status="all") of a line's materials, newest first."""
+    alerts = StockAlert.objects.filter(material_type__in=active_material_types(line_id))
+    if status == "open":
+        alerts = alerts.filter(resolved_at__isnull=True)
+    return stock_alert_rows.serialize(alerts.order_by("-opened_at", "-id")[:200])
+
+
+def build_activity_logs(line_id=None):
+    logs = ActivityLog.objects.all()
+    if line_id:
+        logs = logs.filter(machine__line_id=line_id)
+    return activity_log_rows.serialize(logs[:200])
+
+
+def build_absences(user, user_id=None):
+    """
+    - Admins see all absences (optionally filtered by user_id)
+    - Regular users see only their own
+    """
+    if is_admin(user):
+        if user_id:
+            absences = Absence.objects.filter(user_id=user_id)
+        else:
+            absences = Absence.objects.all()
+    else:
+        absences = Absence.objects.filter(user=user)
+    return absence_rows.serialize(absences[:100])
+
+
+def build_advances(user, user_id=None):
+    """
+    - Admins see all advances (optionally filtered by user_id)
+    - Regular users see only their own
+    """
+    if is_admin(user):
+        if user_id:
+            advances = Advance.objects.filter(user_id=user_id)
+        else:
+            advances = Advance.objects.all()
+    else:
+        advances = Advance.objects.filter(user=user)
+    return advance_rows.serialize(advances[:100])
+
+
+# Sonuçtan açılan sayfa: belge türü -> bağlantı alanı ve sayfa adresi
+SEARCH_LINKS = {
+    "tool_change": ("machine_id", "/machine/{}/"),
+    "work_session": ("machine_id", "/machine/{}/"),
+    "material_shipment": ("material_type_id", "/material/{}/"),
+    "absence": ("user_id", "/personnel/"),
+    "advance": ("user_id", "/personnel/"),
+    "activity": ("machine_id", "/machine/{}/"),
+}
+SEARCH_TEXT_LENGTH = 200
+
+
+def _search_url(document):
+    field, url = SEARCH_LINKS[document.kind]
+    target = getattr(document, field)
+    if target is None:
+        # Makinesiz aktivite kaydı (malzeme/personel işlemi) aktivite listesinde görünür
+        return "/sessions/" if document.kind == "activity" else None
+    return url.format(target)
+
+
+def build_search(user, q, kinds=None, offset=0, limit=20):
+    """
+    Ranked full-text search over notes and activity details (see search.py):
+    {"results": [{"kind", "id", "text", "created_at", "rank", "url", ...}], "next_offset"}.
+    """
+    documents, has_more = search.search(q, user, kinds, offset, limit)
+    machines = refdata.resolve(Machine, {d.machine_id for d in documents})
+    materials = refdata.resolve(MaterialType, {d.material_type_id for d in documents})
+    users = refdata.resolve(User, {d.user_id for d in documents})
+    results = [
+        {
+            "kind": d.kind,
+            "id": d.object_id,
+            "text": d.body if len(d.body) <= SEARCH_TEXT_LENGTH else d.body[:SEARCH_TEXT_LENGTH - 1] + "…",
+            "created_at": d.created_at,
+            "rank": d.rank,
+            "machine_id": d.machine_id,
+            "machine_short_name": refdata.value(machines, d.machine_id, "short_name"),
+            "material_id": d.material_type_id,
+            "material_name": refdata.value(materials, d.material_type_id, "name"),
+            "user_id": d.user_id,
+            "username": refdata.value(users, d.user_id, "username"),
+            "url": _search_url(d),
+        }
+        for d in documents
+    ]
+    return {"results": results, "next_offset": offset + limit if has_more else None}
+
+
+def _build_personnel_users(q, after, limit):
+    users = User.objects.order_by("username")
+    # PostgreSQL'de trigram indeksleri ile içeren arama, diğerlerinde önek araması
+    lookup = "icontains" if connection.vendor == "postgresql" else "istartswith"
+    for term in q.split():
+        users = users.filter(
+            Q(**{f"username__{lookup}": term})
+            | Q(**{f"first_name__{lookup}": term})
+            | Q(**{f"last_name__{lookup}": term})
+        )
+    if after:
+        users = users.filter(username__gt=after)
+    rows = list(users.values_list("id", "username", "first_name", "last_name")[:limit + 1])
+    next_cursor = rows[limit - 1][1] if len(rows) > limit else None
+    return {
+        "results": [
+            {"id": uid, "full_name": f"{first_name} {last_name}".strip() or username}
+            for uid, username, first_name, last_name in rows[:limit]
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+def build_personnel_users(q="", after=None, limit=50):
+    """
+    User directory for admin dropdowns: {"results": [{"id", "full_name"}], "next_cursor"}.
+    Every word of `q` must match username, first or last name (prefix; substring on PostgreSQL).
+    """
+    q = " ".join(q.lower().split())
+    # Serbest metin anahtara özetlenerek girer (memcached anahtarlarında boşluk olamaz)
+    key = hashlib.sha1(f"{q}|{after or ''}".encode()).hexdigest()
+    return cached("users", lambda: _build_personnel_users(q, after, limit), key, limit)
+
+
+def build_shift_summary(start=None, end=None, line_id=None, machine_id=None):
+    """
+    Per-shift totals per machine with each operator's share, newest shift first.
+
+    Yalnızca özet tablolarını okur (bkz. shifts.py); ham kayıt taranmaz.
+    """
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=6)
+    # Yalnızca start verildiyse aralık yine en fazla MAX_DAYS gün olur
+    start = max(start, end - timedelta(days=ShiftSummaryQuerySerializer.MAX_DAYS - 1))
+    rollups = ShiftRollup.objects.filter(shift_date__gte=start, shift_date__lte=end)
+    operator_rollups = ShiftOperatorRollup.objects.filter(shift_date__gte=start, shift_date__lte=end)
+    if line_id:
+        rollups = rollups.filter(machine__line_id=line_id)
+        operator_rollups = operator_rollups.filter(machine__line_id=line_id)
+    if machine_id:
+        rollups = rollups.filter(machine_id=machine_id)
+        operator_rollups = operator_rollups.filter(machine_id=machine_id)
+
+    rows = list(
+        rollups.order_by("-shift_date", "shift__start_time", "machine__order_in_line", "machine_id").values(
+            "shift_date", "shift_id", "shift__name", "machine_id", "produced_count", "tool_changes", "tool_items",
+            "work_sessions", "work_seconds", "session_produced",
+        )
+    )
+    operators = {}
+    for op in operator_rollups.order_by("-produced_count", "user_id").values(
+        "shift_date", "shift_id", "machine_id", "user_id", "work_sessions", "work_seconds", "produced_count",
+    ):
+        operators.setdefault((op["shift_date"], op["shift_id"], op["machine_id"]), []).append(op)
+
+    machine_names = refdata.resolve(Machine, {row["machine_id"] for row in rows})
+    users = refdata.resolve(User, {op["user_id"] for ops in operators.values() for op in ops})
+    results = []
+    for row in rows:
+        key = (row["shift_date"], row["shift_id"], row["machine_id"])
+        results.append({
+            "date": row["shift_date"],
+            "shift_id": row["shift_id"],
+            "shift_name": row["shift__name"],
+            "machine_id": row["machine_id"],
+            "machine_short_name": refdata.value(machine_names, row["machine_id"], "short_name"),
+            "produced_count": row["produced_count"],
+            "tool_changes": row["tool_changes"],
+            "tool_items": row["tool_items"],
+            "work_sessions": row["work_sessions"],
+            "work_minutes": round(row["work_seconds"] / 60),
+            "session_produced": row["session_produced"],
+            "operators": [
+                {
+                    "user_id": op["user_id"],
+                    "username": refdata.value(users, op["user_id"], "username"),
+                    "work_sessions": op["work_sessions"],
+                    "work_minutes": round(op["work_seconds"] / 60),
+                    "produced_count": op["produced_count"],
+                }
+                for op in operators.get(key, [])
+            ],
+        })
+    return {
+        "start": start,
+        "end": end,
+        "shifts": ShiftSerializer(Shift.objects.filter(is_active=True), many=True).data,
+        "current": current_shift(),
+        "results": results,
+    }
+
+
+def build_payroll_summary(user, start=None, end=None, user_id=None):
+    """
+    Monthly advance totals and absence days per user.
+    - Admins see everyone (optionally filtered by user_id)
+    - Regular users see only their own
+    """
+    end = month_start(end or timezone.localdate())
+    start = month_start(start) if start else add_months(end, -11)
+    if not is_admin(user):
+        user_id = user.id
+    return {
+        "start": start.strftime("%Y-%m"),
+        "end": end.strftime("%Y-%m"),
+        "results": payroll_summary(start, end, user_id),
+    }
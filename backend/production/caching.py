@@ -0,0 +1,65 @@
+"""
+Sürüm anahtarlı önbellek yardımcıları.
+
+Her veri grubunun ("dashboard", "machines" ...) önbellekte bir sürüm
+numarası vardır. Önbelleğe alınan değerlerin anahtarı bu sürümü içerir;
+ilgili tablolara yazıldığında sürüm artırılır ve eski değerler kendiliğinden
+kullanılmaz hale gelir. TTL, başka worker'lardaki yerel önbelleklerde
+kalabilecek eskiliği sınırlar.
+
+Sürüm anahtarı önbellekten düşerse (silinme, yeniden başlatma) sürüm 1'den
+değil o anki zamandan (ms) başlar: worker belleğinde eski sürümle tutulan
+tablolar (refdata.py, auth.py) yeni sürümle eşleşip eski veriyi vermez.
+
+Replikadan okunarak üretilen değerler ayrı anahtarlarda tutulur: yazmadan
+sonra sürüm artmışken gecikmeli replikadan dolan bir değer, kendi yazdığını
+primary'den okuması gereken (bkz. routers.is_sticky) istemciye dönmez.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import cache_lookup
+from .routers import reading_replica
+
+
+def _version_key(name):
+    return f"version:{name}"
+
+
+def _initial_version():
+    return time.time_ns() // 1_000_000
+
+
+def get_version(name):
+    return cache.get_or_set(_version_key(name), _initial_version, None)
+
+
+def bump_version(*names):
+    for name in names:
+        try:
+            cache.incr(_version_key(name))
+        except ValueError:
+            cache.add(_version_key(name), _initial_version(), None)
+
+
+def cached(name, builder, *key_parts, ttl=None, refresh=False):
+    """
+    Return builder() from the cache, keyed by the current version of `name`.
+
+    refresh=True rebuilds and overwrites the entry (for callers that know the
+    cached value is older than the data they have seen).
+    """
+    if ttl is None:
+        ttl = getattr(settings, "API_CACHE_TTL", 10)
+    if ttl <= 0:
+        return builder()
+    source = "replica" if reading_replica() else "primary"
+    key = ":".join([name, str(get_version(name)), source, *(str(p) for p in key_parts)])
+    value = None if refresh else cache.get(key)
+    cache_lookup(name, value is not None)
+    if value is None:
+        value = builder()
+        cache.set(key, value, ttl)
+    return value
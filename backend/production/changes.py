@@ -0,0 +1,128 @@
+"""
+Dashboard kart sürümleri.
+
+Bir makine ya da malzeme kartını etkileyen her yazma işleminde o kart
+için DashboardChange'e yeni bir satır eklenir (eskisi silinir). Satırın
+id'si kartın sürümüdür; tablo kart sayısı kadar satırda kalır.
+`?since=<sürüm>` istekleri yalnızca `id > since` aralığını okur.
+
+id'ler ekleme anında verilir ama satırlar farklı sırada commit olabilir:
+bir istemci 11'i görüp sürümü 11 aldıktan sonra 10 commit olursa,
+`since=11` onu bir daha görmez. Bu yüzden istemciye verilen sürüm
+DASHBOARD_SETTLE_SECONDS'dan yeni satırları geçmez (bkz. outbox.py);
+yeni satırlar yine gönderilir, sürüm ilerlemediği için bir sonraki
+istekte tekrar gelirler.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .caching import bump_version
+from .models import DashboardChange
+
+
+_local = threading.local()
+
+
+def touch_dashboard(card, *object_ids):
+    object_ids = [oid for oid in object_ids if oid is not None]
+    if not object_ids:
+        return
+    # Silme ve ekleme tek transaction'da: arada okuyan istemci kartı kaçırmaz, tek BEGIN/COMMIT
+    with transaction.atomic():
+        DashboardChange.objects.filter(card=card, object_id__in=object_ids).delete()
+        DashboardChange.objects.bulk_create(DashboardChange(card=card, object_id=oid) for oid in object_ids)
+    bump_version("dashboard")
+
+
+def defer_on_commit(name, add, flush):
+    """
+    Run work once per transaction, after it commits.
+
+    `add(state)` records this call's items in a per-thread dict shared by all
+    calls with the same `name`; after commit `flush(state)` runs once with
+    everything recorded. Outside a transaction it runs right away with this
+    call's items only.
+
+    Her çağrı kendi on_commit kaydını ekler, ilk çalışan durumu alıp boşaltır;
+    diğerleri boş durum bulur. Böylece geri alınan bir savepoint'teki kayıt
+    kaybolsa da sonraki çağrıların kaydı işi yapar (Django'nun iç on_commit
+    listesine bakılmaz). Tamamen geri alınan transaction'ın kayıtları bir
+    sonraki commit'te işlenir; işler tekrar hesaplama olduğundan zararsızdır.
+    """
+    if not connection.in_atomic_block:
+        state = {}
+        add(state)
+        flush(state)
+        return
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        pending = _local.pending = {}
+    add(pending.setdefault(name, {}))
+    transaction.on_commit(lambda: _flush_pending(name, flush))
+
+
+def _flush_pending(name, flush):
+    state = getattr(_local, "pending", {}).pop(name, None)
+    if state:
+        flush(state)
+
+
+def _touch_cards(cards):
+    by_card = {}
+    for card, object_id in cards:
+        by_card.setdefault(card, []).append(object_id)
+    for card, object_ids in by_card.items():
+        touch_dashboard(card, *object_ids)
+
+
+def touch_dashboard_on_commit(card, *object_ids):
+    """
+    touch_dashboard(), deferred to commit and de-duplicated per transaction.
+
+    Sürüm, veri commit edildikten sonra verilir; böylece bir istemci bir
+    sürümü gördüğünde o sürümün verisi de okunabilir durumdadır. Cascade
+    silmelerde aynı kart için yüzlerce sinyal tek yazmaya iner.
+    """
+    cards = {(card, oid) for oid in object_ids if oid is not None}
+    if cards:
+        defer_on_commit("dashboard", lambda state: state.update(dict.fromkeys(cards)), _touch_cards)
+
+
+def _settled_before():
+    return timezone.now() - timedelta(seconds=getattr(settings, "DASHBOARD_SETTLE_SECONDS", 2))
+
+
+def card_versions():
+    """
+    ({(card, object_id): version} for every card that has ever changed, settled version).
+
+    The settled version is the newest one a client may resume from with ?since=.
+    """
+    settled_before = _settled_before()
+    versions = {}
+    settled = 0
+    for card, object_id, version, changed_at in DashboardChange.objects.values_list("card", "object_id", "id", "changed_at"):
+        key = (card, object_id)
+        versions[key] = max(version, versions.get(key, 0))
+        if changed_at <= settled_before:
+            settled = max(settled, version)
+    return versions, settled
+
+
+def changes_since(since, limit):
+    """
+    (settled version, {(card, object_id)}) changed after `since`; None if more than `limit` cards changed.
+    """
+    settled_before = _settled_before()
+    rows = list(
+        DashboardChange.objects.filter(id__gt=since).order_by("id")
+        .values_list("id", "card", "object_id", "changed_at")[:limit + 1]
+    )
+    if len(rows) > limit:
+        return None
+    settled = max((version for version, _, _, changed_at in rows if changed_at <= settled_before), default=since)
+    return settled, {(card, object_id) for _, card, object_id, _ in rows}
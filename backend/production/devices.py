@@ -0,0 +1,130 @@
+"""
+Atölye tabletleri için cihaz anahtarları.
+
+Tablet `Authorization: Device <anahtar>` başlığıyla gelir; anahtarın
+SHA-256 özeti DeviceToken.key_hash üzerinde tek bir indeksli sorguyla
+bulunur (anahtar rastgele ve uzun olduğundan yavaş parola hash'ine gerek
+yoktur). İsteğin kullanıcısı cihazdaki güncel operatördür; operatör
+değişimi parola yerine kısa bir PIN ile yapılır (bkz. OperatorPin).
+
+PIN denemeleri cihaz başına sınırlanır (bkz. throttling.py) ama bu sınır
+worker başınadır ve tek bir tablet sırayla herkesin PIN'ini deneyebilir.
+Bu yüzden hatalı denemeler hedef kullanıcının OperatorPin satırında
+sayılır: OPERATOR_PIN_MAX_FAILURES hatalı denemeden sonra kullanıcının PIN'i
+OPERATOR_PIN_LOCKOUT_SECONDS boyunca, doğru girilse bile kabul edilmez.
+Yönetici (is_staff/is_superuser) hesapları tablete operatör olamaz.
+last_seen_at her istekte değil, en fazla DEVICE_LAST_SEEN_INTERVAL
+saniyede bir yazılır.
+"""
+import hashlib
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import F
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import DeviceToken, OperatorPin
+
+
+KEYWORD = "Device"
+
+
+def hash_key(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue_key(device):
+    """Set a new random key on `device` (not saved) and return it; the raw key is shown only once."""
+    key = secrets.token_urlsafe(32)
+    device.key_prefix = key[:8]
+    device.key_hash = hash_key(key)
+    return key
+
+
+def _pin_hash(user_id, pin):
+    return salted_hmac("production.operator_pin", f"{user_id}:{pin}").hexdigest()
+
+
+class OperatorLocked(Exception):
+    """Too many wrong PINs for this user; `until` is when attempts are accepted again."""
+
+    def __init__(self, until):
+        super().__init__(until)
+        self.until = until
+
+
+def set_operator_pin(user, pin):
+    OperatorPin.objects.update_or_create(
+        user=user, defaults={"pin_hash": _pin_hash(user.pk, pin), "failed_attempts": 0, "locked_until": None}
+    )
+
+
+def check_operator_pin(user_id, pin):
+    """True if `pin` is the user's PIN; raises OperatorLocked while the user is locked out."""
+    stored = OperatorPin.objects.filter(user_id=user_id).values_list("pin_hash", "locked_until").first()
+    if stored is None:
+        return False
+    pin_hash, locked_until = stored
+    now = timezone.now()
+    if locked_until is not None and locked_until > now:
+        raise OperatorLocked(locked_until)
+    if constant_time_compare(pin_hash, _pin_hash(user_id, pin)):
+        OperatorPin.objects.filter(user_id=user_id, failed_attempts__gt=0).update(failed_attempts=0)
+        return True
+    pins = OperatorPin.objects.filter(user_id=user_id)
+    # Sayaç tek UPDATE ile artar; eşzamanlı denemeler birbirini ezmez
+    pins.update(failed_attempts=F("failed_attempts") + 1)
+    lockout = timedelta(seconds=getattr(settings, "OPERATOR_PIN_LOCKOUT_SECONDS", 900))
+    pins.filter(failed_attempts__gte=getattr(settings, "OPERATOR_PIN_MAX_FAILURES", 5)).update(
+        failed_attempts=0, locked_until=now + lockout
+    )
+    return False
+
+
+def _touch(device):
+    interval = timedelta(seconds=getattr(settings, "DEVICE_LAST_SEEN_INTERVAL", 60))
+    now = timezone.now()
+    if device.last_seen_at is None or now - device.last_seen_at >= interval:
+        DeviceToken.objects.filter(pk=device.pk).update(last_seen_at=now)
+        device.last_seen_at = now
+
+
+class DeviceTokenAuthentication(BaseAuthentication):
+    """
+    `Authorization: Device <key>`. request.user is the device's current operator
+    (anonymous until one switches in); request.auth is the DeviceToken.
+    """
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Geçersiz cihaz anahtarı başlığı")
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Geçersiz cihaz anahtarı başlığı")
+
+        device = (
+            DeviceToken.objects.select_related("current_user")
+            .filter(key_hash=hash_key(key), revoked_at__isnull=True)
+            .first()
+        )
+        if device is None:
+            raise exceptions.AuthenticationFailed("Geçersiz ya da iptal edilmiş cihaz anahtarı")
+        _touch(device)
+
+        user = device.current_user
+        # Yönetici hesabı tablete operatör olamaz (bkz. views.device_operator); eski kayıtlar da yetki vermez
+        if user is None or not user.is_active or user.is_staff or user.is_superuser:
+            user = AnonymousUser()
+        return user, device
+
+    def authenticate_header(self, request):
+        return KEYWORD
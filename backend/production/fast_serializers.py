@@ -0,0 +1,172 @@
+"""
+Liste endpoint'leri için hafif okuma serializer'ları.
+
+ValuesSerializer, mevcut bir ModelSerializer'ın alan tanımlarından bir
+kez `.values()` sütun eşlemesi çıkarır ve çıktıyı model nesnesi
+oluşturmadan, doğrudan satırlardan üretir. Çıktı şeması birebir aynıdır:
+tarih/ondalık alanlar orijinal alanın to_representation'ı ile biçimlenir,
+`source="user.username"` gibi ilişki alanları ilişki boşsa (DRF'deki gibi)
+çıktıya hiç eklenmez. Referans modellerin ad alanları (bkz. refdata.py)
+join yerine FK id'sinden worker önbelleğiyle çözülür. İç içe liste
+alanları (ör. batch.items) tek bir ek sorguyla doldurulur.
+"""
+from functools import cached_property
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from . import refdata
+
+
+# Çıktısı ham değerden farklı olan alanlar; bunlar orijinal alanla biçimlenir
+_CONVERTED_FIELDS = (
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DecimalField,
+    serializers.DurationField,
+)
+
+_DATETIME = object()
+
+
+class _Reference:
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+
+
+def _reference(model, attrs):
+    """_Reference for sources like "user.username" that refdata can resolve from the FK id, else None."""
+    if len(attrs) != 2:
+        return None
+    relation = model._meta.get_field(attrs[0])
+    if not relation.many_to_one or attrs[1] not in refdata.REFERENCE_FIELDS.get(relation.related_model, ()):
+        return None
+    return _Reference(relation.related_model, attrs[1])
+
+
+def _is_plain_iso_datetime(field):
+    return (
+        isinstance(field, serializers.DateTimeField)
+        and not hasattr(field, "timezone")
+        and (getattr(field, "format", api_settings.DATETIME_FORMAT) or "").lower() == ISO_8601
+    )
+
+
+class ValuesSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.model = serializer_class.Meta.model
+
+    @cached_property
+    def plan(self):
+        """(output name, values() lookup, null-check lookup, converter) per field, in output order."""
+        plan = []
+        for name, field in self.serializer_class().fields.items():
+            if isinstance(field, serializers.BaseSerializer):
+                # İç içe alan: sırası korunsun diye yer tutucu, serialize() doldurur
+                plan.append((name, None, None, None))
+                continue
+            attrs = field.source.split(".")
+            reference = _reference(self.model, attrs)
+            if reference is not None:
+                # values("user") FK id'sini verir; ad serialize_rows'ta refdata'dan gelir
+                plan.append((name, attrs[0], attrs[0], reference))
+                continue
+            lookup = "__".join(attrs)
+            # "user.username": ilişki boşsa DRF alanı atlar; bunu FK sütunundan anlarız
+            null_check = attrs[0] if len(attrs) > 1 else None
+            if _is_plain_iso_datetime(field):
+                # En sık görülen dönüşüm; saat dilimi her satır yerine istek başına bir kez alınır
+                converter = _DATETIME
+            elif isinstance(field, _CONVERTED_FIELDS):
+                converter = field.to_representation
+            else:
+                converter = None
+            plan.append((name, lookup, null_check, converter))
+        return plan
+
+    @cached_property
+    def _datetime_fields(self):
+        fields = self.serializer_class().fields
+        return {name: fields[name] for name, _, _, converter in self.plan if converter is _DATETIME}
+
+    @cached_property
+    def nested(self):
+        """output name -> (ValuesSerializer, FK name on the child pointing back to this model)."""
+        nested = {}
+        for name, field in self.serializer_class().fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                relation = self.model._meta.get_field(field.source)
+                nested[name] = (ValuesSerializer(field.child.__class__), relation.field.name)
+        return nested
+
+    @cached_property
+    def lookups(self):
+        lookups = {"pk"}
+        for _, lookup, null_check, _ in self.plan:
+            if lookup:
+                lookups.add(lookup)
+            if null_check:
+                lookups.add(null_check)
+        return sorted(lookups)
+
+    def _resolve_references(self, rows):
+        ids = {}
+        for _, lookup, _, converter in self.plan:
+            if isinstance(converter, _Reference):
+                ids.setdefault(converter.model, set()).update(row[lookup] for row in rows)
+        return {model: refdata.resolve(model, model_ids) for model, model_ids in ids.items()}
+
+    def serialize_rows(self, rows):
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        references = self._resolve_references(rows)
+        data = []
+        for row in rows:
+            item = {}
+            for name, lookup, null_check, converter in self.plan:
+                if lookup is None:
+                    item[name] = None
+                    continue
+                if null_check and row[null_check] is None:
+                    continue
+                value = row[lookup]
+                if value is not None and converter is not None:
+                    if isinstance(converter, _Reference):
+                        value = refdata.value(references[converter.model], value, converter.field)
+                    elif converter is _DATETIME and tz is not None and timezone.is_aware(value):
+                        value = value.astimezone(tz).isoformat()
+                        if value.endswith("+00:00"):
+                            value = value[:-6] + "Z"
+                    elif converter is _DATETIME:
+                        value = self._datetime_fields[name].to_representation(value)
+                    else:
+                        value = converter(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def fetch(self, queryset):
+        """Raw values() rows (including "pk"), e.g. to build a paging cursor before serializing."""
+        return list(queryset.values(*self.lookups))
+
+    def serialize(self, queryset):
+        return self.serialize_fetched(self.fetch(queryset))
+
+    def serialize_fetched(self, rows):
+        data = self.serialize_rows(rows)
+        if self.nested and rows:
+            pks = [row["pk"] for row in rows]
+            for name, (child, fk_name) in self.nested.items():
+                # Çocuk satırlar varsayılan sırayla (ör. id) gelir; ebeveyne göre gruplanır
+                child_qs = child.model.objects.filter(**{f"{fk_name}__in": pks}).order_by("pk")
+                child_rows = list(child_qs.values(*sorted({fk_name, *child.lookups})))
+                grouped = {pk: [] for pk in pks}
+                for child_row, child_item in zip(child_rows, child.serialize_rows(child_rows)):
+                    grouped[child_row[fk_name]].append(child_item)
+                for item, row in zip(data, rows):
+                    item[name] = grouped[row["pk"]]
+        return data
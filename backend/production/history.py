@@ -0,0 +1,79 @@
+"""
+Makine geçmişi: takım değişimleri, günlük sayımlar ve çalışma oturumları.
+
+Her bölüm (machine, sıralama sütunu, id) üzerinden keyset ile sayfalanır;
+bir sayfa pencere boyutundan bağımsız olarak tek sorgu (+ batch kalemleri
+için bir sorgu) ile üretilir. İmleç, sayfanın son satırının sıralama
+değeri ve id'sidir.
+"""
+import base64
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .fast_serializers import ValuesSerializer
+from .models import ToolChangeBatch, DailyProduction, WorkSession
+from .serializers import ToolChangeBatchSerializer, DailyProductionSerializer, WorkSessionSerializer
+
+
+tool_change_batch_rows = ValuesSerializer(ToolChangeBatchSerializer)
+daily_production_rows = ValuesSerializer(DailyProductionSerializer)
+work_session_rows = ValuesSerializer(WorkSessionSerializer)
+
+# bölüm -> (okuyucu, model, sıralama sütunu, sütun tarih mi)
+SECTIONS = {
+    "batches": (tool_change_batch_rows, ToolChangeBatch, "timestamp", False),
+    "daily": (daily_production_rows, DailyProduction, "date", True),
+    "sessions": (work_session_rows, WorkSession, "end_time", False),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_cursor(value, pk):
+    return base64.urlsafe_b64encode(f"{value.isoformat()}|{pk}".encode()).decode()
+
+
+def _decode_cursor(cursor, is_date):
+    try:
+        raw, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        value = date.fromisoformat(raw) if is_date else datetime.fromisoformat(raw)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    # _encode_cursor her zaman saat dilimli yazar; saat dilimsiz değer elle üretilmiştir
+    if not is_date and timezone.is_naive(value):
+        raise InvalidCursor("naive datetime")
+    return value, pk
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def history_page(machine_id, section, limit, cursor=None, start=None, end=None):
+    """
+    One page of a machine history section, newest first.
+
+    Returns {"results": [...], "next_cursor": str | None}. `start`/`end` are
+    inclusive dates in local time.
+    """
+    reader, model, column, is_date = SECTIONS[section]
+    qs = model.objects.filter(machine_id=machine_id)
+    if start:
+        qs = qs.filter(**{f"{column}__gte": start if is_date else _day_start(start)})
+    if end:
+        qs = qs.filter(**{f"{column}__lt": end + timedelta(days=1) if is_date else _day_start(end + timedelta(days=1))})
+    if cursor:
+        value, pk = _decode_cursor(cursor, is_date)
+        qs = qs.filter(Q(**{f"{column}__lt": value}) | Q(**{column: value, "pk__lt": pk}))
+
+    rows = reader.fetch(qs.order_by(f"-{column}", "-pk")[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1][column], rows[-1]["pk"])
+    return {"results": reader.serialize_fetched(rows), "next_cursor": next_cursor}
@@ -0,0 +1,242 @@
+"""
+Veritabanı tabanlı arka plan işleri.
+
+Uzun işler (rapor, yeniden hesaplama, arşivleme) web isteğinde çalışmaz:
+`enqueue()` bir Job satırı ekler (çağıran transaction'la birlikte commit
+olur), `manage.py run_jobs` worker'ı satırı kuyruktan alıp çalıştırır.
+
+Kuyruktan alma PostgreSQL'de `SELECT ... FOR UPDATE SKIP LOCKED` ile
+yapılır; worker'lar birbirinin kilitlediği satırı beklemez. SQLite'ta
+satır kilidi yoktur, iş `status='queued'` koşullu UPDATE'ini kazanan
+worker'a kalır. Worker süreci çalışan işlerinin heartbeat_at alanını
+günceller; JOB_LOCK_TIMEOUT boyunca güncellenmeyen iş (çöken worker,
+deploy) tekrar kuyruğa alınır. Bu yüzden bir iş birden fazla kez
+çalışabilir, iş fonksiyonları tekrar çalıştırılabilir olmalıdır.
+
+Yeni iş türü:
+
+    @job("rebuild_something")
+    def rebuild_something(ctx, since=None):
+        ...
+        ctx.progress(50, "yarısı bitti")
+        return {"rows": n}          # Job.result
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .outbox import prune
+from .payroll import add_months, close_months, month_start
+from .purge import purge_machine, purge_tool_type
+from .shifts import rebuild as rebuild_shift_rollups
+from .slowlog import capture_plan, trim as trim_slow_queries
+
+
+logger = logging.getLogger(__name__)
+
+# iş türü -> fonksiyon(ctx, **params)
+REGISTRY = {}
+
+
+def job(kind):
+    """Register a function as the handler for jobs of `kind`."""
+    def register(func):
+        REGISTRY[kind] = func
+        return func
+    return register
+
+
+class JobCancelled(Exception):
+    """The job was cancelled (or taken over by another worker) while running."""
+
+
+class JobContext:
+    def __init__(self, job):
+        self.job = job
+
+    def progress(self, percent, message=""):
+        """Report progress; raises JobCancelled if the job is no longer ours to run."""
+        updated = Job.objects.filter(pk=self.job.pk, status="running", locked_by=self.job.locked_by).update(
+            progress=max(0, min(100, int(percent))), message=message[:200], heartbeat_at=timezone.now()
+        )
+        if not updated:
+            raise JobCancelled()
+
+
+def enqueue(kind, params=None, user=None, delay=0, max_attempts=3):
+    if kind not in REGISTRY:
+        raise ValueError(f"Bilinmeyen iş türü: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+
+
+def claim(worker):
+    """Take the oldest runnable job for `worker` (marked running), or None."""
+    ready = Job.objects.filter(status="queued", run_after__lte=timezone.now()).order_by("id")
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = ready.select_for_update(skip_locked=True).values_list("pk", flat=True)[:1]
+        else:
+            # Satır kilidi yok: birkaç aday dene, koşullu UPDATE'i kazanan alır
+            candidates = ready.values_list("pk", flat=True)[:10]
+        for pk in candidates:
+            now = timezone.now()
+            if Job.objects.filter(pk=pk, status="queued").update(
+                status="running", locked_by=worker, attempts=F("attempts") + 1,
+                started_at=now, heartbeat_at=now, progress=0, message="",
+            ):
+                return Job.objects.get(pk=pk)
+    return None
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=30 * 2 ** (attempts - 1))
+
+
+def run_job(job):
+    func = REGISTRY.get(job.kind)
+    mine = Job.objects.filter(pk=job.pk, status="running", locked_by=job.locked_by)
+    try:
+        if func is None:
+            raise LookupError(f"Bilinmeyen iş türü: {job.kind}")
+        result = func(JobContext(job), **job.params)
+    except JobCancelled:
+        logger.info("job %s cancelled", job.pk)
+        return
+    except Exception:
+        logger.exception("job %s (%s) failed", job.pk, job.kind)
+        error, now = traceback.format_exc(), timezone.now()
+        if func is not None and job.attempts < job.max_attempts:
+            mine.update(status="queued", error=error, locked_by="", run_after=now + _retry_delay(job.attempts))
+        else:
+            mine.update(status="failed", error=error, finished_at=now)
+        return
+    mine.update(status="succeeded", progress=100, result=result, error="", finished_at=timezone.now())
+
+
+def requeue_stale():
+    """Jobs whose worker stopped heartbeating go back to the queue (or fail after max_attempts)."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status="running", heartbeat_at__lt=now - timedelta(seconds=getattr(settings, "JOB_LOCK_TIMEOUT", 300))
+    )
+    stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed", error="Worker yanıt vermedi", locked_by="", finished_at=now
+    )
+    return stale.update(status="queued", locked_by="", run_after=now)
+
+
+class Worker:
+    """Runs jobs on `concurrency` threads until stop() (or the queue is empty, with once=True)."""
+
+    def __init__(self, concurrency=1, poll_interval=1.0, name=None):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        # thread -> çalıştırdığı işin id'si (heartbeat yalnızca bunlara gider)
+        self._current = {}
+
+    def stop(self):
+        self._stopping.set()
+
+    def _loop(self, index, once):
+        worker = f"{self.name}:{index}"
+        try:
+            while not self._stopping.is_set():
+                close_old_connections()
+                try:
+                    job = claim(worker)
+                    if job is None:
+                        if once:
+                            return
+                        self._stopping.wait(self.poll_interval)
+                        continue
+                    self._current[index] = job.pk
+                    run_job(job)
+                except DatabaseError:
+                    # Kopan bağlantı ya da SQLite yazma kilidi; worker durmasın. Durumu
+                    # yazılamayan iş heartbeat almaz, JOB_LOCK_TIMEOUT sonra tekrar çalışır
+                    logger.warning("job worker %s: database error", worker, exc_info=True)
+                    self._stopping.wait(self.poll_interval)
+                finally:
+                    self._current.pop(index, None)
+        finally:
+            connection.close()
+
+    def _heartbeat(self):
+        running = list(self._current.values())
+        if running:
+            Job.objects.filter(pk__in=running, status="running").update(heartbeat_at=timezone.now())
+
+    def run(self, once=False):
+        requeue_stale()
+        threads = [
+            threading.Thread(target=self._loop, args=(i, once), name=f"job-worker-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        interval = getattr(settings, "JOB_LOCK_TIMEOUT", 300) / 3
+        last_beat = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=self.poll_interval)
+                if time.monotonic() - last_beat >= interval:
+                    close_old_connections()
+                    self._heartbeat()
+                    requeue_stale()
+                    last_beat = time.monotonic()
+        finally:
+            connection.close()
+
+
+@job("close_payroll_months")
+def close_payroll_months_job(ctx, months=12):
+    current = month_start(timezone.localdate())
+    closed = close_months([add_months(current, -i) for i in range(1, months + 1)])
+    return {"closed": [m.strftime("%Y-%m") for m in closed]}
+
+
+@job("prune_outbox")
+def prune_outbox_job(ctx, days=30):
+    return {"deleted": prune(days)}
+
+
+@job("rebuild_shift_rollups")
+def rebuild_shift_rollups_job(ctx, days=None):
+    days = days or getattr(settings, "SHIFT_REBUILD_DAYS", 31)
+    return {"machines": rebuild_shift_rollups(days)}
+
+
+@job("purge_machine")
+def purge_machine_job(ctx, machine_id):
+    return purge_machine(ctx, machine_id)
+
+
+@job("purge_tool_type")
+def purge_tool_type_job(ctx, tool_type_id):
+    return purge_tool_type(ctx, tool_type_id)
+
+
+@job("capture_query_plan")
+def capture_query_plan_job(ctx, query_id):
+    plan = capture_plan(query_id)
+    trim_slow_queries()
+    return {"captured": plan is not None}
@@ -0,0 +1,95 @@
+"""
+Malzeme lotları ve FIFO çıkış dağıtımı.
+
+Her MaterialEntry bir lottur ve remaining_units ile kalan adedini tutar.
+Bir çıkış (MaterialShipment) kaydedilirken, aynı malzemenin stoğu kalan
+lotlarından en eskisinden başlayarak düşülür. Lotlar "open_lots" kısmi
+indeksinden küçük parçalar halinde okunur ve yalnızca okunan lotlar
+kilitlenir (select_for_update). Dağıtım ShipmentAllocation satırlarına
+yazılır. Lotlardaki stok çıkışı karşılamıyorsa eksik kalan adet çıkışın
+unallocated_units alanına yazılır; çıkış reddedilmez, çünkü stok daha önce
+de eksiye düşebiliyordu.
+
+Dağıtım planı pre_save'de kurulur, post_save'de yazılır (bkz. signals.py).
+Böylece hem API servisi hem admin paneli aynı yoldan geçer. Kilitler ve
+yazma tek transaction'da kalsın diye MaterialShipment.save() kendini
+transaction.atomic() içinde çalıştırır; çağıranın transaction açması
+gerekmez.
+"""
+from django.db.models import F, Sum
+
+from .models import MaterialEntry, ShipmentAllocation
+
+
+# Tek seferde okunup kilitlenen lot sayısı; çoğu çıkış ilk parçada karşılanır
+LOT_CHUNK = 20
+
+
+def shipment_units(shipment):
+    return max(shipment.boxes_count * shipment.units_per_box, 0)
+
+
+def plan(shipment):
+    """
+    Lock the oldest open lots of the shipment's material and reserve its units
+    FIFO. The plan is kept on the instance until apply() writes it.
+    """
+    needed = shipment_units(shipment)
+    taken = []
+    last_id = 0
+    while needed:
+        lots = list(
+            MaterialEntry.objects.select_for_update(of=("self",))
+            .filter(material_type_id=shipment.material_type_id, remaining_units__gt=0, id__gt=last_id)
+            .order_by("id").only("id", "remaining_units")[:LOT_CHUNK]
+        )
+        for lot in lots:
+            units = min(needed, lot.remaining_units)
+            lot.remaining_units -= units
+            taken.append((lot, units))
+            needed -= units
+            if not needed:
+                break
+        if len(lots) < LOT_CHUNK:
+            break
+        last_id = lots[-1].id
+    shipment.unallocated_units = needed
+    shipment._lot_plan = taken
+
+
+def apply(shipment):
+    """Write the plan made by plan(): lot balances and allocation rows."""
+    taken = shipment.__dict__.pop("_lot_plan", None)
+    if not taken:
+        return
+    MaterialEntry.objects.bulk_update([lot for lot, _ in taken], ["remaining_units"])
+    ShipmentAllocation.objects.bulk_create(
+        ShipmentAllocation(shipment=shipment, lot=lot, units=units) for lot, units in taken
+    )
+
+
+def release(shipment_id):
+    """Give the units of a shipment's allocations back to their lots and drop the allocations."""
+    allocations = list(ShipmentAllocation.objects.filter(shipment_id=shipment_id).values_list("id", "lot_id", "units"))
+    if not allocations:
+        return
+    # Lot başına tek UPDATE; kilit yalnızca bu lotlarda
+    for _, lot_id, units in allocations:
+        MaterialEntry.objects.filter(pk=lot_id).update(remaining_units=F("remaining_units") + units)
+    ShipmentAllocation.objects.filter(id__in=[a[0] for a in allocations]).delete()
+
+
+def lot_remaining(entry):
+    """Remaining units of an (edited) lot: its size minus what shipments already took, never below zero."""
+    if entry.pk is None:
+        return max(entry.boxes_count * entry.units_per_box, 0)
+    allocated = ShipmentAllocation.objects.filter(lot_id=entry.pk).aggregate(total=Sum("units"))["total"] or 0
+    return max(entry.boxes_count * entry.units_per_box - allocated, 0)
+
+
+def open_lots(material_id, after=0, limit=50):
+    """Open lots of a material in FIFO order, keyset-paged by lot id (served by the open_lots index)."""
+    return (
+        MaterialEntry.objects.filter(material_type_id=material_id, remaining_units__gt=0, id__gt=after)
+        .order_by("id")[:limit]
+    )
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from production.auth import clear_user_cache
+
+
+SESSION_BACKENDS = ["db", "cached_db", "signed_cookies"]
+ENDPOINTS = ["/api/whoami/", "/api/dashboard/"]
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measures DB queries per authenticated request for each session backend (changes are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=3, help="Requests per endpoint (first one warms caches)")
+
+    def handle(self, *args, **options):
+        rows = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(username="__bench_auth__", password=None)
+                for backend in SESSION_BACKENDS:
+                    for ttl in (0, 5):
+                        rows.append(self._measure(user, backend, ttl, options["requests"]))
+                raise _Rollback
+        except _Rollback:
+            pass
+        clear_user_cache()
+
+        self.stdout.write(f"{'session':<16}{'user cache':<12}" + "".join(f"{e:<22}" for e in ENDPOINTS))
+        for backend, ttl, counts in rows:
+            cells = "".join(f"{'/'.join(str(c) for c in counts[e]):<22}" for e in ENDPOINTS)
+            self.stdout.write(f"{backend:<16}{('on' if ttl else 'off'):<12}{cells}")
+        self.stdout.write("Values are query counts per request (first/warm...).")
+
+    def _measure(self, user, backend, ttl, n):
+        clear_user_cache()
+        engine = f"django.contrib.sessions.backends.{backend}"
+        counts = {}
+        with override_settings(SESSION_ENGINE=engine, AUTH_USER_CACHE_TTL=ttl):
+            client = Client()
+            client.force_login(user)
+            for url in ENDPOINTS:
+                counts[url] = []
+                for _ in range(n):
+                    with CaptureQueriesContext(connection) as ctx:
+                        client.get(url, secure=True)
+                    counts[url].append(len(ctx.captured_queries))
+        return backend, ttl, counts
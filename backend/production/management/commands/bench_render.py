@@ -0,0 +1,40 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from production.builders import build_activity_logs, build_dashboard, build_machine_detail
+from production.models import Machine
+from production.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+
+
+class Command(BaseCommand):
+    help = "Compares render time and bytes on the wire (raw/gzip) per endpoint for each API renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        payloads = {"dashboard": build_dashboard(), "activity_logs": build_activity_logs()}
+        machine = Machine.objects.order_by("order_in_line").first()
+        if machine:
+            payloads["machine_detail"] = build_machine_detail(machine)
+
+        renderers = [("drf-json", JSONRenderer())]
+        if orjson is not None:
+            renderers.append(("orjson", ORJSONRenderer()))
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+
+        n = options["iterations"]
+        self.stdout.write(f"{'endpoint':<16}{'renderer':<12}{'us/render':>12}{'bytes':>10}{'gzip':>10}")
+        for endpoint, data in payloads.items():
+            for name, renderer in renderers:
+                start = time.perf_counter()
+                for _ in range(n):
+                    body = renderer.render(data)
+                elapsed_us = (time.perf_counter() - start) / n * 1e6
+                self.stdout.write(
+                    f"{endpoint:<16}{name:<12}{elapsed_us:>12.1f}{len(body):>10}{len(gzip.compress(body)):>10}"
+                )
@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from production.builders import absence_rows, activity_log_rows, advance_rows
+from production.history import tool_change_batch_rows, work_session_rows
+from production.models import (
+    Absence,
+    ActivityLog,
+    Advance,
+    Machine,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    WorkSession,
+)
+from production.renderers import ORJSONRenderer
+from production.serializers import (
+    AbsenceSerializer,
+    ActivityLogSerializer,
+    AdvanceSerializer,
+    ToolChangeBatchSerializer,
+    WorkSessionSerializer,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares ModelSerializer vs ValuesSerializer output and speed for list endpoints. "
+        "With --rows, synthetic rows are inserted first and rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000, help="Synthetic rows per model (0 = use existing data)")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options["rows"]:
+                    self._seed(options["rows"])
+                self._run()
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _seed(self, n):
+        machine = Machine.objects.filter(tool_types__isnull=False).first()
+        if machine is None:
+            raise CommandError("Run seed_production first (needs a machine with tool types).")
+        tool_type = machine.tool_types.first()
+        user = User.objects.create_user(username="__bench_serializers__", password=None)
+        now = timezone.now()
+        ActivityLog.objects.bulk_create(
+            ActivityLog(user=user if i % 2 else None, action="tool_change", machine=machine, details=f"bench {i}")
+            for i in range(n)
+        )
+        WorkSession.objects.bulk_create(
+            WorkSession(user=user, machine=machine, start_time=now - timedelta(hours=i + 1), end_time=now - timedelta(hours=i), produced_count=i)
+            for i in range(n)
+        )
+        batches = ToolChangeBatch.objects.bulk_create(
+            ToolChangeBatch(machine=machine, changed_by=user if i % 2 else None, current_counter=i) for i in range(n)
+        )
+        ToolChangeBatchItem.objects.bulk_create(ToolChangeBatchItem(batch=b, tool_type=tool_type) for b in batches)
+        Absence.objects.bulk_create(
+            Absence(user=user, absence_date=now.date() - timedelta(days=i), recorded_by=user if i % 2 else None)
+            for i in range(n)
+        )
+        Advance.objects.bulk_create(
+            Advance(user=user, amount=Decimal("100.25") + i, date=now.date() - timedelta(days=i), recorded_by=user)
+            for i in range(n)
+        )
+
+    def _run(self):
+        cases = [
+            ("ActivityLog", ActivityLogSerializer, activity_log_rows,
+             ActivityLog.objects.select_related("user", "machine")),
+            ("WorkSession", WorkSessionSerializer, work_session_rows,
+             WorkSession.objects.select_related("user", "machine").order_by("-end_time")),
+            ("ToolChangeBatch", ToolChangeBatchSerializer, tool_change_batch_rows,
+             ToolChangeBatch.objects.select_related("changed_by").prefetch_related("items", "items__tool_type").order_by("-timestamp")),
+            ("Absence", AbsenceSerializer, absence_rows,
+             Absence.objects.select_related("user", "recorded_by")),
+            ("Advance", AdvanceSerializer, advance_rows,
+             Advance.objects.select_related("user", "recorded_by")),
+        ]
+        renderer = ORJSONRenderer()
+        self.stdout.write(f"{'serializer':<18}{'rows':>7}{'model ms':>11}{'values ms':>11}{'speedup':>9}  same output")
+        for name, serializer_class, fast, queryset in cases:
+            start = time.perf_counter()
+            expected = serializer_class(queryset.all(), many=True).data
+            model_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            actual = fast.serialize(queryset.all())
+            values_ms = (time.perf_counter() - start) * 1000
+
+            same = renderer.render(expected) == renderer.render(actual)
+            speedup = model_ms / values_ms if values_ms else 0
+            self.stdout.write(f"{name:<18}{len(actual):>7}{model_ms:>11.1f}{values_ms:>11.1f}{speedup:>8.1f}x  {same}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from production.payroll import add_months, close_months, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Stores payroll totals for closed months that are not stored yet. "
+        "Run at the start of each month so month-end reports do not compute on first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12, help="How many closed months back to check")
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.localdate())
+        months = [add_months(current, -i) for i in range(1, options["months"] + 1)]
+        closed = close_months(months)
+        if closed:
+            self.stdout.write(self.style.SUCCESS("Closed: " + ", ".join(m.strftime("%Y-%m") for m in closed)))
+        else:
+            self.stdout.write("Nothing to close")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from production.outbox import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes change-feed events older than --days that every registered consumer has acknowledged. "
+        "Run daily so the outbox table stays small."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Keep events newer than this many days")
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f"Deleted {prune(options['days'])} events"))
@@ -0,0 +1,25 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from production.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued background jobs (see production/jobs.py). "
+        "Keep one running next to the web process; SIGTERM lets running jobs finish before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=1, help="Jobs run in parallel (threads)")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker = Worker(concurrency=max(1, options["concurrency"]), poll_interval=options["poll"])
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.name} started ({worker.concurrency} threads)")
+        worker.run(once=options["once"])
+        self.stdout.write("Worker stopped")
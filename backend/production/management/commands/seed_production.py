@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from production.models import Machine, ToolType
+from production.models import Line, Machine, Plant, ToolType
 
 
 MACHINES_WITH_TOOLS = [
@@ -65,12 +65,17 @@ class Command(BaseCommand):
         created_or_updated = 0
         tooltype_created = 0
 
+        # Tohum makineleri varsayılan tesis / hatta (bkz. migration 0013_default_line)
+        plant, _ = Plant.objects.get_or_create(code="P1", defaults={"name": "Ana Tesis"})
+        line, _ = Line.objects.get_or_create(plant=plant, code="L1", defaults={"name": "Hat 1"})
+
         for spec in MACHINES_WITH_TOOLS:
             machine, _ = Machine.objects.update_or_create(
                 name=spec["name"],
                 defaults={
                     "short_name": spec["short_name"],
                     "order_in_line": spec["order_in_line"],
+                    "line": line,
                     "is_active": True,
                 },
             )
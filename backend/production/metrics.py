@@ -0,0 +1,165 @@
+"""
+Prometheus metrikleri (/api/metrics/).
+
+gunicorn birden çok worker süreciyle çalışır. PROMETHEUS_MULTIPROC_DIR
+tanımlıysa (start.sh) her süreç sayaçlarını o dizindeki mmap dosyalarına
+yazar ve /api/metrics/ isteğini karşılayan worker hepsini birleştirir
+(prometheus_client multiprocess modu); tanımlı değilse (runserver)
+metrikler süreç içindedir. İş göstergeleri (stok, bugünkü sayaç, iş
+kuyruğu, outbox gecikmesi) sayaç değildir, her okumada veritabanından
+(varsa replikadan) hesaplanır. prometheus-client kurulu değilse metrikler
+kapalıdır.
+"""
+import os
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from .models import DailyProduction, Job, Machine, MaterialEntry, MaterialShipment, MaterialType, OutboxConsumer, OutboxEvent
+from .routers import read_replica
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    CollectorRegistry = None
+
+ENABLED = CollectorRegistry is not None
+CONTENT_TYPE = CONTENT_TYPE_LATEST if ENABLED else "text/plain"
+
+# Eşleşmeyen yollar (404, yük atma) tek etiket altında toplanır; etiket sayısı sınırlı kalır
+UNMATCHED_ROUTE = "<unmatched>"
+
+if ENABLED:
+    REQUEST_LATENCY = Histogram(
+        "http_request_duration_seconds", "API request latency", ["method", "route"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    REQUESTS = Counter("http_requests", "API responses by status", ["method", "route", "status"])
+    DB_QUERIES = Counter("db_queries", "SQL queries executed while handling requests", ["route", "db"])
+    DB_QUERY_SECONDS = Counter("db_query_seconds", "Time spent in SQL while handling requests", ["route", "db"])
+    CACHE_LOOKUPS = Counter("api_cache_lookups", "Versioned cache lookups (caching.cached)", ["group", "result"])
+    REFDATA_LOOKUPS = Counter("refdata_lookups", "Reference-data ids resolved per worker (refdata.py)", ["model", "result"])
+    REFDATA_EVICTIONS = Counter("refdata_evictions", "Reference-data entries dropped because the table was full", ["model"])
+    STOCK_ALERTS = Counter("stock_alert_transitions", "Low-stock alerts opened / resolved (stock.py)", ["state"])
+
+
+def route_of(request):
+    match = getattr(request, "resolver_match", None)
+    return "/" + match.route if match is not None and match.route else UNMATCHED_ROUTE
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            alias = context["connection"].alias
+            count, seconds = self.counts.get(alias, (0, 0.0))
+            self.counts[alias] = (count + 1, seconds + time.perf_counter() - start)
+
+
+def observe_request(request, get_response):
+    """Call get_response(request) and record latency, status and SQL usage for its route."""
+    queries = _QueryCounter()
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(queries))
+        response = get_response(request)
+    elapsed = time.perf_counter() - start
+
+    route = route_of(request)
+    REQUEST_LATENCY.labels(request.method, route).observe(elapsed)
+    REQUESTS.labels(request.method, route, str(response.status_code)).inc()
+    for alias, (count, seconds) in queries.counts.items():
+        DB_QUERIES.labels(route, alias).inc(count)
+        DB_QUERY_SECONDS.labels(route, alias).inc(seconds)
+    return response
+
+
+def cache_lookup(group, hit):
+    if ENABLED:
+        CACHE_LOOKUPS.labels(group, "hit" if hit else "miss").inc()
+
+
+def refdata_lookup(model, hits, misses):
+    if ENABLED:
+        if hits:
+            REFDATA_LOOKUPS.labels(model, "hit").inc(hits)
+        if misses:
+            REFDATA_LOOKUPS.labels(model, "miss").inc(misses)
+
+
+def refdata_eviction(model, count):
+    if ENABLED:
+        REFDATA_EVICTIONS.labels(model).inc(count)
+
+
+def stock_alert(state):
+    if ENABLED:
+        STOCK_ALERTS.labels(state).inc()
+
+
+class BusinessCollector:
+    """Gauges computed from the database at scrape time (never cached per process)."""
+
+    def collect(self):
+        with read_replica():
+            return [self._stock(), self._today_counts(), *self._backlogs()]
+
+    def _stock(self):
+        gauge = GaugeMetricFamily(
+            "production_material_stock_boxes", "Boxes in stock per material (entries - shipments)",
+            labels=["material_id", "material"],
+        )
+        entries = dict(MaterialEntry.objects.values_list("material_type").annotate(total=Sum("boxes_count")).order_by())
+        shipments = dict(MaterialShipment.objects.values_list("material_type").annotate(total=Sum("boxes_count")).order_by())
+        for material_id, name in MaterialType.objects.filter(is_active=True).values_list("id", "name"):
+            gauge.add_metric([str(material_id), name], (entries.get(material_id) or 0) - (shipments.get(material_id) or 0))
+        return gauge
+
+    def _today_counts(self):
+        gauge = GaugeMetricFamily(
+            "production_today_count", "Latest counter recorded today per machine", labels=["machine_id", "machine"],
+        )
+        # Gün içinde her kayıt sayacın o anki değeridir; en son kayıt geçerli
+        latest = dict(
+            DailyProduction.objects.filter(date=timezone.localdate())
+            .order_by("machine_id", "id").values_list("machine_id", "total_count")
+        )
+        for machine_id, short_name in Machine.objects.filter(is_active=True).values_list("id", "short_name"):
+            gauge.add_metric([str(machine_id), short_name], latest.get(machine_id, 0))
+        return gauge
+
+    def _backlogs(self):
+        jobs = GaugeMetricFamily("jobs", "Background jobs by status (queued = queue depth)", labels=["status"])
+        for status in ("queued", "running"):
+            jobs.add_metric([status], Job.objects.filter(status=status).count())
+
+        last_event = OutboxEvent.objects.aggregate(last=Max("id"))["last"] or 0
+        slowest = OutboxConsumer.objects.aggregate(position=Min("position"))["position"]
+        lag = GaugeMetricFamily(
+            "outbox_consumer_lag_events", "Change-feed events not yet acknowledged by the slowest consumer",
+            value=max(last_event - slowest, 0) if slowest is not None else 0,
+        )
+        return jobs, lag
+
+
+def render():
+    """Metrics text for the endpoint: request metrics of every worker plus the business gauges."""
+    registry = CollectorRegistry()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    registry.register(BusinessCollector())
+    return generate_latest(registry)
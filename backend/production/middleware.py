@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+
+from . import metrics
+from .jobs import enqueue
+from .profiling import profile_request, requested
+from .routers import STICKY_COOKIE, replica_configured
+from .slowlog import SlowQueryCollector, record as record_slow_queries
+
+
+logger = logging.getLogger(__name__)
+
+
+class ThresholdGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware whose minimum body size comes from settings.GZIP_MIN_LENGTH."""
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < getattr(settings, "GZIP_MIN_LENGTH", 200):
+            return response
+        return super().process_response(request, response)
+
+
+class LoadSheddingMiddleware:
+    """
+    Reject requests with 503 + Retry-After while the worker is overloaded.
+
+    Overloaded means LOAD_SHED_MAX_IN_FLIGHT requests are already being handled
+    by this worker, or the request waited more than LOAD_SHED_MAX_QUEUE_MS in
+    front of it according to the proxy's X-Request-Start header
+    ("t=<unix time in ms, µs or s>" or a bare number). Health checks are never shed.
+    Not loaded at all while both limits are 0 (the default).
+    """
+
+    exempt_paths = ("/api/health/", "/api/metrics/")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_in_flight = getattr(settings, "LOAD_SHED_MAX_IN_FLIGHT", 0)
+        self.max_queue_ms = getattr(settings, "LOAD_SHED_MAX_QUEUE_MS", 0)
+        self.retry_after = getattr(settings, "LOAD_SHED_RETRY_AFTER", 5)
+        if not (self.max_in_flight or self.max_queue_ms):
+            raise MiddlewareNotUsed
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def __call__(self, request):
+        if request.path in self.exempt_paths:
+            return self.get_response(request)
+        if self.max_queue_ms and self._queue_ms(request) > self.max_queue_ms:
+            return self._shed()
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return self._shed()
+            self.in_flight += 1
+        try:
+            return self.get_response(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def _queue_ms(request):
+        header = request.META.get("HTTP_X_REQUEST_START", "")
+        try:
+            start = float(header.removeprefix("t="))
+        except ValueError:
+            return 0
+        # Proxy'ye göre saniye, milisaniye ya da mikrosaniye olabilir
+        while start > 1e11:
+            start /= 1000
+        if start < 1e10:
+            start *= 1000
+        return time.time() * 1000 - start
+
+    def _shed(self):
+        response = JsonResponse({"detail": "Sunucu yoğun, lütfen biraz sonra tekrar deneyin"}, status=503)
+        response["Retry-After"] = str(self.retry_after)
+        return response
+
+
+class StickyPrimaryMiddleware:
+    """
+    After a successful write, pin the client to the primary for REPLICA_STICKY_SECONDS
+    (short-lived cookie read by routers.read_replica) so it reads its own writes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            replica_configured()
+            and request.method not in ("GET", "HEAD", "OPTIONS", "TRACE")
+            and response.status_code < 400
+        ):
+            response.set_cookie(STICKY_COOKIE, "1", max_age=self.seconds, httponly=True, samesite="Lax")
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile the request (cProfile + SQL timeline, see profiling.py) when an admin asks
+    for it with `X-Profile: 1` or `?_profile=1`. Needs AuthenticationMiddleware above it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not requested(request) or not (request.user.is_staff or request.user.is_superuser):
+            return self.get_response(request)
+        response = profile_request(request, self.get_response)
+        if response is None:
+            response = self.get_response(request)
+            response["X-Profile-Id"] = "busy"
+        return response
+
+
+class MetricsMiddleware:
+    """Per-route latency, status and SQL metrics (see metrics.py); no-op without prometheus-client."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.ENABLED:
+            return self.get_response(request)
+        return metrics.observe_request(request, self.get_response)
+
+
+class SlowQueryMiddleware:
+    """
+    Log queries slower than SLOW_QUERY_MS with the view that ran them (see slowlog.py).
+    New query shapes get their EXPLAIN plan from a background job. SLOW_QUERY_MS=0 turns it off.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold_ms = getattr(settings, "SLOW_QUERY_MS", 0)
+
+    def __call__(self, request):
+        if not self.threshold_ms:
+            return self.get_response(request)
+        collector = SlowQueryCollector(self.threshold_ms)
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(collector))
+            response = self.get_response(request)
+        if collector.slow:
+            match = request.resolver_match
+            try:
+                for query_id in record_slow_queries(collector.slow, match._func_path if match else request.path):
+                    enqueue("capture_query_plan", {"query_id": query_id})
+            except DatabaseError:
+                # Kayıt yazılamasa da yanıt kullanıcıya gitsin
+                logger.warning("slow query log write failed", exc_info=True)
+        return response
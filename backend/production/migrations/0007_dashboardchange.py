@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0006_advance_absence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card', models.CharField(choices=[('machine', 'Machine'), ('material', 'Material')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['card', 'object_id'], name='production__card_0ef077_idx')],
+            },
+        ),
+    ]
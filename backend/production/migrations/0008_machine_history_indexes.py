@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0007_dashboardchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailyproduction',
+            index=models.Index(fields=['machine', '-date', '-id'], name='production__machine_7b647e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='toolchangebatch',
+            index=models.Index(fields=['machine', '-timestamp', '-id'], name='production__machine_4ae822_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worksession',
+            index=models.Index(fields=['machine', '-end_time', '-id'], name='production__machine_6a574e_idx'),
+        ),
+    ]
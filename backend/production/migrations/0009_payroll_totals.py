@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0008_machine_history_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Ayın ilk günü', unique=True)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PayrollTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('advance_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('absence_days', models.PositiveIntegerField(default=0)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='totals', to='production.payrollmonth')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payroll_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'user'), name='unique_payroll_total')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Kullanıcı dizini araması (bkz. builders.build_personnel_users) için auth_user indeksleri.
+# PostgreSQL: aramada kullanılan UPPER(col) LIKE '%...%' için trigram GIN indeksleri.
+# SQLite: öneki arayan LIKE 'x%' (büyük/küçük harf duyarsız) için NOCASE indeksleri.
+SEARCH_COLUMNS = ("username", "first_name", "last_name")
+
+
+def create_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS production_user_{column}_trgm "
+                f"ON auth_user USING gin (UPPER({column}::text) gin_trgm_ops)"
+            )
+    elif vendor == "sqlite":
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS production_user_{column}_nocase ON auth_user ({column} COLLATE NOCASE)"
+            )
+
+
+def drop_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    suffix = {"postgresql": "trgm", "sqlite": "nocase"}.get(vendor)
+    if suffix is None:
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS production_user_{column}_{suffix}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("production", "0009_payroll_totals"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
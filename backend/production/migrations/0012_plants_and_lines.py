@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0011_device_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Line',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(max_length=20)),
+                ('order_in_plant', models.IntegerField(default=0)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Plant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='devicetoken',
+            name='line',
+            field=models.ForeignKey(blank=True, help_text='Tablet bu hatta aittir; istekler varsayılan olarak bu hatta süzülür', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='devices', to='production.line'),
+        ),
+        migrations.AddField(
+            model_name='machine',
+            name='line',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='machines', to='production.line'),
+        ),
+        migrations.AddField(
+            model_name='materialtype',
+            name='line',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='material_types', to='production.line'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['line', 'is_active', 'order_in_line'], name='production__line_id_89b5d8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialtype',
+            index=models.Index(fields=['line', 'is_active'], name='production__line_id_12feeb_idx'),
+        ),
+        migrations.AddField(
+            model_name='line',
+            name='plant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='production.plant'),
+        ),
+        migrations.AddConstraint(
+            model_name='line',
+            constraint=models.UniqueConstraint(fields=('plant', 'code'), name='unique_line_code_per_plant'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def assign_default_line(apps, schema_editor):
+    # Mevcut kurulum tek hattır: var olan makineler varsayılan tesis/hatta taşınır.
+    # Malzemeler hatsız (tüm hatlarda ortak) kalır.
+    Plant = apps.get_model("production", "Plant")
+    Line = apps.get_model("production", "Line")
+    Machine = apps.get_model("production", "Machine")
+    if not Machine.objects.filter(line__isnull=True).exists():
+        return
+    plant, _ = Plant.objects.get_or_create(code="P1", defaults={"name": "Ana Tesis"})
+    line, _ = Line.objects.get_or_create(plant=plant, code="L1", defaults={"name": "Hat 1"})
+    Machine.objects.filter(line__isnull=True).update(line=line)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("production", "0012_plants_and_lines"),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_line, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0016_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('db', models.CharField(max_length=50)),
+                ('sql', models.TextField(help_text='Parametreleri ve IN listeleri sadeleştirilmiş SQL')),
+                ('example', models.TextField(help_text='Son yavaş çalışmanın parametreli hali (EXPLAIN için)')),
+                ('view', models.CharField(blank=True, default='', help_text='Sorguyu son çalıştıran view', max_length=200)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField()),
+                ('plan', models.TextField(blank=True, default='')),
+                ('plan_captured_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0017_slow_queries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ('start_time',),
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftOperatorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shift_date', models.DateField(help_text='Vardiyanın başladığı gün')),
+                ('work_sessions', models.PositiveIntegerField(default=0)),
+                ('work_seconds', models.PositiveIntegerField(default=0)),
+                ('produced_count', models.IntegerField(default=0)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_operator_rollups', to='production.machine')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operator_rollups', to='production.shift')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shift_date', 'shift'], name='production__shift_d_5d5e29_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'machine', 'shift', 'shift_date'), name='unique_shift_operator_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShiftRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shift_date', models.DateField(help_text='Vardiyanın başladığı gün')),
+                ('produced_count', models.IntegerField(default=0)),
+                ('tool_changes', models.PositiveIntegerField(default=0)),
+                ('tool_items', models.PositiveIntegerField(default=0)),
+                ('work_sessions', models.PositiveIntegerField(default=0)),
+                ('work_seconds', models.PositiveIntegerField(default=0)),
+                ('session_produced', models.IntegerField(default=0)),
+                ('machine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shift_rollups', to='production.machine')),
+                ('shift', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='production.shift')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['shift_date', 'shift'], name='production__shift_d_ef3bb6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('machine', 'shift', 'shift_date'), name='unique_shift_rollup')],
+            },
+        ),
+    ]
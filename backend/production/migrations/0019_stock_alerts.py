@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0018_shifts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialtype',
+            name='reorder_level',
+            field=models.PositiveIntegerField(blank=True, help_text='Adet; boş bırakılırsa uyarı verilmez', null=True),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_units', models.IntegerField()),
+                ('reorder_level', models.PositiveIntegerField()),
+                ('opened_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('material_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='production.materialtype')),
+            ],
+            options={
+                'ordering': ['-opened_at'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('material_type',), name='unique_open_stock_alert')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0019_stock_alerts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipmentAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='materialentry',
+            name='remaining_units',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='materialshipment',
+            name='unallocated_units',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='materialentry',
+            index=models.Index(condition=models.Q(('remaining_units__gt', 0)), fields=['material_type', 'id'], name='open_lots'),
+        ),
+        migrations.AddField(
+            model_name='shipmentallocation',
+            name='lot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, related_name='allocations', to='production.materialentry'),
+        ),
+        migrations.AddField(
+            model_name='shipmentallocation',
+            name='shipment',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='production.materialshipment'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def backfill_lots(apps, schema_editor):
+    # Geçmiş giriş/çıkışlar kronolojik sırayla yeniden oynatılır: her çıkış, o ana
+    # kadar girilmiş lotlardan FIFO ile düşülür; karşılığı olmayan kısım unallocated_units olur.
+    MaterialType = apps.get_model("production", "MaterialType")
+    MaterialEntry = apps.get_model("production", "MaterialEntry")
+    MaterialShipment = apps.get_model("production", "MaterialShipment")
+    ShipmentAllocation = apps.get_model("production", "ShipmentAllocation")
+    for material_id in MaterialType.objects.values_list("id", flat=True).iterator():
+        entries = list(MaterialEntry.objects.filter(material_type_id=material_id).order_by("created_at", "id"))
+        shipments = list(MaterialShipment.objects.filter(material_type_id=material_id).order_by("created_at", "id"))
+        if not entries and not shipments:
+            continue
+        for entry in entries:
+            entry.remaining_units = max(entry.boxes_count * entry.units_per_box, 0)
+        allocations = []
+        open_lots = 0
+        for shipment in shipments:
+            needed = max(shipment.boxes_count * shipment.units_per_box, 0)
+            while needed and open_lots < len(entries) and entries[open_lots].created_at <= shipment.created_at:
+                lot = entries[open_lots]
+                units = min(needed, lot.remaining_units)
+                if units:
+                    allocations.append(ShipmentAllocation(shipment=shipment, lot=lot, units=units))
+                    lot.remaining_units -= units
+                    needed -= units
+                if not lot.remaining_units:
+                    open_lots += 1
+            shipment.unallocated_units = needed
+        MaterialEntry.objects.bulk_update(entries, ["remaining_units"], batch_size=500)
+        MaterialShipment.objects.bulk_update(shipments, ["unallocated_units"], batch_size=500)
+        ShipmentAllocation.objects.bulk_create(allocations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("production", "0020_material_lots"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0021_backfill_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('tool_change', 'Tool change'), ('work_session', 'Work session'), ('material_shipment', 'Material shipment'), ('absence', 'Absence'), ('advance', 'Advance'), ('activity', 'Activity log')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('body', models.TextField()),
+                ('machine_id', models.IntegerField(blank=True, null=True)),
+                ('material_type_id', models.IntegerField(blank=True, null=True)),
+                ('user_id', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+from django.db import migrations
+
+
+# Arama belgeleri (bkz. search.py) için tam metin indeksi.
+# PostgreSQL: "turkish" yapılandırmasıyla üretilen tsvector sütunu ve GIN indeksi.
+# SQLite: body'yi içeriği harici FTS5 tablosunda tutan tetikleyiciler.
+TABLE = "production_searchdocument"
+FTS_TABLE = "production_searchdocument_fts"
+
+# belge türü -> (model, metin alanları, zaman alanı, bağlantı alanları)
+SOURCES = {
+    "tool_change": ("ToolChangeBatch", ("note",), "timestamp", ("machine_id",)),
+    "work_session": ("WorkSession", ("note",), "start_time", ("machine_id", "user_id")),
+    "material_shipment": ("MaterialShipment", ("note",), "created_at", ("material_type_id",)),
+    "absence": ("Absence", ("reason", "note"), "created_at", ("user_id",)),
+    "advance": ("Advance", ("note",), "created_at", ("user_id",)),
+    "activity": ("ActivityLog", ("details",), "created_at", ("machine_id", "user_id")),
+}
+
+
+def create_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector "
+            f"GENERATED ALWAYS AS (to_tsvector('turkish', body)) STORED"
+        )
+        schema_editor.execute(f"CREATE INDEX production_search_vector_gin ON {TABLE} USING gin (search_vector)")
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"body, content='{TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {TABLE}_au AFTER UPDATE OF body ON {TABLE} BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, body) VALUES ('delete', old.id, old.body); "
+            f"INSERT INTO {FTS_TABLE}(rowid, body) VALUES (new.id, new.body); END"
+        )
+
+
+def drop_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS production_search_vector_gin")
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+    elif vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def backfill_documents(apps, schema_editor):
+    SearchDocument = apps.get_model("production", "SearchDocument")
+    for kind, (model_name, text_fields, time_field, link_fields) in SOURCES.items():
+        model = apps.get_model("production", model_name)
+        rows = model.objects.values_list("id", time_field, *link_fields, *text_fields).order_by("id")
+        documents = []
+        for row in rows.iterator(chunk_size=2000):
+            pk, created_at = row[:2]
+            links = row[2:2 + len(link_fields)]
+            body = "\n".join(value for value in row[2 + len(link_fields):] if value and value.strip())
+            if body:
+                documents.append(SearchDocument(
+                    kind=kind, object_id=pk, body=body, created_at=created_at, **dict(zip(link_fields, links)),
+                ))
+            if len(documents) >= 2000:
+                SearchDocument.objects.bulk_create(documents)
+                documents = []
+        SearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("production", "0022_search_documents"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0023_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tooltype',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
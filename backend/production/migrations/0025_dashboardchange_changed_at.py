@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 15:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0024_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardchange',
+            name='changed_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
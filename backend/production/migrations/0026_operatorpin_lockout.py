@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('production', '0025_dashboardchange_changed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='operatorpin',
+            name='failed_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='operatorpin',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
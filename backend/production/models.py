@@ -1,13 +1,46 @@
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 
 
+class Plant(models.Model):
+    """Tesis"""
+    name = models.CharField(max_length=100)
+    code = models.CharField(max_length=20, unique=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Line(models.Model):
+    """Üretim hattı. Makineler ve hatta özel malzemeler bir hatta bağlıdır."""
+    plant = models.ForeignKey(Plant, on_delete=models.CASCADE, related_name="lines")
+    name = models.CharField(max_length=100)
+    code = models.CharField(max_length=20)
+    order_in_plant = models.IntegerField(default=0)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["plant", "code"], name="unique_line_code_per_plant")]
+
+    def __str__(self):
+        return f"{self.plant.code} / {self.name}"
+
+
 class Machine(models.Model):
+    line = models.ForeignKey(Line, on_delete=models.SET_NULL, null=True, blank=True, related_name="machines")
     name = models.CharField(max_length=100)
     short_name = models.CharField(max_length=50)
     order_in_line = models.IntegerField()
     location = models.CharField(max_length=100, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Silinen makine hemen pasif olur; geçmişi arka planda parça parça silinir (bkz. purge.py)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        # Hat bazlı dashboard / makine listesi: (line, is_active, order_in_line)
+        indexes = [models.Index(fields=["line", "is_active", "order_in_line"])]
 
     def __str__(self):
         return self.short_name or self.name
@@ -17,6 +50,7 @@ class ToolType(models.Model):
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name="tool_types")
     name = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.machine.short_name} - {self.name}"
@@ -29,6 +63,10 @@ class ToolChangeBatch(models.Model):
     current_counter = models.IntegerField(blank=True, null=True)
     note = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # Makine geçmişi keyset sayfalama: (machine, timestamp desc, id desc)
+        indexes = [models.Index(fields=["machine", "-timestamp", "-id"])]
+
     def __str__(self):
         return f"{self.machine.short_name} @ {self.timestamp} sayaç={self.current_counter}"
 
@@ -50,6 +88,9 @@ class DailyProduction(models.Model):
     recorded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["machine", "-date", "-id"])]
+
     def __str__(self):
         return f"{self.machine.short_name} - {self.date} : {self.total_count}"
 
@@ -62,6 +103,9 @@ class WorkSession(models.Model):
     produced_count = models.IntegerField(blank=True, null=True)
     note = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["machine", "-end_time", "-id"])]
+
     def __str__(self):
         return f"{self.user} @ {self.machine.short_name} {self.start_time} -> {self.end_time}"
 
@@ -88,21 +132,37 @@ class ActivityLog(models.Model):
 
 # Packaged materials (hazır paketlenmiş malzeme)
 class MaterialType(models.Model):
+    # Boş: tüm hatlarda ortak malzeme
+    line = models.ForeignKey(Line, on_delete=models.SET_NULL, null=True, blank=True, related_name="material_types")
     name = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=50, blank=True, null=True)
     is_active = models.BooleanField(default=True)
+    # Stok (adet) bu değerin altına inince uyarı açılır (bkz. stock.py); boş: uyarı yok
+    reorder_level = models.PositiveIntegerField(null=True, blank=True, help_text="Adet; boş bırakılırsa uyarı verilmez")
+
+    class Meta:
+        indexes = [models.Index(fields=["line", "is_active"])]
 
     def __str__(self):
         return self.name
 
 
 class MaterialEntry(models.Model):
+    """Her giriş bir lottur; çıkışlar lotlardan FIFO ile düşülür (bkz. lots.py)."""
     material_type = models.ForeignKey(MaterialType, on_delete=models.CASCADE, related_name="entries")
     boxes_count = models.IntegerField()  # girilen kutu sayısı
     units_per_box = models.IntegerField(default=1)  # kutu başına adet sayısı (ZORUNLU)
+    # Lotta kalan adet; kayıtta boxes_count * units_per_box olarak başlar
+    remaining_units = models.IntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="material_entries")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Açık lot kuyruğu: malzeme başına FIFO sırasıyla yalnızca stoğu kalan lotlar
+            models.Index(fields=["material_type", "id"], condition=models.Q(remaining_units__gt=0), name="open_lots"),
+        ]
+
     def __str__(self):
         return f"{self.material_type.name} +{self.boxes_count} kutu ({self.boxes_count * self.units_per_box} adet)"
 
@@ -112,12 +172,32 @@ class MaterialShipment(models.Model):
     boxes_count = models.IntegerField()  # giden kutu sayısı
     units_per_box = models.IntegerField(default=1)  # kutu başına adet sayısı (ZORUNLU)
     note = models.CharField(max_length=200, blank=True, null=True)
+    # Çıkış anında lotlarda karşılığı olmayan adet (stok yetersizdi)
+    unallocated_units = models.IntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="material_shipments")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.material_type.name} -{self.boxes_count} kutu ({self.boxes_count * self.units_per_box} adet)"
 
+    def save(self, *args, **kwargs):
+        # Lot dağıtımı pre_save'de lotları kilitler, post_save'de yazar (bkz. lots.py): ikisi tek
+        # transaction'da olmalı. Çağıran zaten transaction içindeyse savepoint açılmaz.
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class ShipmentAllocation(models.Model):
+    """Bir çıkışın hangi lottan kaç adet düştüğü."""
+    shipment = models.ForeignKey(MaterialShipment, on_delete=models.CASCADE, related_name="allocations")
+    # Çıkışa düşülmüş lot tek başına silinemez; malzeme tipiyle birlikte silinebilir
+    lot = models.ForeignKey(MaterialEntry, on_delete=models.RESTRICT, related_name="allocations")
+    units = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"#{self.shipment_id} <- lot #{self.lot_id}: {self.units}"
+
 
 # Personel takip modelleri
 class Absence(models.Model):
@@ -149,4 +229,299 @@ class Advance(models.Model):
         ordering = ["-date"]
 
     def __str__(self):
-        return f"{self.user.username} - {self.amount} TL ({self.date})"
\ No newline at end of file
+        return f"{self.user.username} - {self.amount} TL ({self.date})"
+
+
+class PayrollMonth(models.Model):
+    """Bordro özeti hesaplanıp saklanmış (kapanmış) ay. Silinirse ilk istekte yeniden hesaplanır."""
+    month = models.DateField(unique=True, help_text="Ayın ilk günü")
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.month.strftime("%Y-%m")
+
+
+class PayrollTotal(models.Model):
+    """Kapanmış bir ay için kullanıcı başına avans toplamı ve devamsızlık günü sayısı"""
+    period = models.ForeignKey(PayrollMonth, on_delete=models.CASCADE, related_name="totals")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="payroll_totals")
+    advance_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    absence_days = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["period", "user"], name="unique_payroll_total")]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.period}"
+
+
+class Shift(models.Model):
+    """Vardiya takvimi. Bitiş saati başlangıçtan önceyse vardiya gece yarısını geçer (ör. 22:00–06:00)."""
+    name = models.CharField(max_length=50, unique=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ("start_time",)
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M}–{self.end_time:%H:%M})"
+
+
+class ShiftRollup(models.Model):
+    """Makine başına vardiya toplamları; kayıtlar yazılırken güncellenir (bkz. shifts.py)."""
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name="shift_rollups")
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name="rollups")
+    shift_date = models.DateField(help_text="Vardiyanın başladığı gün")
+    # Sayaç okumaları arasındaki farkların toplamı (DailyProduction)
+    produced_count = models.IntegerField(default=0)
+    tool_changes = models.PositiveIntegerField(default=0)
+    tool_items = models.PositiveIntegerField(default=0)
+    work_sessions = models.PositiveIntegerField(default=0)
+    work_seconds = models.PositiveIntegerField(default=0)
+    # Operatörlerin çalışma kayıtlarında bildirdiği üretim
+    session_produced = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["machine", "shift", "shift_date"], name="unique_shift_rollup")]
+        indexes = [models.Index(fields=["shift_date", "shift"])]
+
+    def __str__(self):
+        return f"{self.machine.short_name} {self.shift_date} {self.shift.name}"
+
+
+class ShiftOperatorRollup(models.Model):
+    """Operatör + makine başına vardiya toplamları (çalışma kayıtlarından)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="shift_rollups")
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name="shift_operator_rollups")
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name="operator_rollups")
+    shift_date = models.DateField(help_text="Vardiyanın başladığı gün")
+    work_sessions = models.PositiveIntegerField(default=0)
+    work_seconds = models.PositiveIntegerField(default=0)
+    produced_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "machine", "shift", "shift_date"], name="unique_shift_operator_rollup")
+        ]
+        indexes = [models.Index(fields=["shift_date", "shift"])]
+
+    def __str__(self):
+        return f"{self.user.username} @ {self.machine.short_name} {self.shift_date} {self.shift.name}"
+
+
+class StockAlert(models.Model):
+    """Düşük stok uyarısı: stok eşiğin altına inince açılır, tekrar çıkınca kapanır (bkz. stock.py)."""
+    material_type = models.ForeignKey(MaterialType, on_delete=models.CASCADE, related_name="stock_alerts")
+    # Son değerlendirmedeki stok (adet) ve eşik
+    stock_units = models.IntegerField()
+    reorder_level = models.PositiveIntegerField()
+    opened_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-opened_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["material_type"], condition=models.Q(resolved_at__isnull=True), name="unique_open_stock_alert"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.material_type.name} {self.stock_units}/{self.reorder_level}"
+
+
+class SearchDocument(models.Model):
+    """
+    Notların ve aktivite detaylarının arama kopyası (bkz. search.py); kaynak
+    kayıtla aynı transaction'da yazılır. Tam metin indeksi veritabanına göre
+    migration'da kurulur: PostgreSQL'de tsvector sütunu + GIN, SQLite'ta FTS5.
+    """
+    KIND_CHOICES = [
+        ("tool_change", "Tool change"),
+        ("work_session", "Work session"),
+        ("material_shipment", "Material shipment"),
+        ("absence", "Absence"),
+        ("advance", "Advance"),
+        ("activity", "Activity log"),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    body = models.TextField()
+    # Sonuçtan ilgili sayfaya bağlantı için (FK değil; kaynak silinince belge de silinir)
+    machine_id = models.IntegerField(null=True, blank=True)
+    material_type_id = models.IntegerField(null=True, blank=True)
+    user_id = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document")]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+
+class DashboardChange(models.Model):
+    """Dashboard kartlarının son değişikliği. id = sürüm; kart başına tek satır tutulur."""
+    CARD_CHOICES = [
+        ("machine", "Machine"),
+        ("material", "Material"),
+    ]
+    card = models.CharField(max_length=20, choices=CARD_CHOICES)
+    object_id = models.BigIntegerField()
+    # İstemciye verilen sürüm yalnızca DASHBOARD_SETTLE_SECONDS'dan eski satırları geçer (bkz. changes.py)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["card", "object_id"])]
+
+    def __str__(self):
+        return f"{self.card}:{self.object_id} v{self.id}"
+
+
+class DeviceToken(models.Model):
+    """Atölye tabletleri için uzun ömürlü API anahtarı. Anahtarın kendisi saklanmaz, SHA-256 özeti saklanır."""
+    name = models.CharField(max_length=100)
+    key_prefix = models.CharField(max_length=8, help_text="Anahtarın ilk karakterleri (tanımak için)")
+    key_hash = models.CharField(max_length=64, unique=True)
+    current_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="devices")
+    line = models.ForeignKey(Line, on_delete=models.SET_NULL, null=True, blank=True, related_name="devices",
+                             help_text="Tablet bu hatta aittir; istekler varsayılan olarak bu hatta süzülür")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="created_devices")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.key_prefix}…)"
+
+
+class OperatorPin(models.Model):
+    """Tablette operatör değiştirmek için kısa PIN (HMAC özeti; parola hash'i çalıştırılmaz)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name="operator_pin")
+    pin_hash = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Hangi tabletten gelirse gelsin kullanıcı başına hatalı deneme sayısı (bkz. devices.py)
+    failed_attempts = models.PositiveIntegerField(default=0)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.user.username
+
+
+class OutboxEvent(models.Model):
+    """Dış sistemler (MES/ERP) için değişiklik akışı. Kaydı değiştiren işlemle aynı transaction'da yazılır; id = akış sırası."""
+    ACTION_CHOICES = [
+        ("created", "Created"),
+        ("updated", "Updated"),
+        ("deleted", "Deleted"),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=50)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # ?topics= ile süzülen akış okuması: konu içinde id aralığı
+            models.Index(fields=["topic", "id"], name="outbox_topic_id_idx"),
+            models.Index(fields=["created_at"], name="outbox_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.topic} {self.action} {self.object_id}"
+
+
+class OutboxConsumer(models.Model):
+    """Değişiklik akışını okuyan bir entegrasyonun kalıcı imleci (son işlenen olay id'si)"""
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+
+class Job(models.Model):
+    """Arka plan işi (bkz. jobs.py); run_jobs komutu kuyruktan alıp çalıştırır."""
+    STATUS_CHOICES = [
+        ("queued", "Sırada"),
+        ("running", "Çalışıyor"),
+        ("succeeded", "Tamamlandı"),
+        ("failed", "Hata"),
+        ("cancelled", "İptal"),
+    ]
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="queued")
+    progress = models.PositiveSmallIntegerField(default=0, help_text="0-100")
+    message = models.CharField(max_length=200, blank=True, default="")
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(help_text="Bu zamandan önce alınmaz (yeniden denemelerde ertelenir)")
+    locked_by = models.CharField(max_length=100, blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            # Kuyruktan alma: status=queued, run_after <= now, id sırasıyla
+            models.Index(fields=["status", "run_after", "id"], name="job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.kind} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    """Admin isteğiyle profillenmiş bir istek (bkz. profiling.py); son PROFILE_MAX_ENTRIES kayıt tutulur."""
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="request_profiles")
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    summary = models.TextField(help_text="Kümülatif süreye göre en pahalı fonksiyonlar")
+    sql = models.JSONField(default=list, help_text="[başlangıç ms, süre ms, veritabanı, SQL]")
+    stats = models.BinaryField(help_text="pstats/marshal formatı (.prof)")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-id"]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+class SlowQuery(models.Model):
+    """SLOW_QUERY_MS eşiğini aşan bir sorgu şekli (bkz. slowlog.py); toplam süreye göre en pahalı SLOW_QUERY_MAX_ENTRIES kayıt tutulur."""
+    fingerprint = models.CharField(max_length=40, unique=True)
+    db = models.CharField(max_length=50)
+    sql = models.TextField(help_text="Parametreleri ve IN listeleri sadeleştirilmiş SQL")
+    example = models.TextField(help_text="Son yavaş çalışmanın parametreli hali (EXPLAIN için)")
+    view = models.CharField(max_length=200, blank=True, default="", help_text="Sorguyu son çalıştıran view")
+    calls = models.PositiveIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField()
+    plan = models.TextField(blank=True, default="")
+    plan_captured_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-total_ms"]
+
+    def __str__(self):
+        return f"{self.fingerprint[:8]} {self.view} ({self.calls}x)"
@@ -0,0 +1,138 @@
+"""
+Transactional outbox: dış sistemler için değişiklik akışı.
+
+Alan modellerine yapılan her yazma (bkz. signals.py) aynı transaction
+içinde OutboxEvent'e bir satır ekler; yazma geri alınırsa olay da geri
+alınır. Tüketiciler `id > imleç` aralığını büyük partiler halinde okur
+(birincil anahtar üzerinde aralık taraması) ve imleci ya kendileri tutar
+ya da OutboxConsumer'a kaydeder.
+
+id'ler insert sırasında verilir ama transaction'lar farklı sırada commit
+olabilir; daha küçük id'li bir olay daha sonra görünür hale gelebilir.
+Bu yüzden akış yalnızca OUTBOX_SETTLE_SECONDS'dan eski olayları verir.
+
+Pencereden uzun açık kalan bir transaction'ın olayı, tüketici imleci onu
+geçtikten sonra görünür ve hiç okunmazdı. PostgreSQL'de akış ayrıca hâlâ
+açık olan en eski transaction'ın başlangıcında durur (pg_stat_activity):
+bir olay kendi transaction'ından eski olamaz, dolayısıyla geç commit
+olayı atlatmaz, yalnızca akışı geciktirir. "idle in transaction" kalan
+bağlantılar ve birincilde uzun süren okumalar (ör. pg_dump) akışı o süre
+boyunca bekletir; idle_in_transaction_session_timeout ayarlanmalıdır.
+SQLite'ta yazmalar zaten sıralıdır; diğer veritabanlarında yalnızca
+pencere geçerlidir, pencere en uzun yazma transaction'ından büyük tutulmalı.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import (
+    Machine,
+    ToolType,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    DailyProduction,
+    WorkSession,
+    MaterialEntry,
+    MaterialShipment,
+    Absence,
+    Advance,
+    StockAlert,
+    OutboxEvent,
+    OutboxConsumer,
+)
+
+
+# model -> akıştaki konu adı
+TOPICS = {
+    Machine: "machine",
+    ToolType: "tool_type",
+    ToolChangeBatch: "tool_change",
+    ToolChangeBatchItem: "tool_change_item",
+    DailyProduction: "daily_production",
+    WorkSession: "work_session",
+    MaterialEntry: "material_entry",
+    MaterialShipment: "material_shipment",
+    Absence: "absence",
+    Advance: "advance",
+    StockAlert: "stock_alert",
+}
+
+
+def _payload(instance):
+    # Yabancı anahtarlar *_id olarak; değerleri DjangoJSONEncoder çevirir
+    return {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+
+
+def _event(instance, action):
+    return OutboxEvent(
+        topic=TOPICS[type(instance)], action=action, object_id=instance.pk, payload=_payload(instance)
+    )
+
+
+def record(instance, action):
+    _event(instance, action).save()
+
+
+def record_many(instances, action):
+    """For bulk_create / queryset.update(), which send no signals."""
+    OutboxEvent.objects.bulk_create([_event(instance, action) for instance in instances])
+
+
+def _oldest_open_transaction():
+    """Start time of the oldest other transaction still open on the primary (PostgreSQL only), or None."""
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+def read_feed(after, limit, topics=None):
+    """
+    Events with id > after, oldest first: (rows, next_after, has_more).
+    Rows are plain dicts ready for the renderer.
+    """
+    settle = timedelta(seconds=getattr(settings, "OUTBOX_SETTLE_SECONDS", 2))
+    until = timezone.now() - settle
+    oldest_open = _oldest_open_transaction()
+    if oldest_open is not None and oldest_open < until:
+        until = oldest_open
+    events = OutboxEvent.objects.filter(id__gt=after, created_at__lt=until)
+    if topics:
+        events = events.filter(topic__in=topics)
+    rows = list(
+        events.order_by("id").values("id", "topic", "action", "object_id", "payload", "created_at")[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1]["id"] if rows else after), has_more
+
+
+def consumer_position(name):
+    return OutboxConsumer.objects.filter(name=name).values_list("position", flat=True).first() or 0
+
+
+def ack(name, position):
+    """Move a consumer's cursor forward (never backwards) and return the stored position."""
+    consumer, _ = OutboxConsumer.objects.get_or_create(name=name)
+    OutboxConsumer.objects.filter(pk=consumer.pk, position__lt=position).update(
+        position=position, updated_at=timezone.now()
+    )
+    return OutboxConsumer.objects.filter(pk=consumer.pk).values_list("position", flat=True).get()
+
+
+def prune(days):
+    """Delete events older than `days` that every registered consumer has acknowledged; returns the count."""
+    events = OutboxEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days))
+    # Kayıtlı bir tüketicinin henüz okumadığı olaylar silinmez
+    slowest = OutboxConsumer.objects.aggregate(position=Min("position"))["position"]
+    if slowest is not None:
+        events = events.filter(id__lte=slowest)
+    deleted, _ = events.delete()
+    return deleted
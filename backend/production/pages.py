@@ -0,0 +1,87 @@
+"""
+HTML sayfaları için bootstrap verisi.
+
+Sayfalar ilk açılışta whoami, dashboard vb. API'leri ayrı ayrı çağırmak
+yerine, ihtiyaç duydukları veriyi render edilmiş HTML içinde
+<script id="bootstrap-data" type="application/json"> olarak bulur.
+Veri, API view'larının kullandığı builders.py fonksiyonlarıyla üretilir.
+"""
+from django.utils.html import json_script
+from django.views.generic import TemplateView
+from rest_framework.utils.encoders import JSONEncoder
+
+from .builders import (
+    is_admin,
+    build_whoami,
+    build_dashboard,
+    build_machines,
+    build_machine_detail,
+    build_material_detail,
+    build_activity_logs,
+    build_absences,
+    build_advances,
+    build_personnel_users,
+    build_payroll_summary,
+)
+from .models import Machine, MaterialType
+
+
+def _line_id(request):
+    # Sayfa ?line=<id> ile açıldıysa API çağrılarıyla aynı süzme; geçersiz değer yok sayılır
+    try:
+        return int(request.GET["line"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _machine_detail(request, machine_id=None, **kwargs):
+    machine = Machine.objects.filter(id=machine_id, deleted_at__isnull=True).first()
+    return build_machine_detail(machine) if machine else None
+
+
+def _material_detail(request, material_id=None, **kwargs):
+    material = MaterialType.objects.filter(id=material_id).first()
+    return build_material_detail(material) if material else None
+
+
+def _admin_only(builder):
+    def section(request, **kwargs):
+        return builder() if is_admin(request.user) else None
+    return section
+
+
+# bölüm adı -> (request, **url_kwargs) alıp veri (ya da None) döndüren fonksiyon
+BOOTSTRAP_SECTIONS = {
+    "dashboard": lambda request, **kwargs: build_dashboard(line_id=_line_id(request)),
+    "machines": lambda request, **kwargs: build_machines(_line_id(request)),
+    "machine_detail": _machine_detail,
+    "material_detail": _material_detail,
+    "activity_logs": _admin_only(build_activity_logs),
+    "personnel_users": _admin_only(build_personnel_users),
+    "absences": lambda request, **kwargs: build_absences(request.user),
+    "advances": lambda request, **kwargs: build_advances(request.user),
+    "payroll_summary": lambda request, **kwargs: build_payroll_summary(request.user),
+}
+
+
+class BootstrapTemplateView(TemplateView):
+    """TemplateView that embeds the page's initial API data as `{{ bootstrap }}`."""
+
+    sections = ()
+
+    def get_bootstrap_data(self, **kwargs):
+        user = self.request.user
+        data = {"whoami": build_whoami(user)}
+        # Giriş yapılmamışsa sayfa zaten /login/'e yönlenir
+        if not user.is_authenticated:
+            return data
+        for name in self.sections:
+            value = BOOTSTRAP_SECTIONS[name](self.request, **kwargs)
+            if value is not None:
+                data[name] = value
+        return data
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["bootstrap"] = json_script(self.get_bootstrap_data(**kwargs), "bootstrap-data", encoder=JSONEncoder)
+        return context
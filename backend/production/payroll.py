@@ -0,0 +1,168 @@
+"""
+Aylık bordro özeti: kullanıcı başına avans toplamı ve devamsızlık günü.
+
+Toplamlar veritabanında GROUP BY ile hesaplanır. Kapanmış aylar (içinde
+bulunulan aydan önceki aylar) ilk istendiklerinde PayrollMonth /
+PayrollTotal tablolarına yazılır ve sonraki isteklerde oradan okunur.
+Geçmiş bir aya avans/devamsızlık eklenir ya da silinirse o ayın kaydı
+silinir (bkz. signals.py) ve bir sonraki istekte yeniden hesaplanır.
+Kapatma sırasında commit olan yazmalar için kapatılan aylar commit'ten
+sonra bir kez daha hesaplanır (bkz. _recheck).
+Açık ay her istekte canlı hesaplanır.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Absence, Advance, PayrollMonth, PayrollTotal
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _aggregate(start, end, user_id=None):
+    """{(user_id, month): [advance_total, absence_days]} for months in [start, end)."""
+    advances = Advance.objects.filter(date__gte=start, date__lt=end)
+    absences = Absence.objects.filter(absence_date__gte=start, absence_date__lt=end)
+    if user_id:
+        advances = advances.filter(user_id=user_id)
+        absences = absences.filter(user_id=user_id)
+
+    totals = {}
+    # order_by(): modeldeki varsayılan sıralama GROUP BY'a girmesin
+    for row in (
+        advances.annotate(month=TruncMonth("date")).order_by()
+        .values("user_id", "month").annotate(total=Sum("amount"))
+    ):
+        totals.setdefault((row["user_id"], row["month"]), [Decimal("0"), 0])[0] = row["total"]
+    for row in (
+        absences.annotate(month=TruncMonth("absence_date")).order_by()
+        .values("user_id", "month").annotate(days=Count("absence_date", distinct=True))
+    ):
+        totals.setdefault((row["user_id"], row["month"]), [Decimal("0"), 0])[1] = row["days"]
+    return totals
+
+
+def _month_totals(totals, month):
+    return {user_id: value for (user_id, m), value in totals.items() if m == month}
+
+
+def _store_totals(period, totals):
+    PayrollTotal.objects.bulk_create(
+        PayrollTotal(period=period, user_id=user_id, advance_total=advance_total, absence_days=absence_days)
+        for user_id, (advance_total, absence_days) in _month_totals(totals, period.month).items()
+    )
+
+
+def close_months(months):
+    """Compute and store totals for the given closed months that are not stored yet."""
+    current = month_start(timezone.localdate())
+    stored = set(PayrollMonth.objects.filter(month__in=months).values_list("month", flat=True))
+    missing = sorted(m for m in set(months) - stored if m < current)
+    if not missing:
+        return []
+
+    start, end = missing[0], add_months(missing[-1], 1)
+    totals = _aggregate(start, end)
+    created = []
+    for month in missing:
+        with transaction.atomic():
+            period, is_new = PayrollMonth.objects.get_or_create(month=month)
+            if is_new:
+                _store_totals(period, totals)
+                created.append(period)
+    if created:
+        _recheck(created, start, end, totals)
+    return missing
+
+
+def _recheck(periods, start, end, totals):
+    """
+    Recompute the months just stored and overwrite the ones that changed meanwhile.
+
+    Hesaplama ile kayıt arasında commit olan bir avans/devamsızlık, ay kaydı
+    henüz yokken invalidate_month() çağırmış ve hiçbir şey silmemiş olabilir.
+    Kayıt commit olduktan sonra yapılan bu hesaplama o yazmayı görür; daha
+    sonra commit olan yazmalar ise kaydı bulup siler.
+    """
+    check = _aggregate(start, end)
+    for period in periods:
+        if _month_totals(check, period.month) == _month_totals(totals, period.month):
+            continue
+        with transaction.atomic():
+            # Aynı anda silen yazma (invalidate_month) bu kilidi bekler
+            if not PayrollMonth.objects.select_for_update().filter(pk=period.pk).exists():
+                continue
+            period.totals.all().delete()
+            _store_totals(period, check)
+
+
+def invalidate_month(day):
+    """Drop the stored totals of the month containing `day` (no-op for the open month)."""
+    if day is None:
+        return
+    month = month_start(day)
+    if month < month_start(timezone.localdate()):
+        PayrollMonth.objects.filter(month=month).delete()
+        # Yazma commit olmadan kapatılan ay bu transaction'ın silmesini görmez; commit'ten sonra tekrar sil
+        transaction.on_commit(lambda: PayrollMonth.objects.filter(month=month).delete())
+
+
+def payroll_summary(start, end, user_id=None):
+    """
+    Per-user, per-month totals for months start..end (inclusive, first days of months).
+
+    Returns rows ordered by month then username:
+    {"month": "YYYY-MM", "user_id", "username", "full_name", "advance_total", "absence_days", "closed"}
+    """
+    current = month_start(timezone.localdate())
+    months = []
+    month = start
+    while month <= end:
+        months.append(month)
+        month = add_months(month, 1)
+    closed_months = [m for m in months if m < current]
+    close_months(closed_months)
+
+    # (user_id, month) -> [advance_total, absence_days, closed]
+    totals = {}
+    stored = PayrollTotal.objects.filter(period__month__in=closed_months)
+    if user_id:
+        stored = stored.filter(user_id=user_id)
+    for uid, m, advance_total, absence_days in stored.values_list(
+        "user_id", "period__month", "advance_total", "absence_days"
+    ):
+        totals[(uid, m)] = [advance_total, absence_days, True]
+    if current in months:
+        for key, (advance_total, absence_days) in _aggregate(current, add_months(current, 1), user_id).items():
+            totals[key] = [advance_total, absence_days, False]
+
+    users = {
+        u["id"]: u
+        for u in User.objects.filter(id__in={uid for uid, _ in totals}).values("id", "username", "first_name", "last_name")
+    }
+    rows = []
+    for (uid, m), (advance_total, absence_days, closed) in totals.items():
+        u = users[uid]
+        rows.append({
+            "month": m.strftime("%Y-%m"),
+            "user_id": uid,
+            "username": u["username"],
+            "full_name": f"{u['first_name']} {u['last_name']}".strip() or u["username"],
+            "advance_total": f"{advance_total:.2f}",
+            "absence_days": absence_days,
+            "closed": closed,
+        })
+    rows.sort(key=lambda r: (r["month"], r["username"]))
+    return rows
@@ -0,0 +1,107 @@
+"""
+İsteğe bağlı istek profilleme.
+
+Admin kullanıcı `X-Profile: 1` başlığı ya da `?_profile=1` ile gelirse
+istek cProfile altında çalışır, SQL sorguları başlangıç zamanı ve
+süresiyle kaydedilir ve sonuç RequestProfile olarak saklanır (yanıtta
+X-Profile-Id). Kayıtlar admin panelinden incelenir, .prof dosyası
+snakeviz / `python -m pstats` ile açılabilir. Tetiklenmeyen isteklerde
+yalnızca başlık/parametre kontrolü yapılır.
+"""
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .models import RequestProfile
+
+
+HEADER = "HTTP_X_PROFILE"
+QUERY_PARAM = "_profile"
+MAX_SQL_ENTRIES = 500
+SUMMARY_LINES = 60
+
+# cProfile süreç içinde aynı anda tek profiler'a izin verir (3.12+); ikinci istek profillenmez
+_profiler_lock = threading.Lock()
+
+
+def requested(request):
+    return request.META.get(HEADER) == "1" or request.GET.get(QUERY_PARAM) == "1"
+
+
+class _SqlTimeline:
+    def __init__(self, started):
+        self.started = started
+        self.entries = []
+        self.count = 0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.count += 1
+            self.total_ms += duration
+            if len(self.entries) < MAX_SQL_ENTRIES:
+                self.entries.append([
+                    round((start - self.started) * 1000, 2),
+                    round(duration, 2),
+                    context["connection"].alias,
+                    sql,
+                ])
+
+
+def profile_request(request, get_response):
+    """Run get_response(request) under the profiler; returns the response (None if another profile is running)."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.perf_counter()
+        timeline = _SqlTimeline(started)
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(timeline))
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+    finally:
+        _profiler_lock.release()
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(SUMMARY_LINES)
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        user=request.user if request.user.is_authenticated else None,
+        status_code=response.status_code,
+        duration_ms=duration_ms,
+        query_count=timeline.count,
+        sql_ms=timeline.total_ms,
+        summary=summary.getvalue(),
+        sql=timeline.entries,
+        # pstats.Stats.dump_stats ile aynı format
+        stats=marshal.dumps(stats.stats),
+    )
+    _trim()
+    response["X-Profile-Id"] = str(profile.pk)
+    return response
+
+
+def _trim():
+    keep = getattr(settings, "PROFILE_MAX_ENTRIES", 50)
+    cutoff = list(RequestProfile.objects.order_by("-id").values_list("id", flat=True)[keep:keep + 1])
+    if cutoff:
+        RequestProfile.objects.filter(id__lte=cutoff[0]).delete()
@@ -0,0 +1,174 @@
+"""
+Makine ve takım tipi silme.
+
+Yıllarca geçmişi olan bir makinenin `.delete()` çağrısı tüm takım
+değişimlerini, sayaçları ve seansları cascade collector ile belleğe
+yükler ve tabloları tek bir uzun transaction'da kilitler. Bunun yerine
+silme iki adımdır:
+
+1. İstekte: kayıt pasif yapılır ve `deleted_at` işaretlenir (makinenin
+   takım tipleri de); listelerden ve API'den hemen kalkar. Aynı
+   transaction'da `purge_machine` / `purge_tool_type` işi kuyruğa alınır.
+2. Arka planda (bkz. jobs.py): bağlı tablolar torunlardan başlayarak
+   PURGE_CHUNK_SIZE satırlık parçalar halinde, her parça kendi
+   transaction'ında silinir. Parça başına satırlar id ile seçilir,
+   outbox'a "deleted" olayları ve arama belgelerinin silinmesi aynı
+   transaction'da yazılır; satırlar collector ve satır başı sinyaller
+   olmadan silinir. Bağlı kayıt kalmayınca kaydın kendisi normal
+   `.delete()` ile silinir.
+
+Takım tipi silinirken kalemleri sinyalsiz silindiğinden, her parçada
+kalemlerin düştüğü vardiya özetleri yeniden hesaplanır ve makinenin
+dashboard kartı güncellenir.
+
+İş yarıda kalırsa (iptal, çöken worker) tekrar çalıştırıldığında kalan
+satırlardan devam eder; tamamlanmış parçalar geri alınmaz.
+"""
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from . import shifts
+from .changes import touch_dashboard_on_commit
+
+from .models import (
+    ActivityLog,
+    DailyProduction,
+    Machine,
+    SearchDocument,
+    ShiftOperatorRollup,
+    ShiftRollup,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    ToolType,
+    WorkSession,
+)
+from .outbox import TOPICS as OUTBOX_TOPICS, record_many
+
+
+def _chunk_size():
+    return getattr(settings, "PURGE_CHUNK_SIZE", 1000)
+
+
+def mark_machine_deleted(machine):
+    """Soft-delete a machine and its tool types; the caller enqueues the purge job."""
+    now = timezone.now()
+    machine.is_active = False
+    machine.deleted_at = now
+    machine.save(update_fields=["is_active", "deleted_at"])
+    tool_types = ToolType.objects.filter(machine=machine, deleted_at__isnull=True)
+    ids = list(tool_types.values_list("pk", flat=True))
+    ToolType.objects.filter(pk__in=ids).update(is_active=False, deleted_at=now)
+    record_many(ToolType.objects.filter(pk__in=ids), "updated")
+
+
+def mark_tool_type_deleted(tool_type):
+    tool_type.is_active = False
+    tool_type.deleted_at = timezone.now()
+    tool_type.save(update_fields=["is_active", "deleted_at"])
+
+
+# Silme sırası: önce torunlar. (model, üst kayda giden alan, arama belgesi türü)
+# Makinenin birkaç takım tipi makineyle birlikte collector ile silinir.
+MACHINE_STEPS = (
+    (ToolChangeBatchItem, "batch__machine_id", None),
+    (ToolChangeBatch, "machine_id", "tool_change"),
+    (DailyProduction, "machine_id", None),
+    (WorkSession, "machine_id", "work_session"),
+    (ShiftRollup, "machine_id", None),
+    (ShiftOperatorRollup, "machine_id", None),
+)
+
+
+def _delete_chunk(model, field, parent_id, search_kind):
+    rows = model._base_manager.filter(**{field: parent_id}).order_by("pk")
+    limit = _chunk_size()
+    with transaction.atomic():
+        if model in OUTBOX_TOPICS:
+            instances = list(rows[:limit])
+            ids = [instance.pk for instance in instances]
+            record_many(instances, "deleted")
+        else:
+            ids = list(rows.values_list("pk", flat=True)[:limit])
+        if ids:
+            if search_kind:
+                SearchDocument.objects.filter(kind=search_kind, object_id__in=ids).delete()
+            # Bağlı satırlar önceki adımlarda silindi; collector ve satır başı sinyaller atlanır
+            model._base_manager.filter(pk__in=ids)._raw_delete(router.db_for_write(model))
+    return len(ids)
+
+
+def _delete_tool_items_chunk(tool_type):
+    limit = _chunk_size()
+    with transaction.atomic():
+        ids = list(
+            ToolChangeBatchItem._base_manager.filter(tool_type_id=tool_type.pk).order_by("pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        if not ids:
+            return 0
+        span = ToolChangeBatchItem._base_manager.filter(pk__in=ids).aggregate(
+            start=Min("batch__timestamp"), end=Max("batch__timestamp")
+        )
+        removed = _delete_chunk(ToolChangeBatchItem, "tool_type_id", tool_type.pk, None)
+        # Silinen kalemler vardiya özetlerinin tool_items sayısından düşer; aynı transaction'da
+        shifts.recompute([tool_type.machine_id], span["start"], span["end"])
+        touch_dashboard_on_commit("machine", tool_type.machine_id)
+    return removed
+
+
+def _unlink_activity_chunk(machine_id):
+    # ActivityLog.machine SET_NULL: kayıtlar kalır, makine bağlantısı boşaltılır
+    limit = _chunk_size()
+    with transaction.atomic():
+        ids = list(ActivityLog.objects.filter(machine_id=machine_id).order_by("pk").values_list("pk", flat=True)[:limit])
+        if ids:
+            ActivityLog.objects.filter(pk__in=ids).update(machine=None)
+            SearchDocument.objects.filter(kind="activity", object_id__in=ids).update(machine_id=None)
+    return len(ids)
+
+
+def _purge(ctx, steps, parent_id, extra=None):
+    """Run the delete steps chunk by chunk with progress; returns the number of rows removed."""
+    chunks = [
+        (model.__name__, lambda model=model, field=field, kind=kind: _delete_chunk(model, field, parent_id, kind),
+         model._base_manager.filter(**{field: parent_id}).count())
+        for model, field, kind in steps
+    ]
+    if extra:
+        chunks += extra
+    total = sum(count for _, _, count in chunks) or 1
+    done = 0
+    for label, run, _ in chunks:
+        while True:
+            removed = run()
+            if not removed:
+                break
+            done += removed
+            # Son adım (kaydın kendisi) kalana kadar %99'da kalır
+            ctx.progress(min(99, done * 100 // total), f"{label}: {done}/{total}")
+    return done
+
+
+def purge_machine(ctx, machine_id):
+    machine = Machine.objects.filter(pk=machine_id, deleted_at__isnull=False).first()
+    if machine is None:
+        return {"rows": 0}
+    activity = ("ActivityLog", lambda: _unlink_activity_chunk(machine_id),
+                ActivityLog.objects.filter(machine_id=machine_id).count())
+    rows = _purge(ctx, MACHINE_STEPS, machine_id, [activity])
+    # Geriye makine ve takım tipleri kaldı; collector bunları sinyalleriyle (outbox, dashboard, önbellek) siler
+    machine.delete()
+    return {"rows": rows + 1}
+
+
+def purge_tool_type(ctx, tool_type_id):
+    tool_type = ToolType.objects.filter(pk=tool_type_id, deleted_at__isnull=False).first()
+    if tool_type is None:
+        return {"rows": 0}
+    items = ("ToolChangeBatchItem", lambda: _delete_tool_items_chunk(tool_type),
+             ToolChangeBatchItem._base_manager.filter(tool_type_id=tool_type_id).count())
+    rows = _purge(ctx, (), tool_type_id, [items])
+    tool_type.delete()
+    return {"rows": rows + 1}
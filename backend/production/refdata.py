@@ -0,0 +1,117 @@
+"""
+Worker başına referans veri önbelleği.
+
+Makine, takım tipi, malzeme tipi adları ve kullanıcı adları neredeyse hiç
+değişmez ama hemen her listede görünür. Okuma yolları bu adları join ya da
+nesne başına sorgu yerine FK id'leriyle buradan çözer: eksik id'ler model
+başına tek sorguyla yüklenir ve worker belleğinde tutulur.
+
+Her modelin tablosu caching.py'deki "refdata.<model>" sürümüne bağlıdır;
+admin paneli ya da admin_* endpoint'lerinden yapılan kayıtlar sinyallerle
+(bkz. signals.py) sürümü artırır ve tablo bir sonraki okumada boşaltılır.
+Sürüm 'default' önbellekte tutulur. Varsayılan LocMem önbelleği
+worker'lar arasında paylaşılmaz: başka bir worker'da yapılan değişiklik
+bu worker'ın sürümünü artırmaz ve kayıtlar en fazla REFDATA_CACHE_TTL
+(varsayılan API_CACHE_TTL, 10 sn) eski kalır. CACHE_BACKEND paylaşılan bir
+önbellekse (Redis, Memcached) değişiklik tüm worker'lara hemen yansır ve
+TTL uzatılabilir. Replikadan
+yüklenen satırlar ayrı tabloda tutulur (bkz. caching.py).
+"""
+import threading
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .caching import get_version
+from .metrics import refdata_eviction, refdata_lookup
+from .models import Machine, MaterialType, ToolType
+from .routers import reading_replica
+
+
+# model -> önbellekte tutulan (okuma yollarında görünen) alanlar
+REFERENCE_FIELDS = {
+    Machine: ("name", "short_name"),
+    ToolType: ("name",),
+    MaterialType: ("name", "code"),
+    User: ("username", "first_name", "last_name"),
+}
+
+_lock = threading.Lock()
+_tables = {}  # (model, replikadan mı) -> (version, {pk: (expires_at, row)})
+
+
+def _ttl():
+    return getattr(settings, "REFDATA_CACHE_TTL", 10)
+
+
+def _max_entries():
+    return getattr(settings, "REFDATA_CACHE_MAX_ENTRIES", 5000)
+
+
+def version_name(model):
+    return f"refdata.{model._meta.model_name}"
+
+
+def clear():
+    with _lock:
+        _tables.clear()
+
+
+def _load(model, ids):
+    rows = model.objects.filter(pk__in=ids).values("pk", *REFERENCE_FIELDS[model])
+    return {row.pop("pk"): row for row in rows}
+
+
+def resolve(model, ids):
+    """pk -> {field: value} for the given ids of a reference model; ids that no longer exist are left out."""
+    ids = {pk for pk in ids if pk is not None}
+    if not ids:
+        return {}
+    ttl = _ttl()
+    if ttl <= 0:
+        return _load(model, ids)
+
+    version = get_version(version_name(model))
+    source = (model, reading_replica())
+    now = time.monotonic()
+    found = {}
+    with _lock:
+        table = _tables.get(source)
+        if table is None or table[0] != version:
+            table = _tables[source] = (version, {})
+        rows = table[1]
+        for pk in ids:
+            hit = rows.get(pk)
+            if hit and hit[0] > now:
+                found[pk] = hit[1]
+    missing = ids - found.keys()
+    refdata_lookup(model._meta.model_name, len(found), len(missing))
+    if not missing:
+        return found
+
+    loaded = _load(model, missing)
+    max_entries = _max_entries()
+    with _lock:
+        # Yükleme sırasında sürüm değiştiyse tablo bir sonraki okumada zaten boşaltılır
+        rows = _tables.get(source, table)[1]
+        if len(rows) + len(loaded) > max_entries:
+            refdata_eviction(model._meta.model_name, len(rows))
+            rows.clear()
+        expires_at = now + ttl
+        for pk, row in islice(loaded.items(), max_entries):
+            rows[pk] = (expires_at, row)
+    found.update(loaded)
+    return found
+
+
+def value(rows, pk, field, default=None):
+    """Field of a resolved row, e.g. value(users, batch.changed_by_id, "username", "")."""
+    row = rows.get(pk)
+    return row[field] if row is not None else default
+
+
+def lookup(model, pk, field, default=None):
+    """Single-id shortcut for resolve() + value()."""
+    return value(resolve(model, [pk]), pk, field, default)
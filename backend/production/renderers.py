@@ -0,0 +1,78 @@
+"""
+API yanıt renderer'ları.
+
+ORJSONRenderer, DRF JSONRenderer ile aynı çıktıyı (tarihler ISO 8601,
+UTC için "Z" soneki) çok daha hızlı üretir. MessagePackRenderer, tablet
+istemcisinin `Accept: application/msgpack` ile aynı şemayı ikili olarak
+almasını sağlar. İlgili paket kurulu değilse DRF JSONRenderer'a düşülür /
+renderer ayarlarda listelenmez (bkz. settings.REST_FRAMEWORK).
+"""
+import datetime
+import decimal
+import uuid
+
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+def _iso(value):
+    # DRF JSONEncoder ile aynı biçim
+    text = value.isoformat()
+    if isinstance(value, datetime.datetime) and text.endswith("+00:00"):
+        text = text[:-6] + "Z"
+    return text
+
+
+def _default(obj):
+    """Fallback for types the binary encoders don't handle, mirroring DRF's JSONEncoder."""
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return _iso(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Type is not serializable: {type(obj).__name__}")
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b""
+        option = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
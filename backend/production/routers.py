@@ -0,0 +1,87 @@
+"""
+Okuma replikası yönlendirmesi.
+
+DATABASES["replica"] tanımlıysa (DATABASE_REPLICA_URL), yalnızca açıkça
+işaretlenmiş okumalar (@replica_ok view'ları, ReplicaChangelistMixin,
+`with read_replica():` blokları) replikaya gider; geri kalan her şey ve
+tüm yazmalar primary'dedir. Bir istemci yazma yaptıktan sonra
+REPLICA_STICKY_SECONDS boyunca (çerez ile) kendi yazdığını görebilmesi
+için primary'den okur.
+"""
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+REPLICA_DB_ALIAS = "replica"
+STICKY_COOKIE = "db_primary"
+
+_use_replica = contextvars.ContextVar("use_replica", default=False)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def is_sticky(request):
+    """True if this client wrote recently and must read its own writes from the primary."""
+    return STICKY_COOKIE in request.COOKIES
+
+
+def reading_replica():
+    """True inside a block whose reads are routed to the replica."""
+    return _use_replica.get()
+
+
+@contextmanager
+def read_replica(request=None):
+    """Route reads inside the block to the replica (unless `request` is sticky to the primary)."""
+    if not replica_configured() or (request is not None and is_sticky(request)):
+        yield
+        return
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_ok(view):
+    """Serve a read-only view from the replica. Put it above @api_view."""
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            return view(request, *args, **kwargs)
+        with read_replica(request):
+            return view(request, *args, **kwargs)
+    return wrapped
+
+
+class ReplicaChangelistMixin:
+    """ModelAdmin mixin: changelist pages read from the replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != "GET":
+            return super().changelist_view(request, extra_context)
+        with read_replica(request):
+            return super().changelist_view(request, extra_context)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # None döndürülürse Django nesnenin geldiği alias'ı kullanır; replikadan okunup
+        # önbellekte kalan nesnelerin ilişkileri de blok dışında primary'den okunmalı
+        return REPLICA_DB_ALIAS if reading_replica() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replika primary'nin kopyasıdır; iki alias'taki nesneler aynı veridir
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB_ALIAS
@@ -0,0 +1,148 @@
+"""
+Notlar ve aktivite detaylarında tam metin arama.
+
+Aranan alanlar (takım değişimi, çalışma kaydı, malzeme çıkışı, devamsızlık
+ve avans notları, aktivite detayları) SearchDocument tablosuna kopyalanır.
+Kopya, kaynak kayıtla aynı transaction içinde sinyallerle yazılır (bkz.
+signals.py); arama tek tabloda sıralanır ve sayfalanır. Tam metin indeksi
+veritabanına göre migration'da (0023) kurulur:
+
+- PostgreSQL: "turkish" yapılandırmasıyla üretilen search_vector
+  (tsvector, GENERATED STORED) sütunu ve GIN indeksi;
+  websearch_to_tsquery ile eşleşir, ts_rank ile sıralanır.
+- SQLite: FTS5 (unicode61) sanal tablosu; tetikleyicilerle güncellenir,
+  bm25 ile sıralanır. Her kelime önek olarak aranır.
+- Diğerleri: kelime başına icontains, en yeniden eskiye.
+
+Makine, malzeme tipi ya da kullanıcı silinince bağlı belgeler tek sorguyla
+temizlenir; alt kayıtların tek tek silinmesi beklenmez.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import (
+    ActivityLog,
+    Absence,
+    Advance,
+    Machine,
+    MaterialShipment,
+    MaterialType,
+    SearchDocument,
+    ToolChangeBatch,
+    WorkSession,
+)
+
+
+# model -> (belge türü, metin alanları, zaman alanı, bağlantı alanları)
+SOURCES = {
+    ToolChangeBatch: ("tool_change", ("note",), "timestamp", ("machine_id",)),
+    WorkSession: ("work_session", ("note",), "start_time", ("machine_id", "user_id")),
+    MaterialShipment: ("material_shipment", ("note",), "created_at", ("material_type_id",)),
+    Absence: ("absence", ("reason", "note"), "created_at", ("user_id",)),
+    Advance: ("advance", ("note",), "created_at", ("user_id",)),
+    ActivityLog: ("activity", ("details",), "created_at", ("machine_id", "user_id")),
+}
+
+# Herkesin görebildiği türler; personel kayıtlarını yalnızca sahibi, aktiviteyi yalnızca admin görür
+PUBLIC_KINDS = ("tool_change", "work_session", "material_shipment")
+PERSONAL_KINDS = ("absence", "advance")
+
+FTS_TABLE = "production_searchdocument_fts"
+
+
+def _body(instance, text_fields):
+    return "\n".join(value for value in (getattr(instance, f) for f in text_fields) if value and value.strip())
+
+
+def index(instance, created=False):
+    """Write (or drop, if its text is now empty) the search document of a source row."""
+    kind, text_fields, time_field, link_fields = SOURCES[type(instance)]
+    body = _body(instance, text_fields)
+    documents = SearchDocument.objects.filter(kind=kind, object_id=instance.pk)
+    if not body:
+        if not created:
+            documents.delete()
+        return
+    values = {
+        "body": body,
+        "created_at": getattr(instance, time_field),
+        **{field: getattr(instance, field) for field in link_fields},
+    }
+    if created:
+        SearchDocument.objects.create(kind=kind, object_id=instance.pk, **values)
+    else:
+        SearchDocument.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=values)
+
+
+def unindex(instance):
+    SearchDocument.objects.filter(kind=SOURCES[type(instance)][0], object_id=instance.pk).delete()
+
+
+# Üst kayıt silinince: model -> (belge alanı, birlikte silinen türler); diğer türlerde bağlantı boşaltılır (SET_NULL)
+PARENTS = {
+    Machine: ("machine_id", ("tool_change", "work_session")),
+    MaterialType: ("material_type_id", ("material_shipment",)),
+}
+USER_CASCADE_KINDS = ("work_session", "absence", "advance")
+
+
+def unindex_parent(model, pk):
+    field, kinds = PARENTS[model] if model in PARENTS else ("user_id", USER_CASCADE_KINDS)
+    documents = SearchDocument.objects.filter(**{field: pk})
+    documents.filter(kind__in=kinds).delete()
+    documents.update(**{field: None})
+
+
+def visible_to(user):
+    if user.is_staff or user.is_superuser:
+        return Q()
+    return Q(kind__in=PUBLIC_KINDS) | Q(kind__in=PERSONAL_KINDS, user_id=user.id)
+
+
+def _fts5_query(q):
+    # Kullanıcı girdisi FTS5 sözdizimi olarak yorumlanmaz: her kelime tırnaklı önek olur (AND)
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", q))
+
+
+def search(q, user, kinds=None, offset=0, limit=20):
+    """([SearchDocument with .rank], has_more) for the best matches of `q` visible to `user`."""
+    documents = SearchDocument.objects.filter(visible_to(user))
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+
+    vendor = connection.vendor
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('turkish', %s)"
+        documents = documents.filter(
+            RawSQL(f"search_vector @@ {tsquery}", [q], output_field=BooleanField())
+        ).annotate(rank=RawSQL(f"ts_rank(search_vector, {tsquery})", [q], output_field=FloatField()))
+        order = ("-rank", "-created_at", "-id")
+    elif vendor == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return [], False
+        table = SearchDocument._meta.db_table
+        documents = documents.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            # bm25 küçük = daha iyi eşleşme
+            rank=RawSQL(
+                f"(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id)",
+                [match], output_field=FloatField(),
+            )
+        )
+        order = ("-rank", "-created_at", "-id")
+    else:
+        words = q.split()
+        if not words:
+            return [], False
+        for word in words:
+            documents = documents.filter(body__icontains=word)
+        documents = documents.annotate(rank=RawSQL("0", [], output_field=FloatField()))
+        order = ("-created_at", "-id")
+
+    rows = list(documents.order_by(*order)[offset:offset + limit + 1])
+    return rows[:limit], len(rows) > limit
@@ -1,5 +1,7 @@
 from rest_framework import serializers
+from .jobs import REGISTRY as JOB_REGISTRY
 from .models import (
+    Line,
     Machine,
     ToolType,
     ToolChangeBatch,
@@ -12,10 +14,15 @@ from .models import (
     MaterialShipment,
     Absence,
     Advance,
+    Job,
+    SearchDocument,
+    Shift,
+    StockAlert,
 )
 
 
 class MachineDashboardSerializer(serializers.Serializer):
+    version = serializers.IntegerField()
     machine_id = serializers.IntegerField()
     machine_name = serializers.CharField()
     machine_short_name = serializers.CharField()
@@ -35,6 +42,7 @@ class MachineSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "short_name",
+            "line",
             "order_in_line",
             "location",
             "is_active",
@@ -56,6 +64,7 @@ class MachineWithToolTypesSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "short_name",
+            "line",
             "order_in_line",
             "location",
             "is_active",
@@ -150,6 +159,14 @@ class MachineDetailSerializer(serializers.Serializer):
     recent_sessions = WorkSessionSerializer(many=True)
 
 
+class MachineHistoryQuerySerializer(serializers.Serializer):
+    section = serializers.ChoiceField(choices=["batches", "daily", "sessions"])
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=100)
+
+
 class ActivityLogSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source="user.username", read_only=True)
     machine_short_name = serializers.CharField(source="machine.short_name", read_only=True)
@@ -171,7 +188,7 @@ class ActivityLogSerializer(serializers.ModelSerializer):
 class MaterialTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = MaterialType
-        fields = ["id", "name", "code", "is_active"]
+        fields = ["id", "line", "name", "code", "is_active", "reorder_level"]
 
 
 class MaterialEntrySerializer(serializers.ModelSerializer):
@@ -180,8 +197,8 @@ class MaterialEntrySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MaterialEntry
-        fields = ["id", "material_type", "material_type_name", "boxes_count", "units_per_box", "created_by", "created_by_username", "created_at"]
-        read_only_fields = ["created_by", "created_at"]
+        fields = ["id", "material_type", "material_type_name", "boxes_count", "units_per_box", "remaining_units", "created_by", "created_by_username", "created_at"]
+        read_only_fields = ["remaining_units", "created_by", "created_at"]
 
 
 class MaterialShipmentSerializer(serializers.ModelSerializer):
@@ -190,8 +207,33 @@ class MaterialShipmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = MaterialShipment
-        fields = ["id", "material_type", "material_type_name", "boxes_count", "units_per_box", "note", "created_by", "created_by_username", "created_at"]
-        read_only_fields = ["created_by", "created_at"]
+        fields = ["id", "material_type", "material_type_name", "boxes_count", "units_per_box", "note", "unallocated_units", "created_by", "created_by_username", "created_at"]
+        read_only_fields = ["unallocated_units", "created_by", "created_at"]
+
+
+class MaterialLotSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MaterialEntry
+        fields = ["id", "boxes_count", "units_per_box", "remaining_units", "created_at"]
+
+
+class MaterialLotsQuerySerializer(serializers.Serializer):
+    """?after=<lot id from the previous page>&limit= (open lots, oldest first)"""
+    after = serializers.IntegerField(required=False, default=0, min_value=0)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    material_name = serializers.CharField(source="material_type.name", read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = ["id", "material_type", "material_name", "stock_units", "reorder_level", "opened_at", "resolved_at"]
+
+
+class StockAlertQuerySerializer(serializers.Serializer):
+    """?status=open (default, alerts still below the threshold) | all (history, newest first)"""
+    status = serializers.ChoiceField(choices=["open", "all"], required=False, default="open")
 
 
 class CreateMaterialEntrySerializer(serializers.Serializer):
@@ -213,6 +255,12 @@ class CreateMachineSerializer(serializers.Serializer):
     order_in_line = serializers.IntegerField()
     location = serializers.CharField(max_length=100, required=False, allow_blank=True)
     is_active = serializers.BooleanField(required=False, default=True)
+    line_id = serializers.IntegerField(required=False, allow_null=True)
+
+    def validate_line_id(self, value):
+        if value is not None and not Line.objects.filter(id=value).exists():
+            raise serializers.ValidationError("Hat bulunamadı")
+        return value
 
 
 class CreateToolTypeAdminSerializer(serializers.Serializer):
@@ -266,3 +314,114 @@ class CreateAdvanceSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
     date = serializers.DateField()
     note = serializers.CharField(required=False, allow_blank=True)
+
+
+class DeviceOperatorSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    pin = serializers.CharField(min_length=4, max_length=12)
+
+
+class UserDirectoryQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, max_length=100, default="")
+    after = serializers.CharField(required=False)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+
+
+class ShiftSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Shift
+        fields = ["id", "name", "start_time", "end_time"]
+
+
+class ShiftSummaryQuerySerializer(serializers.Serializer):
+    """?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive, shift dates)&machine_id=. Default: the last 7 days."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    machine_id = serializers.IntegerField(required=False)
+
+    MAX_DAYS = 62
+
+    def validate(self, attrs):
+        start, end = attrs.get("start"), attrs.get("end")
+        if start and end:
+            if start > end:
+                raise serializers.ValidationError("start, end'den sonra olamaz")
+            if (end - start).days >= self.MAX_DAYS:
+                raise serializers.ValidationError(f"En fazla {self.MAX_DAYS} gün istenebilir")
+        return attrs
+
+
+class PayrollSummaryQuerySerializer(serializers.Serializer):
+    """?start=YYYY-MM&end=YYYY-MM (inclusive). Default: the last 12 months."""
+    start = serializers.DateField(required=False, input_formats=["%Y-%m"])
+    end = serializers.DateField(required=False, input_formats=["%Y-%m"])
+    user_id = serializers.IntegerField(required=False)
+
+    MAX_MONTHS = 36
+
+    def validate(self, attrs):
+        start, end = attrs.get("start"), attrs.get("end")
+        if start and end:
+            if start > end:
+                raise serializers.ValidationError("start, end'den sonra olamaz")
+            if (end.year - start.year) * 12 + end.month - start.month >= self.MAX_MONTHS:
+                raise serializers.ValidationError(f"En fazla {self.MAX_MONTHS} ay istenebilir")
+        return attrs
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    """?q= (words, at least 2 characters)&kind=a,b&offset=<next_offset>&limit= (max 50)"""
+    q = serializers.CharField(min_length=2, max_length=200)
+    kind = serializers.CharField(required=False, allow_blank=True, default="")
+    # Derin sayfalar her seferinde tüm eşleşmeleri sıralatır; arama daraltılmalı
+    offset = serializers.IntegerField(required=False, default=0, min_value=0, max_value=500)
+    limit = serializers.IntegerField(required=False, default=20, min_value=1, max_value=50)
+
+    def validate_kind(self, value):
+        kinds = [k for k in (part.strip() for part in value.split(",")) if k]
+        valid = {choice for choice, _ in SearchDocument.KIND_CHOICES}
+        unknown = [k for k in kinds if k not in valid]
+        if unknown:
+            raise serializers.ValidationError(f"Geçersiz tür: {', '.join(unknown)}")
+        return kinds
+
+
+class ChangeFeedQuerySerializer(serializers.Serializer):
+    """?after=<event id>&limit=&topics=a,b&consumer=<name> (without after, start from the consumer's position)"""
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, default=500, min_value=1, max_value=5000)
+    topics = serializers.CharField(required=False, allow_blank=True, default="")
+    consumer = serializers.CharField(required=False, max_length=100)
+
+    def validate_topics(self, value):
+        return [t for t in (part.strip() for part in value.split(",")) if t]
+
+
+class ChangeFeedAckSerializer(serializers.Serializer):
+    consumer = serializers.CharField(max_length=100)
+    position = serializers.IntegerField(min_value=0)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id", "kind", "params", "status", "progress", "message", "result", "error",
+            "attempts", "created_by", "created_at", "started_at", "finished_at",
+        ]
+
+
+class CreateJobSerializer(serializers.Serializer):
+    kind = serializers.CharField(max_length=50)
+    params = serializers.DictField(required=False, default=dict)
+
+    def validate_kind(self, value):
+        if value not in JOB_REGISTRY:
+            raise serializers.ValidationError("Bilinmeyen iş türü")
+        return value
+
+
+class JobListQuerySerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=[c for c, _ in Job.STATUS_CHOICES], required=False)
+    kind = serializers.CharField(required=False, max_length=50)
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
@@ -0,0 +1,178 @@
+"""
+Kayıt oluşturan endpoint'lerin yazma servisleri.
+
+Her servis tek bir transaction içinde çalışır; doğrulama (serializer,
+yetki) view'da, transaction açılmadan önce yapılır. Yabancı anahtarlar
+tek sorguyla doğrulanır, insert'ler RETURNING ile id'yi aynı tur içinde
+alır ve yanıt için gereken nesneler bellekte kurulur; yanıt üretilirken
+tekrar sorgu yapılmaz. Endpoint başına sorgu bütçeleri tests.py'deki
+WriteQueryBudgetTests ile sabitlenir.
+"""
+from django.contrib.auth.models import User
+from django.db import models, router, transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .changes import touch_dashboard_on_commit
+from .models import (
+    Machine,
+    ToolType,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    DailyProduction,
+    WorkSession,
+    ActivityLog,
+    MaterialType,
+    MaterialEntry,
+    MaterialShipment,
+    Absence,
+    Advance,
+)
+from .outbox import record_many
+
+
+class NoValidToolTypes(Exception):
+    pass
+
+
+def _live_machines():
+    # Silinmiş makine arka planda temizlenir (bkz. purge.py); yeni kayıt alırsa o kayıt da silinirdi
+    return Machine.objects.filter(deleted_at__isnull=True)
+
+
+def fetch_related(*refs):
+    """
+    Check (model or queryset, pk, field) references with one query; returns
+    one instance per reference holding only pk and `field` (enough for FK
+    assignment and the response). Http404 for the first missing one.
+    """
+    refs = [
+        (source if isinstance(source, models.QuerySet) else source._default_manager.all(), pk, field)
+        for source, pk, field in refs
+    ]
+    queries = [
+        queryset.filter(pk=pk).values_list(models.Value(index, output_field=models.IntegerField()), field)
+        for index, (queryset, pk, field) in enumerate(refs)
+    ]
+    found = dict(queries[0].union(*queries[1:], all=True) if len(queries) > 1 else queries[0])
+    instances = []
+    for index, (queryset, pk, field) in enumerate(refs):
+        model = queryset.model
+        if index not in found:
+            raise Http404(f"No {model._meta.object_name} matches the given query.")
+        # Diğer alanlar ertelenmiş (deferred) kalır; okunursa Django yükler
+        db = router.db_for_read(model)
+        instances.append(model.from_db(db, [model._meta.pk.attname, field], [pk, found[index]]))
+    return instances
+
+
+@transaction.atomic
+def create_tool_change(user, machine_id, tool_type_ids, current_counter=None, note=""):
+    # Takım tipleri makineye göre süzülür; biri bulunduysa makine de vardır
+    # Silinmiş (arka planda temizlenen) takım tipleri ve makineler kabul edilmez
+    tool_types = list(
+        ToolType.objects.filter(id__in=tool_type_ids, machine_id=machine_id, deleted_at__isnull=True).only("id", "name")
+    )
+    if not tool_types:
+        get_object_or_404(_live_machines().only("id"), id=machine_id)
+        raise NoValidToolTypes
+
+    batch = ToolChangeBatch(machine_id=machine_id, changed_by=user, current_counter=current_counter, note=note)
+    # Kalem sayısı baştan bellidir; vardiya özeti batch'in sinyalinde tek upsert'le yazılır (bkz. shifts.add_tool_change)
+    batch._shift_tool_items = len(tool_types)
+    batch.save(force_insert=True)
+    items = ToolChangeBatchItem.objects.bulk_create([
+        ToolChangeBatchItem(batch=batch, tool_type=tt) for tt in tool_types
+    ])
+    # bulk_create post_save göndermez; id'ler RETURNING ile kalemlere yazıldı
+    touch_dashboard_on_commit("machine", machine_id)
+    record_many(items, "created")
+    ActivityLog.objects.create(
+        user=user,
+        action="tool_change",
+        machine_id=machine_id,
+        details=f"tools={[tt.name for tt in tool_types]} counter={current_counter}"
+    )
+    # Yanıttaki batch.items sorgu yerine bellekteki kalemlerden okunur
+    batch._prefetched_objects_cache = {"items": items}
+    return batch
+
+
+@transaction.atomic
+def create_daily_production(user, machine_id, total_count, date=None):
+    machine, = fetch_related((_live_machines(), machine_id, "short_name"))
+    date = date or timezone.localdate()
+    # Değişen davranış: her çağrıda yeni kayıt oluştur (kümülatif log)
+    dp = DailyProduction.objects.create(machine=machine, date=date, total_count=total_count, recorded_by=user)
+    ActivityLog.objects.create(
+        user=user,
+        action="daily_production",
+        machine=machine,
+        details=f"date={date} count={total_count} (incremental)"
+    )
+    return dp
+
+
+@transaction.atomic
+def create_work_session(user_id, machine_id, start_time, end_time, produced_count=None, note=""):
+    user, machine = fetch_related((User, user_id, "username"), (_live_machines(), machine_id, "short_name"))
+    ws = WorkSession.objects.create(
+        user=user,
+        machine=machine,
+        start_time=start_time,
+        end_time=end_time,
+        produced_count=produced_count,
+        note=note,
+    )
+    ActivityLog.objects.create(user=user, action="work_session", machine=machine, details=f"produced={produced_count}")
+    return ws
+
+
+@transaction.atomic
+def create_material_entry(user, material_type_id, boxes_count, units_per_box):
+    mt, = fetch_related((MaterialType, material_type_id, "name"))
+    entry = MaterialEntry.objects.create(
+        material_type=mt, boxes_count=boxes_count, units_per_box=units_per_box, created_by=user,
+    )
+    ActivityLog.objects.create(user=user, action="work_session", machine=None, details=f"material_in {mt.name} +{entry.boxes_count} kutu")
+    return entry
+
+
+@transaction.atomic
+def create_material_shipment(user, material_type_id, boxes_count, units_per_box, note=""):
+    mt, = fetch_related((MaterialType, material_type_id, "name"))
+    ship = MaterialShipment.objects.create(
+        material_type=mt, boxes_count=boxes_count, units_per_box=units_per_box, note=note, created_by=user,
+    )
+    total_units = ship.boxes_count * ship.units_per_box
+    ActivityLog.objects.create(user=user, action="work_session", machine=None, details=f"material_out {mt.name} -{ship.boxes_count} kutu ({total_units} adet)")
+    return ship
+
+
+@transaction.atomic
+def create_absence(recorded_by, user_id, absence_date, reason="", note=""):
+    user = get_object_or_404(User.objects.only("id", "username", "first_name", "last_name"), id=user_id)
+    absence = Absence.objects.create(
+        user=user, absence_date=absence_date, reason=reason, note=note, recorded_by=recorded_by,
+    )
+    ActivityLog.objects.create(
+        user=recorded_by,
+        action="work_session",
+        machine=None,
+        details=f"absence_recorded {user.username} {absence.absence_date}"
+    )
+    return absence
+
+
+@transaction.atomic
+def create_advance(recorded_by, user_id, amount, date, note=""):
+    user = get_object_or_404(User.objects.only("id", "username", "first_name", "last_name"), id=user_id)
+    advance = Advance.objects.create(user=user, amount=amount, date=date, note=note, recorded_by=recorded_by)
+    ActivityLog.objects.create(
+        user=recorded_by,
+        action="work_session",
+        machine=None,
+        details=f"advance_recorded {user.username} {advance.amount} TL"
+    )
+    return advance
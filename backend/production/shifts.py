@@ -0,0 +1,290 @@
+"""
+Vardiya bazlı üretim özetleri.
+
+Üretim sayacı okumaları, takım değişimleri ve çalışma kayıtları yazılırken
+(bkz. signals.py) içine düştükleri vardiyanın ShiftRollup /
+ShiftOperatorRollup satırına eklenir; özet endpoint'i ve dashboard ham
+kayıtları taramaz. Vardiya, kaydın zamanına göre bulunur (sayaç okuması:
+created_at, takım değişimi: timestamp, çalışma kaydı: start_time) ve gece
+yarısını geçen vardiyalar başladıkları güne yazılır.
+
+Yeni kayıtlar tek bir upsert ile eklenir. Düzenlenen/silinen kayıtların
+vardiyaları ise commit sonrası ham kayıtlardan yeniden hesaplanır.
+Vardiya takvimi değişirse geçmiş özetler rebuild() (iş:
+rebuild_shift_rollups) ile yeniden üretilir.
+
+Üretim sayacı gün içinde kümülatiftir; bir okumanın vardiyaya katkısı
+aynı makine ve gündeki bir önceki okumadan farkıdır.
+"""
+from datetime import datetime, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .caching import cached
+from .changes import defer_on_commit, touch_dashboard
+from .models import DailyProduction, Shift, ShiftOperatorRollup, ShiftRollup, ToolChangeBatch, WorkSession
+
+
+# Düzenlenen sayaç okuması aynı gündeki sonraki okumaların farkını da değiştirir
+_READING_HORIZON = timedelta(days=1)
+
+
+def active_shifts():
+    """[(id, name, start_time, end_time)] of active shifts, ordered by start time."""
+    return cached(
+        "shifts", lambda: list(Shift.objects.filter(is_active=True).values_list("id", "name", "start_time", "end_time"))
+    )
+
+
+def _window(start_time, end_time, day):
+    start = timezone.make_aware(datetime.combine(day, start_time))
+    end_day = day + timedelta(days=1) if end_time <= start_time else day
+    return start, timezone.make_aware(datetime.combine(end_day, end_time))
+
+
+def shift_at(moment, shifts=None):
+    """(shift_id, shift_date) of the shift containing `moment`, or None if it falls between shifts."""
+    local = timezone.localtime(moment)
+    for shift_id, _, start_time, end_time in active_shifts() if shifts is None else shifts:
+        # Gece yarısını geçen vardiya bir önceki gün başlamış olabilir
+        for day in (local.date(), local.date() - timedelta(days=1)):
+            start, end = _window(start_time, end_time, day)
+            if start <= moment < end:
+                return shift_id, day
+    return None
+
+
+def current_shift():
+    """The shift in progress as a dict for API responses, or None."""
+    now = timezone.now()
+    shifts = active_shifts()
+    found = shift_at(now, shifts)
+    if found is None:
+        return None
+    shift_id, shift_date = found
+    _, name, start_time, end_time = next(s for s in shifts if s[0] == shift_id)
+    start, end = _window(start_time, end_time, shift_date)
+    return {"id": shift_id, "name": name, "date": shift_date, "start": start, "end": end}
+
+
+def _windows(shifts, start, end):
+    """
+    {(shift_id, shift_date): (window_start, window_end)} for every shift
+    on the days whose windows overlap [start, end] (whole days, so the
+    rollups can be replaced by a shift_date range).
+    """
+    days = set()
+    day = timezone.localtime(start).date() - timedelta(days=1)
+    last = timezone.localtime(end).date()
+    while day <= last:
+        for _, _, start_time, end_time in shifts:
+            window_start, window_end = _window(start_time, end_time, day)
+            if window_start <= end and window_end > start:
+                days.add(day)
+        day += timedelta(days=1)
+    if not days:
+        return {}
+    windows = {}
+    day, last = min(days), max(days)
+    while day <= last:
+        for shift_id, _, start_time, end_time in shifts:
+            windows[(shift_id, day)] = _window(start_time, end_time, day)
+        day += timedelta(days=1)
+    return windows
+
+
+# Artımlı güncelleme (yeni kayıtlar)
+
+def _increment(model, key, values):
+    """INSERT ... ON CONFLICT DO UPDATE col = col + value: one statement, safe under concurrent writers."""
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    key_fields = [model._meta.get_field(name) for name in key]
+    # Yeni satırda verilmeyen sayaçlar alan varsayılanıyla (0) yazılır
+    counter_fields = [f for f in model._meta.concrete_fields if not f.primary_key and f not in key_fields]
+    row = [
+        *(f.get_db_prep_value(value, connection) for f, value in zip(key_fields, key.values())),
+        *(values.get(f.name, f.get_default()) for f in counter_fields),
+    ]
+    columns = ", ".join(quote(f.column) for f in key_fields + counter_fields)
+    updates = ", ".join(
+        f"{c} = {table}.{c} + EXCLUDED.{c}" for c in (quote(model._meta.get_field(name).column) for name in values)
+    )
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(row))}) "
+        f"ON CONFLICT ({', '.join(quote(f.column) for f in key_fields)}) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, row)
+
+
+def _add(machine_id, moment, **values):
+    found = shift_at(moment)
+    if found is None:
+        return None
+    shift_id, shift_date = found
+    key = {"machine": machine_id, "shift": shift_id, "shift_date": shift_date}
+    _increment(ShiftRollup, key, values)
+    return key
+
+
+def add_reading(reading):
+    previous = (
+        DailyProduction.objects.filter(machine_id=reading.machine_id, date=reading.date, id__lt=reading.pk)
+        .order_by("-id").values_list("total_count", flat=True).first()
+    )
+    _add(reading.machine_id, reading.created_at, produced_count=reading.total_count - (previous or 0))
+
+
+def add_tool_change(batch):
+    # services.create_tool_change kalemleri batch'ten sonra toplu ekler, sayısını önceden işaretler
+    _add(batch.machine_id, batch.timestamp, tool_changes=1, tool_items=getattr(batch, "_shift_tool_items", 0))
+
+
+def add_tool_items(batch, items):
+    _add(batch.machine_id, batch.timestamp, tool_items=items)
+
+
+def add_session(session):
+    seconds = max(int((session.end_time - session.start_time).total_seconds()), 0)
+    produced = session.produced_count or 0
+    key = _add(session.machine_id, session.start_time, work_sessions=1, work_seconds=seconds, session_produced=produced)
+    if key is not None:
+        _increment(
+            ShiftOperatorRollup, {"user": session.user_id, **key},
+            {"work_sessions": 1, "work_seconds": seconds, "produced_count": produced},
+        )
+
+
+# Yeniden hesaplama (düzenleme, silme, takvim değişikliği)
+
+def _flush_refresh(ranges):
+    for machine_id, (start, end) in ranges.items():
+        recompute([machine_id], start, end)
+    touch_dashboard("machine", *ranges)
+
+
+def refresh_on_commit(machine_id, moment, until=None):
+    """Recompute the rollups of the shifts between `moment` and `until` after the transaction commits."""
+    until = until or moment
+
+    def add(ranges):
+        start, end = ranges.get(machine_id, (moment, until))
+        ranges[machine_id] = (min(start, moment), max(end, until))
+
+    defer_on_commit("shift-rollups", add, _flush_refresh)
+
+
+def refresh_reading_on_commit(machine_id, moment):
+    refresh_on_commit(machine_id, moment, moment + _READING_HORIZON)
+
+
+def recompute(machine_ids, start, end, shifts=None):
+    """Rebuild the rollups of machine_ids for every shift window overlapping [start, end] from raw rows."""
+    shifts = active_shifts() if shifts is None else shifts
+    windows = _windows(shifts, start, end)
+    if not windows:
+        return
+    span_start = min(w[0] for w in windows.values())
+    span_end = max(w[1] for w in windows.values())
+
+    def bucket(machine_id, moment):
+        found = shift_at(moment, shifts)
+        return (machine_id, *found) if found in windows else None
+
+    totals = {}
+    operators = {}
+
+    readings = list(
+        DailyProduction.objects.filter(machine_id__in=machine_ids, created_at__gte=span_start, created_at__lt=span_end)
+        .order_by("id").values_list("id", "machine_id", "date", "total_count", "created_at")
+    )
+    last = {}
+    if readings:
+        earlier = (
+            DailyProduction.objects.filter(
+                machine_id__in=machine_ids, date__in={r[2] for r in readings}, id__lt=readings[0][0]
+            )
+            .order_by("id").values_list("machine_id", "date", "total_count")
+        )
+        last = {(machine_id, day): count for machine_id, day, count in earlier}
+    for _, machine_id, day, count, created_at in readings:
+        key = bucket(machine_id, created_at)
+        if key is not None:
+            row = totals.setdefault(key, {})
+            row["produced_count"] = row.get("produced_count", 0) + count - last.get((machine_id, day), 0)
+        last[(machine_id, day)] = count
+
+    batches = (
+        ToolChangeBatch.objects.filter(machine_id__in=machine_ids, timestamp__gte=span_start, timestamp__lt=span_end)
+        .annotate(item_count=Count("items")).values_list("machine_id", "timestamp", "item_count")
+    )
+    for machine_id, timestamp, item_count in batches:
+        key = bucket(machine_id, timestamp)
+        if key is not None:
+            row = totals.setdefault(key, {})
+            row["tool_changes"] = row.get("tool_changes", 0) + 1
+            row["tool_items"] = row.get("tool_items", 0) + item_count
+
+    sessions = (
+        WorkSession.objects.filter(machine_id__in=machine_ids, start_time__gte=span_start, start_time__lt=span_end)
+        .values_list("machine_id", "user_id", "start_time", "end_time", "produced_count")
+    )
+    for machine_id, user_id, start_time, end_time, produced in sessions:
+        key = bucket(machine_id, start_time)
+        if key is None:
+            continue
+        seconds = max(int((end_time - start_time).total_seconds()), 0)
+        row = totals.setdefault(key, {})
+        row["work_sessions"] = row.get("work_sessions", 0) + 1
+        row["work_seconds"] = row.get("work_seconds", 0) + seconds
+        row["session_produced"] = row.get("session_produced", 0) + (produced or 0)
+        op = operators.setdefault((user_id, *key), {"work_sessions": 0, "work_seconds": 0, "produced_count": 0})
+        op["work_sessions"] += 1
+        op["work_seconds"] += seconds
+        op["produced_count"] += produced or 0
+
+    replaced = Q(
+        machine_id__in=machine_ids,
+        shift_id__in={shift_id for shift_id, _ in windows},
+        shift_date__gte=min(day for _, day in windows),
+        shift_date__lte=max(day for _, day in windows),
+    )
+    with transaction.atomic():
+        ShiftRollup.objects.filter(replaced).delete()
+        ShiftOperatorRollup.objects.filter(replaced).delete()
+        ShiftRollup.objects.bulk_create(
+            ShiftRollup(machine_id=machine_id, shift_id=shift_id, shift_date=shift_date, **values)
+            for (machine_id, shift_id, shift_date), values in totals.items()
+        )
+        ShiftOperatorRollup.objects.bulk_create(
+            ShiftOperatorRollup(user_id=user_id, machine_id=machine_id, shift_id=shift_id, shift_date=shift_date, **values)
+            for (user_id, machine_id, shift_id, shift_date), values in operators.items()
+        )
+
+
+def rebuild(days):
+    """Recompute the rollups of the last `days` days for all machines (e.g. after editing the shift calendar)."""
+    shifts = list(Shift.objects.filter(is_active=True).values_list("id", "name", "start_time", "end_time"))
+    end = timezone.now()
+    start = end - timedelta(days=days)
+    machine_ids = set(DailyProduction.objects.filter(created_at__gte=start).values_list("machine_id", flat=True))
+    machine_ids |= set(ToolChangeBatch.objects.filter(timestamp__gte=start).values_list("machine_id", flat=True))
+    machine_ids |= set(WorkSession.objects.filter(start_time__gte=start).values_list("machine_id", flat=True))
+    # Pasif/silinmiş vardiyaların eski özetleri de temizlenir
+    stale = ShiftRollup.objects.filter(shift_date__gte=timezone.localtime(start).date())
+    machine_ids |= set(stale.values_list("machine_id", flat=True))
+    with transaction.atomic():
+        ShiftRollup.objects.filter(shift_date__gte=timezone.localtime(start).date()).exclude(
+            shift_id__in=[s[0] for s in shifts]
+        ).delete()
+        ShiftOperatorRollup.objects.filter(shift_date__gte=timezone.localtime(start).date()).exclude(
+            shift_id__in=[s[0] for s in shifts]
+        ).delete()
+        if machine_ids:
+            recompute(sorted(machine_ids), start, end, shifts)
+    if machine_ids:
+        touch_dashboard("machine", *machine_ids)
+    return len(machine_ids)
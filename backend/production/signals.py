@@ -0,0 +1,266 @@
+"""
+Yazma işlemlerinde ilgili önbellek ve referans veri (bkz. refdata.py)
+sürümlerini (bkz. caching.py), dashboard kart sürümlerini (bkz.
+changes.py), vardiya özetlerini (bkz. shifts.py), malzeme lotlarını (bkz.
+lots.py), düşük stok uyarılarını (bkz. stock.py), arama belgelerini (bkz.
+search.py) ve kapanmış bordro aylarını (bkz. payroll.py) günceller; alan modellerindeki yazmaları outbox'a
+(bkz. outbox.py) aynı transaction içinde ekler.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from .caching import bump_version
+from .changes import touch_dashboard_on_commit
+from .models import (
+    Plant,
+    Line,
+    Machine,
+    ToolType,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    DailyProduction,
+    WorkSession,
+    MaterialType,
+    MaterialEntry,
+    MaterialShipment,
+    Absence,
+    Advance,
+    Shift,
+)
+from . import lots, search, shifts, stock
+from .outbox import TOPICS as OUTBOX_TOPICS, record
+from .payroll import invalidate_month
+from .refdata import version_name as refdata_version
+
+
+# model -> (kart türü, kaydın etkilediği kartın id'si)
+DASHBOARD_CARDS = {
+    Machine: ("machine", lambda obj: obj.pk),
+    ToolType: ("machine", lambda obj: obj.machine_id),
+    ToolChangeBatch: ("machine", lambda obj: obj.machine_id),
+    ToolChangeBatchItem: ("machine", lambda obj: obj.batch.machine_id),
+    DailyProduction: ("machine", lambda obj: obj.machine_id),
+    WorkSession: ("machine", lambda obj: obj.machine_id),
+    MaterialType: ("material", lambda obj: obj.pk),
+    MaterialEntry: ("material", lambda obj: obj.material_type_id),
+}
+
+# model -> dashboard kartları dışında etkilediği önbellek grupları
+CACHE_DEPENDENCIES = {
+    Machine: ("machines", refdata_version(Machine)),
+    ToolType: ("machines", refdata_version(ToolType)),
+    MaterialType: (refdata_version(MaterialType),),
+    # Hat/tesis adı ve sırası listelerin sıralamasını etkiler
+    Plant: ("lines", "machines", "dashboard"),
+    Line: ("lines", "machines", "dashboard"),
+    # Dashboard o anki vardiyayı gösterir
+    Shift: ("shifts", "dashboard"),
+}
+
+
+def _on_change(sender, instance, **kwargs):
+    if sender in DASHBOARD_CARDS:
+        card, get_id = DASHBOARD_CARDS[sender]
+        touch_dashboard_on_commit(card, get_id(instance))
+    if sender in CACHE_DEPENDENCIES:
+        bump_version(*CACHE_DEPENDENCIES[sender])
+
+
+# Kullanıcı dizininde (builders.build_personnel_users) ve refdata'da tutulan alanlar
+USER_DIRECTORY_FIELDS = {"username", "first_name", "last_name"}
+
+
+def _on_user_save(sender, instance, created=False, update_fields=None, **kwargs):
+    # Girişte yapılan last_login güncellemesi dizini ve kartları etkilemez
+    if update_fields is not None and not USER_DIRECTORY_FIELDS & set(update_fields):
+        return
+    bump_version("users", refdata_version(User))
+    # Kartlarda kullanıcı adı görünür; yeni kullanıcıların kartlarda kaydı yoktur
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    touch_dashboard_on_commit("machine", *Machine.objects.values_list("id", flat=True))
+    touch_dashboard_on_commit("material", *MaterialType.objects.values_list("id", flat=True))
+
+
+def _on_user_delete(sender, instance, **kwargs):
+    bump_version("users", refdata_version(User))
+
+
+# model -> bordro ayını belirleyen tarih alanı
+PAYROLL_DATE_FIELDS = {
+    Absence: "absence_date",
+    Advance: "date",
+}
+
+
+def _on_payroll_pre_save(sender, instance, **kwargs):
+    # Tarihi değişen kayıt eski ayın toplamını da etkiler
+    if instance.pk is None:
+        return
+    field = PAYROLL_DATE_FIELDS[sender]
+    old = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+    if old is not None and old != getattr(instance, field):
+        invalidate_month(old)
+
+
+def _on_payroll_change(sender, instance, **kwargs):
+    invalidate_month(getattr(instance, PAYROLL_DATE_FIELDS[sender]))
+
+
+# model -> vardiyayı belirleyen zaman alanı, yeni kaydı özete ekleyen fonksiyon
+SHIFT_SOURCES = {
+    DailyProduction: ("created_at", shifts.add_reading),
+    ToolChangeBatch: ("timestamp", shifts.add_tool_change),
+    WorkSession: ("start_time", shifts.add_session),
+}
+
+
+def _refresh_shift(sender, machine_id, moment):
+    if sender is DailyProduction:
+        shifts.refresh_reading_on_commit(machine_id, moment)
+    else:
+        shifts.refresh_on_commit(machine_id, moment)
+
+
+def _on_shift_source_pre_save(sender, instance, raw=False, **kwargs):
+    # Makinesi/zamanı değişen kayıt eski vardiyanın özetinden de çıkmalı
+    if raw or instance.pk is None:
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list("machine_id", SHIFT_SOURCES[sender][0]).first()
+    if old is not None:
+        _refresh_shift(sender, *old)
+
+
+def _on_shift_source_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    field, add = SHIFT_SOURCES[sender]
+    if created:
+        add(instance)
+    else:
+        _refresh_shift(sender, instance.machine_id, getattr(instance, field))
+
+
+def _on_shift_source_delete(sender, instance, **kwargs):
+    _refresh_shift(sender, instance.machine_id, getattr(instance, SHIFT_SOURCES[sender][0]))
+
+
+def _on_tool_item_save(sender, instance, created=False, raw=False, **kwargs):
+    # API kalemleri bulk_create ile ekler (services.create_tool_change); bu yol admin içindir
+    if created and not raw:
+        shifts.add_tool_items(instance.batch, 1)
+
+
+def _on_entry_pre_save(sender, instance, raw=False, **kwargs):
+    # Yeni lot tam dolu başlar; düzenlenen lotun kalanı çıkışlara göre yeniden hesaplanır
+    if not raw:
+        instance.remaining_units = lots.lot_remaining(instance)
+
+
+def _on_shipment_pre_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.pk is not None:
+        old = sender.objects.filter(pk=instance.pk).values_list("material_type_id", "boxes_count", "units_per_box").first()
+        if old == (instance.material_type_id, instance.boxes_count, instance.units_per_box):
+            return
+        # Miktarı değişen çıkış lotlara iade edilip baştan dağıtılır
+        lots.release(instance.pk)
+    lots.plan(instance)
+
+
+def _on_shipment_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        lots.apply(instance)
+
+
+def _on_shipment_pre_delete(sender, instance, origin=None, **kwargs):
+    # Malzeme tipiyle birlikte silinen lotlara iade yapılmaz
+    if getattr(origin, "model", type(origin)) is not MaterialType:
+        lots.release(instance.pk)
+
+
+def _on_stock_pre_save(sender, instance, raw=False, **kwargs):
+    # Malzemesi değişen giriş/çıkış eski malzemenin stoğunu da etkiler
+    if raw or instance.pk is None:
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list("material_type_id", flat=True).first()
+    if old != instance.material_type_id:
+        stock.evaluate_on_commit(old)
+
+
+def _on_stock_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stock.evaluate_on_commit(instance.material_type_id)
+
+
+def _on_material_type_save(sender, instance, raw=False, **kwargs):
+    # Eşik ya da aktiflik değişmiş olabilir
+    if not raw:
+        stock.evaluate_on_commit(instance.pk)
+
+
+def _on_search_source_save(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        search.index(instance, created)
+
+
+def _on_search_source_delete(sender, instance, origin=None, **kwargs):
+    # Üst kayıtla birlikte silinenlerin belgeleri _on_search_parent_delete'te toplu silinir
+    if getattr(origin, "model", type(origin)) not in SEARCH_PARENTS:
+        search.unindex(instance)
+
+
+# Bağlı arama belgeleri silinen ya da bağlantısı boşaltılan üst modeller
+SEARCH_PARENTS = (Machine, MaterialType, User)
+
+
+def _on_search_parent_delete(sender, instance, **kwargs):
+    search.unindex_parent(sender, instance.pk)
+
+
+def _on_outbox_save(sender, instance, created=False, raw=False, **kwargs):
+    # loaddata ile gelen kayıtlar akışa yazılmaz
+    if raw:
+        return
+    record(instance, "created" if created else "updated")
+
+
+def _on_outbox_delete(sender, instance, **kwargs):
+    record(instance, "deleted")
+
+
+for _model in {**DASHBOARD_CARDS, **CACHE_DEPENDENCIES}:
+    post_save.connect(_on_change, sender=_model, dispatch_uid=f"dashboard-save-{_model.__name__}")
+    # Kalemler batch ile birlikte silinir (cascade ya da batch'i de kaydeden admin
+    # formu); batch'in sinyali yeterli, kalem başına batch sorgusu yapılmasın
+    if _model is not ToolChangeBatchItem:
+        post_delete.connect(_on_change, sender=_model, dispatch_uid=f"dashboard-delete-{_model.__name__}")
+post_save.connect(_on_user_save, sender=User, dispatch_uid="dashboard-save-User")
+post_delete.connect(_on_user_delete, sender=User, dispatch_uid="users-delete-User")
+for _model in PAYROLL_DATE_FIELDS:
+    pre_save.connect(_on_payroll_pre_save, sender=_model, dispatch_uid=f"payroll-pre-save-{_model.__name__}")
+    post_save.connect(_on_payroll_change, sender=_model, dispatch_uid=f"payroll-save-{_model.__name__}")
+    post_delete.connect(_on_payroll_change, sender=_model, dispatch_uid=f"payroll-delete-{_model.__name__}")
+for _model in SHIFT_SOURCES:
+    pre_save.connect(_on_shift_source_pre_save, sender=_model, dispatch_uid=f"shifts-pre-save-{_model.__name__}")
+    post_save.connect(_on_shift_source_save, sender=_model, dispatch_uid=f"shifts-save-{_model.__name__}")
+    post_delete.connect(_on_shift_source_delete, sender=_model, dispatch_uid=f"shifts-delete-{_model.__name__}")
+post_save.connect(_on_tool_item_save, sender=ToolChangeBatchItem, dispatch_uid="shifts-save-ToolChangeBatchItem")
+pre_save.connect(_on_entry_pre_save, sender=MaterialEntry, dispatch_uid="lots-pre-save-MaterialEntry")
+pre_save.connect(_on_shipment_pre_save, sender=MaterialShipment, dispatch_uid="lots-pre-save-MaterialShipment")
+post_save.connect(_on_shipment_save, sender=MaterialShipment, dispatch_uid="lots-save-MaterialShipment")
+pre_delete.connect(_on_shipment_pre_delete, sender=MaterialShipment, dispatch_uid="lots-pre-delete-MaterialShipment")
+for _model in (MaterialEntry, MaterialShipment):
+    pre_save.connect(_on_stock_pre_save, sender=_model, dispatch_uid=f"stock-pre-save-{_model.__name__}")
+    post_save.connect(_on_stock_change, sender=_model, dispatch_uid=f"stock-save-{_model.__name__}")
+    post_delete.connect(_on_stock_change, sender=_model, dispatch_uid=f"stock-delete-{_model.__name__}")
+post_save.connect(_on_material_type_save, sender=MaterialType, dispatch_uid="stock-save-MaterialType")
+for _model in search.SOURCES:
+    post_save.connect(_on_search_source_save, sender=_model, dispatch_uid=f"search-save-{_model.__name__}")
+    post_delete.connect(_on_search_source_delete, sender=_model, dispatch_uid=f"search-delete-{_model.__name__}")
+for _model in SEARCH_PARENTS:
+    pre_delete.connect(_on_search_parent_delete, sender=_model, dispatch_uid=f"search-pre-delete-{_model.__name__}")
+for _model in OUTBOX_TOPICS:
+    post_save.connect(_on_outbox_save, sender=_model, dispatch_uid=f"outbox-save-{_model.__name__}")
+    post_delete.connect(_on_outbox_delete, sender=_model, dispatch_uid=f"outbox-delete-{_model.__name__}")
@@ -0,0 +1,112 @@
+"""
+Yavaş sorgu kaydı.
+
+SlowQueryMiddleware her istekte sorguları süreyle izler; SLOW_QUERY_MS'i
+aşanlar yanıttan sonra (view'ın transaction'ı dışında) SlowQuery'de
+sorgu şekline (fingerprint) göre toplanır. Yeni bir şeklin planı istek
+yolunda değil, arka plan işinde (jobs.capture_query_plan) EXPLAIN ile
+alınır; ANALYZE kullanılmaz, sorgu tekrar çalıştırılmaz.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SlowQuery
+
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(sql):
+    """SQL with literals and parameter lists collapsed, so the same query shape has one fingerprint."""
+    sql = sql.replace("%s", "?")
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+class SlowQueryCollector:
+    """execute_wrapper that keeps (alias, sql, example, ms) for queries over the threshold."""
+
+    def __init__(self, threshold_ms):
+        self.threshold_ms = threshold_ms
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if elapsed_ms >= self.threshold_ms and not many:
+                conn = context["connection"]
+                try:
+                    example = conn.ops.last_executed_query(context["cursor"], sql, params)
+                except Exception:
+                    example = sql
+                self.slow.append((conn.alias, sql, example, elapsed_ms))
+
+
+def record(slow, view):
+    """Add the collected slow queries to the log; returns ids of shapes seen for the first time."""
+    now = timezone.now()
+    new_ids = []
+    for alias, sql, example, elapsed_ms in slow:
+        normalized = normalize(sql)
+        fp = fingerprint(normalized)
+        values = dict(
+            calls=F("calls") + 1, total_ms=F("total_ms") + elapsed_ms, max_ms=Greatest("max_ms", elapsed_ms),
+            example=example, view=view, last_seen=now,
+        )
+        if SlowQuery.objects.filter(fingerprint=fp).update(**values):
+            continue
+        try:
+            with transaction.atomic():
+                query = SlowQuery.objects.create(
+                    fingerprint=fp, db=alias, sql=normalized, example=example, view=view,
+                    calls=1, total_ms=elapsed_ms, max_ms=elapsed_ms, last_seen=now,
+                )
+            new_ids.append(query.pk)
+        except IntegrityError:
+            # Başka bir worker aynı anda ekledi
+            SlowQuery.objects.filter(fingerprint=fp).update(**values)
+    return new_ids
+
+
+def capture_plan(query_id):
+    """EXPLAIN (without ANALYZE) the latest example of a slow query and store the plan."""
+    query = SlowQuery.objects.filter(pk=query_id).first()
+    if query is None:
+        return None
+    if not query.example.lstrip().upper().startswith(("SELECT", "WITH")):
+        plan = "Yalnızca SELECT sorgularının planı alınır"
+    else:
+        conn = connections[query.db] if query.db in connections else connections["default"]
+        with conn.cursor() as cursor:
+            cursor.execute(f"{conn.ops.explain_query_prefix()} {query.example}")
+            plan = "\n".join(" ".join(str(col) for col in row) for row in cursor.fetchall())
+    SlowQuery.objects.filter(pk=query_id).update(plan=plan, plan_captured_at=timezone.now())
+    return plan
+
+
+def trim():
+    """Keep the SLOW_QUERY_MAX_ENTRIES most expensive shapes (by total time)."""
+    keep = getattr(settings, "SLOW_QUERY_MAX_ENTRIES", 100)
+    ids = list(SlowQuery.objects.order_by("-total_ms").values_list("id", flat=True)[keep:])
+    if ids:
+        SlowQuery.objects.filter(id__in=ids).delete()
+    return len(ids)
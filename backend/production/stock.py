@@ -0,0 +1,99 @@
+"""
+Düşük stok uyarıları.
+
+Malzeme tipinin reorder_level'ı (adet) varsa, stoğu (girişler - çıkışlar,
+adet) bu değere ya da altına indiğinde bir StockAlert açılır, tekrar eşiğin
+üstüne çıktığında kapatılır; kapanan uyarılar geçmiş olarak kalır. Değerlendirme
+yalnızca değişen malzeme için, giriş/çıkış ya da eşik yazmasının
+transaction'ı commit edildikten sonra yapılır (bkz. signals.py); tüm
+malzemeleri periyodik tarayan bir iş yoktur.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .changes import defer_on_commit, touch_dashboard
+from .metrics import stock_alert
+from .models import MaterialEntry, MaterialShipment, MaterialType, StockAlert
+
+
+
+def _units(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(material_type=OuterRef("pk")).order_by().values("material_type")
+            .annotate(total=Sum(F("boxes_count") * F("units_per_box"))).values("total"),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def evaluate(material_id):
+    """
+    Open or resolve the low-stock alert of one material from its current stock.
+    Returns "opened", "resolved" or None (no transition).
+    """
+    with transaction.atomic():
+        # Aynı malzemenin değerlendirmeleri sırayla çalışır: açık uyarı yokken kilitlenecek satır yoktur,
+        # ve kilit alındıktan sonraki sorgu diğerinin commit ettiği girişleri/çıkışları görür
+        locked = MaterialType.objects.select_for_update().filter(pk=material_id).values_list("pk", flat=True)
+        if not list(locked):
+            return None  # malzeme silindi; uyarıları cascade ile gitti
+        is_active, reorder_level, units_in, units_out = (
+            MaterialType.objects.filter(pk=material_id)
+            .annotate(units_in=_units(MaterialEntry), units_out=_units(MaterialShipment))
+            .values_list("is_active", "reorder_level", "units_in", "units_out")
+            .get()
+        )
+        stock_units = units_in - units_out
+        low = is_active and reorder_level is not None and stock_units <= reorder_level
+        alert = StockAlert.objects.select_for_update().filter(material_type_id=material_id, resolved_at__isnull=True).first()
+
+        if alert is None and low:
+            try:
+                with transaction.atomic():
+                    StockAlert.objects.create(
+                        material_type_id=material_id, stock_units=stock_units, reorder_level=reorder_level
+                    )
+            except IntegrityError:
+                # unique_open_stock_alert: başka bir değerlendirme uyarıyı zaten açtı
+                return None
+            transition = "opened"
+        elif alert is not None and not low:
+            alert.stock_units = stock_units
+            alert.resolved_at = timezone.now()
+            alert.save(update_fields=["stock_units", "resolved_at"])
+            transition = "resolved"
+        elif alert is not None and (alert.stock_units, alert.reorder_level) != (stock_units, reorder_level):
+            # Açık uyarının stoğu güncel tutulur; durum değişmez
+            StockAlert.objects.filter(pk=alert.pk).update(stock_units=stock_units, reorder_level=reorder_level)
+            transition = None
+        else:
+            return None
+    if transition is not None:
+        stock_alert(transition)
+    touch_dashboard("material", material_id)
+    return transition
+
+
+def _flush_evaluations(material_ids):
+    for material_id in sorted(material_ids):
+        evaluate(material_id)
+
+
+def evaluate_on_commit(*material_ids):
+    """evaluate(), deferred to commit and de-duplicated per transaction."""
+    material_ids = {mid for mid in material_ids if mid is not None}
+    if material_ids:
+        defer_on_commit("stock-alerts", lambda state: state.update(dict.fromkeys(material_ids)), _flush_evaluations)
+
+
+def open_alerts(material_ids):
+    """{material_id: open StockAlert} for the given materials (one query)."""
+    return {
+        alert.material_type_id: alert
+        for alert in StockAlert.objects.filter(material_type_id__in=material_ids, resolved_at__isnull=True)
+    }
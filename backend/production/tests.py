@@ -1,3 +1,1241 @@
-from django.test import TestCase
+import base64
+import importlib
+import time as time_module
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import auth, builders, devices, history, lots, outbox, payroll, purge, refdata, search, shifts, stock
+from .builders import (
+    absence_rows,
+    activity_log_rows,
+    advance_rows,
+    material_entry_rows,
+    material_lot_rows,
+    material_shipment_rows,
+    stock_alert_rows,
+)
+from .caching import bump_version, cached, get_version
+from .changes import card_versions, changes_since, touch_dashboard
+from .jobs import JobCancelled
+from .history import daily_production_rows, tool_change_batch_rows, work_session_rows
+from .models import (
+    Absence,
+    ActivityLog,
+    Advance,
+    DailyProduction,
+    DashboardChange,
+    DeviceToken,
+    Job,
+    Line,
+    Machine,
+    MaterialEntry,
+    MaterialShipment,
+    MaterialType,
+    OperatorPin,
+    OutboxConsumer,
+    OutboxEvent,
+    PayrollTotal,
+    Plant,
+    SearchDocument,
+    Shift,
+    ShiftOperatorRollup,
+    ShiftRollup,
+    ShipmentAllocation,
+    StockAlert,
+    ToolChangeBatch,
+    ToolChangeBatchItem,
+    ToolType,
+    WorkSession,
+)
+from .renderers import ORJSONRenderer
+from .routers import read_replica
+from .throttling import LoginUsernameThrottle
+from .serializers import (
+    AbsenceSerializer,
+    ActivityLogSerializer,
+    AdvanceSerializer,
+    DailyProductionSerializer,
+    MaterialEntrySerializer,
+    MaterialLotSerializer,
+    MaterialShipmentSerializer,
+    StockAlertSerializer,
+    ToolChangeBatchSerializer,
+    WorkSessionSerializer,
+)
+
+
+class WriteQueryBudgetTests(TestCase):
+    """
+    SQL round trips of each create endpoint, request to response (see services.py).
+
+    Sayılar tam eşitlikle kontrol edilir: bir değişiklik sorgu ekliyorsa bütçe
+    gerekçesiyle birlikte burada güncellenmelidir. Oturum/kullanıcı sorguları
+    (force_authenticate) ve commit sonrası işler (dashboard kart sürümü,
+    stok uyarısı) sayıya dahil değildir; test transaction'ı commit olmaz.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # Önbellek test transaction'ıyla geri alınmaz; önceki testlerin vardiya takvimi kalmasın
+        cache.clear()
+        cls.admin = User.objects.create_user(username="admin", password=None, is_staff=True)
+        cls.worker = User.objects.create_user(username="worker", password=None)
+        cls.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        cls.tool_type_ids = [ToolType.objects.create(machine=cls.machine, name=f"T{i}").id for i in range(3)]
+        cls.material = MaterialType.objects.create(name="Vida")
+        # Tüm günü kapsayan vardiya: vardiya özeti upsert'leri de sayılır
+        Shift.objects.create(name="Gün", start_time=time(0), end_time=time(0))
+
+    def setUp(self):
+        caches["throttle"].clear()
+        # Vardiya takvimi worker önbelleğinden okunur (bkz. shifts.active_shifts)
+        shifts.active_shifts()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def assertPostQueries(self, count, url, data):
+        with self.assertNumQueries(count):
+            response = self.client.post(url, data, format="json", secure=True)
+        self.assertEqual(response.status_code, 201, response.content)
+
+    # Her servis: SAVEPOINT + RELEASE (servisin transaction.atomic'i, test transaction'ı içinde)
+
+    def test_tool_change(self):
+        # takım tipleri, batch, batch outbox, vardiya özeti (batch + kalem sayısı), kalemler,
+        # kalem outbox'ları, aktivite, aktivite arama belgesi
+        self.assertPostQueries(2 + 8, "/api/tool-change/", {
+            "machine_id": self.machine.id, "tool_type_ids": self.tool_type_ids, "current_counter": 1,
+        })
+
+    def test_daily_production(self):
+        # makine, kayıt, outbox, önceki okuma (sayaç farkı), vardiya özeti, aktivite, aktivite arama belgesi
+        self.assertPostQueries(2 + 7, "/api/daily-production/", {"machine_id": self.machine.id, "total_count": 10})
+
+    def test_work_session(self):
+        # kullanıcı + makine (tek UNION), kayıt, outbox, vardiya özeti, operatör vardiya özeti,
+        # aktivite, aktivite arama belgesi
+        now = timezone.now().isoformat()
+        self.assertPostQueries(2 + 7, "/api/work-session/", {
+            "user_id": self.worker.id, "machine_id": self.machine.id, "start_time": now, "end_time": now,
+        })
+
+    def test_work_session_with_note(self):
+        # notlu seans kendi arama belgesini de yazar
+        now = timezone.now().isoformat()
+        self.assertPostQueries(2 + 8, "/api/work-session/", {
+            "user_id": self.worker.id, "machine_id": self.machine.id, "start_time": now, "end_time": now,
+            "note": "kalıp ısındı",
+        })
+
+    def test_material_entry(self):
+        # malzeme, kayıt, outbox, aktivite, aktivite arama belgesi
+        self.assertPostQueries(2 + 5, "/api/materials/entry/", {
+            "material_type_id": self.material.id, "boxes_count": 2, "units_per_box": 10,
+        })
+
+    def test_material_shipment(self):
+        # malzeme, açık lotlar (kilitli), kayıt, outbox, lot bakiyeleri, lot dağıtımı, aktivite,
+        # aktivite arama belgesi
+        self.client.post("/api/materials/entry/", {
+            "material_type_id": self.material.id, "boxes_count": 2, "units_per_box": 10,
+        }, format="json", secure=True)
+        self.assertPostQueries(2 + 8, "/api/materials/shipment/", {
+            "material_type_id": self.material.id, "boxes_count": 1, "units_per_box": 10,
+        })
+
+    def test_absence(self):
+        # kullanıcı, kayıt, outbox, aktivite, aktivite arama belgesi
+        self.assertPostQueries(2 + 5, "/api/personnel/absences/create/", {
+            "user_id": self.worker.id, "absence_date": timezone.localdate().isoformat(),
+        })
+
+    def test_advance(self):
+        # kullanıcı, kayıt, outbox, aktivite, aktivite arama belgesi
+        self.assertPostQueries(2 + 5, "/api/personnel/advances/create/", {
+            "user_id": self.worker.id, "amount": "100.00", "date": timezone.localdate().isoformat(),
+        })
+
+
+class ValuesSerializerTests(TestCase):
+    """ValuesSerializer (fast_serializers.py) must render exactly what the ModelSerializer it replaces renders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Önbellek test transaction'ıyla geri alınmaz; önceki testlerin vardiya takvimi kalmasın
+        cache.clear()
+        user = User.objects.create_user(username="worker", password=None, first_name="Ali", last_name="Yılmaz")
+        machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        tool_type = ToolType.objects.create(machine=machine, name="Zımba")
+        material = MaterialType.objects.create(name="Vida", reorder_level=1000)
+        now = timezone.now()
+        # Her modelde FK'si boş satırlar var: DRF "x.username" alanını çıktıya hiç koymaz (SkipField)
+        for i, by in enumerate([user, None]):
+            ActivityLog.objects.create(user=by, action="tool_change", machine=machine if by else None, details=f"d{i}")
+            batch = ToolChangeBatch.objects.create(machine=machine, changed_by=by, current_counter=i or None)
+            ToolChangeBatchItem.objects.create(batch=batch, tool_type=tool_type, extra_note="x" if by else None)
+            DailyProduction.objects.create(machine=machine, date=now.date(), total_count=i * 10, recorded_by=by)
+            WorkSession.objects.create(
+                user=user, machine=machine, start_time=now - timedelta(hours=1), end_time=now,
+                produced_count=i or None, note="not" if by else None,
+            )
+            MaterialEntry.objects.create(material_type=material, boxes_count=2, units_per_box=10, created_by=by)
+            MaterialShipment.objects.create(material_type=material, boxes_count=1, units_per_box=5, created_by=by)
+            Absence.objects.create(user=user, absence_date=now.date() - timedelta(days=i), recorded_by=by)
+            Advance.objects.create(user=user, amount=Decimal("100.25") + i, date=now.date(), recorded_by=by)
+        # Boş batch: iç içe liste boş olmalı
+        ToolChangeBatch.objects.create(machine=machine)
+        StockAlert.objects.get_or_create(material_type=material, resolved_at=None, defaults={
+            "stock_units": 10, "reorder_level": 1000,
+        })
+
+    def assertSameOutput(self, serializer_class, fast, queryset):
+        render = ORJSONRenderer().render
+        expected = serializer_class(queryset.all(), many=True).data
+        actual = fast.serialize(queryset.all())
+        self.assertTrue(expected)
+        self.assertEqual(render(actual).decode(), render(expected).decode())
+
+    def test_activity_log(self):
+        self.assertSameOutput(ActivityLogSerializer, activity_log_rows, ActivityLog.objects.order_by("id"))
+
+    def test_tool_change_batch(self):
+        self.assertSameOutput(ToolChangeBatchSerializer, tool_change_batch_rows, ToolChangeBatch.objects.order_by("id"))
+
+    def test_daily_production(self):
+        self.assertSameOutput(DailyProductionSerializer, daily_production_rows, DailyProduction.objects.order_by("id"))
+
+    def test_work_session(self):
+        self.assertSameOutput(WorkSessionSerializer, work_session_rows, WorkSession.objects.order_by("id"))
+
+    def test_material_entry(self):
+        self.assertSameOutput(MaterialEntrySerializer, material_entry_rows, MaterialEntry.objects.order_by("id"))
+
+    def test_material_lot(self):
+        self.assertSameOutput(MaterialLotSerializer, material_lot_rows, MaterialEntry.objects.order_by("id"))
+
+    def test_material_shipment(self):
+        self.assertSameOutput(MaterialShipmentSerializer, material_shipment_rows, MaterialShipment.objects.order_by("id"))
+
+    def test_stock_alert(self):
+        self.assertSameOutput(StockAlertSerializer, stock_alert_rows, StockAlert.objects.order_by("id"))
+
+    def test_absence(self):
+        self.assertSameOutput(AbsenceSerializer, absence_rows, Absence.objects.order_by("id"))
+
+    def test_advance(self):
+        self.assertSameOutput(AdvanceSerializer, advance_rows, Advance.objects.order_by("id"))
+
+
+@mock.patch("production.routers.replica_configured", return_value=True)
+class ReplicaCacheTests(TestCase):
+    """Values built from the replica must not be served to clients reading from the primary."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_replica_fill_is_not_served_from_primary(self, _):
+        # Yazmadan sonra sürüm arttı; gecikmeli replika eski değeri yeni sürümle doldurur
+        bump_version("machines")
+        with read_replica():
+            self.assertEqual(cached("machines", lambda: "eski"), "eski")
+            self.assertEqual(cached("machines", lambda: "yeni"), "eski")
+        self.assertEqual(cached("machines", lambda: "yeni"), "yeni")
+
+
+class ShipmentLotTransactionTests(TransactionTestCase):
+    """Lot locking (lots.plan, pre_save) and writing (lots.apply, post_save) need one transaction."""
+
+    def test_plain_save_runs_in_a_transaction(self):
+        material = MaterialType.objects.create(name="Vida")
+        lot = MaterialEntry.objects.create(material_type=material, boxes_count=2, units_per_box=10)
+        plan = lots.plan
+        in_transaction = []
+        with mock.patch.object(lots, "plan", side_effect=lambda s: in_transaction.append(connection.in_atomic_block) or plan(s)):
+            MaterialShipment.objects.create(material_type=material, boxes_count=1, units_per_box=5)
+        self.assertEqual(in_transaction, [True])
+        lot.refresh_from_db()
+        self.assertEqual(lot.remaining_units, 15)
+
+
+class DashboardVersionTests(TestCase):
+    """The dashboard version handed to clients must not pass changes that may still be joined by a lower id."""
+
+    def test_version_waits_for_recent_changes_to_settle(self):
+        touch_dashboard("machine", 1)
+        touch_dashboard("material", 2)
+        first, second = DashboardChange.objects.order_by("id").values_list("id", flat=True)
+        # Yeni değişiklikler gönderilir ama sürüm ilerlemez
+        self.assertEqual(changes_since(0, 10), (0, {("machine", 1), ("material", 2)}))
+        self.assertEqual(card_versions(), ({("machine", 1): first, ("material", 2): second}, 0))
+
+        DashboardChange.objects.filter(pk=first).update(changed_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(changes_since(0, 10), (first, {("machine", 1), ("material", 2)}))
+        self.assertEqual(card_versions()[1], first)
+        # Yerleşmemiş değişiklik bir sonraki istekte tekrar gelir
+        self.assertEqual(changes_since(first, 10), (first, {("material", 2)}))
+
+
+class DashboardBuildTests(TestCase):
+    """Dashboard cards come from the newest rows per machine / material, in a fixed number of queries."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="usta", password=None)
+        self.other = User.objects.create_user(username="kalfa", password=None)
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        self.idle = Machine.objects.create(name="Pres 2", short_name="P2", order_in_line=2)
+        self.punch = ToolType.objects.create(machine=self.machine, name="Zımba")
+        self.die = ToolType.objects.create(machine=self.machine, name="Kalıp")
+        self.material = MaterialType.objects.create(name="Vida")
+        self.unused = MaterialType.objects.create(name="Somun")
+
+    def add_history(self, rounds):
+        now = timezone.now()
+        for i in range(rounds):
+            batch = ToolChangeBatch.objects.create(machine=self.machine, changed_by=self.other, current_counter=i)
+            ToolChangeBatchItem.objects.create(batch=batch, tool_type=self.punch)
+            WorkSession.objects.create(
+                user=self.other, machine=self.machine,
+                start_time=now - timedelta(days=i + 1, hours=2), end_time=now - timedelta(days=i + 1),
+            )
+            MaterialEntry.objects.create(material_type=self.material, boxes_count=1, units_per_box=10, created_by=self.other)
+        ToolChangeBatch.objects.update(timestamp=now - timedelta(days=1))
+        MaterialEntry.objects.update(created_at=now - timedelta(days=1))
+
+    def add_latest(self):
+        now = timezone.now()
+        batch = ToolChangeBatch.objects.create(machine=self.machine, changed_by=self.user, current_counter=500)
+        ToolChangeBatchItem.objects.create(batch=batch, tool_type=self.punch)
+        ToolChangeBatchItem.objects.create(batch=batch, tool_type=self.die)
+        session = WorkSession.objects.create(user=self.user, machine=self.machine, start_time=now - timedelta(hours=1), end_time=now)
+        DailyProduction.objects.create(machine=self.machine, date=timezone.localdate(), total_count=120)
+        DailyProduction.objects.create(machine=self.machine, date=timezone.localdate(), total_count=150)
+        MaterialEntry.objects.create(material_type=self.material, boxes_count=2, units_per_box=5, created_by=self.user)
+        return session
+
+    def test_cards_show_the_newest_rows(self):
+        self.add_history(3)
+        session = self.add_latest()
+        dashboard = builders._build_dashboard()
+
+        card, idle = dashboard["machines"]
+        self.assertEqual(card["last_counter"], 500)
+        self.assertEqual(card["last_change_teams"], "Zımba + Kalıp")
+        self.assertEqual(card["last_change_user"], "usta")
+        self.assertEqual(card["today_total"], 150)
+        self.assertEqual(card["last_session_user"], "usta")
+        self.assertEqual(card["last_session_range"], f"{session.start_time:%H:%M}–{session.end_time:%H:%M}")
+        self.assertEqual(
+            (idle["last_counter"], idle["last_change_teams"], idle["today_total"], idle["last_session_user"]),
+            (None, "", None, ""),
+        )
+
+        # Girişi olmayan malzeme listelenmez
+        [material] = dashboard["material_summary"]
+        self.assertEqual(material["material_id"], self.material.id)
+        self.assertEqual((material["total_boxes"], material["total_units"], material["entry_count"]), (5, 40, 4))
+        self.assertEqual(material["last_updated_by"], "usta")
+
+    def test_material_without_entries_is_listed_last_when_alerted(self):
+        self.add_history(1)
+        StockAlert.objects.create(material_type=self.unused, stock_units=0, reorder_level=10)
+        summary = builders._build_dashboard()["material_summary"]
+        self.assertEqual([row["material_id"] for row in summary], [self.material.id, self.unused.id])
+        self.assertEqual(
+            (summary[1]["total_boxes"], summary[1]["entry_count"], summary[1]["last_updated"], summary[1]["last_updated_by"]),
+            (0, 0, None, "—"),
+        )
+
+    def test_equal_timestamps_pick_the_highest_id(self):
+        first = ToolChangeBatch.objects.create(machine=self.machine, changed_by=self.other, current_counter=1)
+        second = ToolChangeBatch.objects.create(machine=self.machine, changed_by=self.user, current_counter=2)
+        ToolChangeBatch.objects.filter(pk__in=[first.pk, second.pk]).update(timestamp=timezone.now())
+        self.assertEqual(builders._build_dashboard()["machines"][0]["last_counter"], 2)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_history(1)
+        self.add_latest()
+        builders._build_dashboard()  # refdata tabloları ısınır
+        with CaptureQueriesContext(connection) as short:
+            builders._build_dashboard()
+        self.add_history(20)
+        self.add_latest()
+        builders._build_dashboard()
+        with self.assertNumQueries(len(short.captured_queries)):
+            builders._build_dashboard()
+
+
+class MaterialLineScopeTests(TestCase):
+    """A line sees its own and the shared materials; other lines' materials are neither listed nor summed."""
+
+    def setUp(self):
+        cache.clear()
+        plant = Plant.objects.create(name="Fabrika", code="F1")
+        self.line = Line.objects.create(plant=plant, name="Hat 1", code="H1")
+        other_line = Line.objects.create(plant=plant, name="Hat 2", code="H2")
+        self.own = MaterialType.objects.create(name="Vida", line=self.line)
+        self.shared = MaterialType.objects.create(name="Pul")
+        self.foreign = MaterialType.objects.create(name="Somun", line=other_line)
+        for material, boxes in ((self.own, 3), (self.shared, 2), (self.foreign, 7)):
+            MaterialEntry.objects.create(material_type=material, boxes_count=boxes, units_per_box=10)
+        MaterialShipment.objects.create(material_type=self.shared, boxes_count=1, units_per_box=10)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username="usta", password=None))
+
+    def test_dashboard_lists_line_and_shared_materials(self):
+        summary = builders._build_dashboard(self.line.id)["material_summary"]
+        self.assertEqual(
+            sorted((row["material_id"], row["total_boxes"]) for row in summary),
+            [(self.own.id, 3), (self.shared.id, 2)],
+        )
+
+    def test_stock_summary_lists_line_and_shared_materials(self):
+        response = self.client.get("/api/materials/stock/", {"line": self.line.id}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted((row["id"], row["in_boxes"], row["out_boxes"]) for row in response.json()),
+            [(self.own.id, 3, 0), (self.shared.id, 2, 1)],
+        )
+        everything = self.client.get("/api/materials/stock/", secure=True).json()
+        self.assertEqual(len(everything), 3)
+
+
+class HistoryCursorTests(TestCase):
+    """Machine history keyset cursors: stable across equal sort values, rejected when tampered with."""
+
+    def setUp(self):
+        cache.clear()
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        self.client = APIClient()
+
+    def pages(self, section, limit):
+        url = f"/api/machines/{self.machine.id}/history/"
+        params = {"section": section, "limit": limit}
+        pages = []
+        while True:
+            response = self.client.get(url, params, secure=True)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            pages.append([row["id"] for row in body["results"]])
+            if body["next_cursor"] is None:
+                return pages
+            params["cursor"] = body["next_cursor"]
+
+    def test_cursor_round_trip(self):
+        moment = timezone.now()
+        self.assertEqual(history._decode_cursor(history._encode_cursor(moment, 7), False), (moment, 7))
+        self.assertEqual(history._decode_cursor(history._encode_cursor(date(2024, 2, 29), 3), True), (date(2024, 2, 29), 3))
+
+    def test_equal_timestamps_are_paged_by_id(self):
+        ids = [
+            ToolChangeBatch.objects.create(machine=self.machine, current_counter=i).id
+            for i in range(5)
+        ]
+        ToolChangeBatch.objects.update(timestamp=timezone.now())
+        self.assertEqual(self.pages("batches", 2), [ids[:2:-1], ids[2:0:-1], ids[:1]])
+
+    def test_equal_dates_are_paged_by_id(self):
+        today = timezone.localdate()
+        ids = [DailyProduction.objects.create(machine=self.machine, date=today, total_count=i).id for i in range(3)]
+        older = DailyProduction.objects.create(machine=self.machine, date=today - timedelta(days=1), total_count=0).id
+        self.assertEqual(self.pages("daily", 2), [ids[:0:-1], [ids[0], older]])
+
+    def test_full_last_page_has_no_next_cursor(self):
+        for i in range(4):
+            ToolChangeBatch.objects.create(machine=self.machine, current_counter=i)
+        self.assertEqual([len(page) for page in self.pages("batches", 2)], [2, 2])
+        self.assertEqual([len(page) for page in self.pages("batches", 4)], [4])
+
+    def test_invalid_cursor_is_rejected(self):
+        def encode(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode()
+
+        url = f"/api/machines/{self.machine.id}/history/"
+        for cursor in (
+            "bozuk!!",
+            encode("2024-01-01T00:00:00+00:00"),
+            encode("2024-01-01T00:00:00+00:00|x"),
+            encode("dün|5"),
+            encode("2024-01-01T00:00:00|5"),  # saat dilimsiz
+            base64.urlsafe_b64encode(b"\xff\xfe|5").decode(),
+        ):
+            response = self.client.get(url, {"section": "batches", "cursor": cursor}, secure=True)
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.json(), {"detail": "Geçersiz cursor"})
+
+
+class SearchTests(TestCase):
+    """Search documents follow their source rows; non-admins only see public and their own personal documents."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username="sef", password=None, is_staff=True)
+        self.user = User.objects.create_user(username="usta", password=None)
+        self.other = User.objects.create_user(username="kalfa", password=None)
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+
+    def found(self, q, user=None):
+        documents, _ = search.search(q, user or self.admin)
+        return {(d.kind, d.object_id) for d in documents}
+
+    def fts_rowids(self, word):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {search.FTS_TABLE} WHERE {search.FTS_TABLE} MATCH %s", [f'"{word}"'])
+            return {row[0] for row in cursor.fetchall()}
+
+    def test_edit_reindexes_and_delete_removes(self):
+        batch = ToolChangeBatch.objects.create(machine=self.machine, note="Zımba kırıldı")
+        self.assertEqual(self.found("zımba"), {("tool_change", batch.id)})
+
+        batch.note = "Kalıp çatladı"
+        batch.save()
+        self.assertEqual(self.found("zımba"), set())
+        self.assertEqual(self.found("kalıp"), {("tool_change", batch.id)})
+
+        # Not silinince belge de gider
+        batch.note = "  "
+        batch.save()
+        self.assertFalse(SearchDocument.objects.exists())
+
+        batch.note = "Kalıp değişti"
+        batch.save()
+        batch.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertEqual(self.found("kalıp"), set())
+
+    def test_parent_delete_removes_documents(self):
+        ToolChangeBatch.objects.create(machine=self.machine, note="Zımba kırıldı")
+        activity = ActivityLog.objects.create(user=self.user, action="tool_change", machine=self.machine, details="Zımba")
+        self.machine.delete()
+        # Aktivite kaydı kalır (SET_NULL); yalnızca bağlantısı boşalır
+        self.assertEqual(list(SearchDocument.objects.values_list("kind", "object_id", "machine_id")), [("activity", activity.id, None)])
+
+    def test_visibility(self):
+        batch = ToolChangeBatch.objects.create(machine=self.machine, note="Zımba değişti")
+        activity = ActivityLog.objects.create(user=self.user, action="tool_change", machine=self.machine, details="Zımba değişti")
+        own = Absence.objects.create(user=self.user, absence_date=timezone.localdate(), reason="Zımba yetiştirme")
+        other = Absence.objects.create(user=self.other, absence_date=timezone.localdate(), reason="Zımba yetiştirme")
+
+        self.assertEqual(self.found("zımba", self.user), {("tool_change", batch.id), ("absence", own.id)})
+        self.assertEqual(
+            self.found("zımba"),
+            {("tool_change", batch.id), ("activity", activity.id), ("absence", own.id), ("absence", other.id)},
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/search/", {"q": "zımba", "kind": "activity"}, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [])
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 sorgusu yalnızca SQLite'ta")
+    def test_sqlite_words_are_quoted_prefixes(self):
+        batch = ToolChangeBatch.objects.create(machine=self.machine, note="Zımba kırıldı")
+        self.assertEqual(self.found("kır"), {("tool_change", batch.id)})
+        self.assertEqual(self.found('zımba" * ('), {("tool_change", batch.id)})
+        # OR bir işleç değil, aranan bir kelimedir
+        self.assertEqual(self.found("zımba OR kalıp"), set())
+        self.assertEqual(self.found('"" ()'), set())
+
+    @skipUnless(connection.vendor == "sqlite", "FTS5 tetikleyicileri yalnızca SQLite'ta")
+    def test_sqlite_triggers_keep_fts_table_in_sync(self):
+        batch = ToolChangeBatch.objects.create(machine=self.machine, note="Zımba kırıldı")
+        document = SearchDocument.objects.get()
+        self.assertEqual(self.fts_rowids("zımba"), {document.id})
+
+        batch.note = "Kalıp çatladı"
+        batch.save()
+        self.assertEqual((self.fts_rowids("zımba"), self.fts_rowids("kalıp")), (set(), {document.id}))
+
+        batch.delete()
+        self.assertEqual(self.fts_rowids("kalıp"), set())
+
+    def test_backfill_indexes_existing_rows(self):
+        backfill_documents = importlib.import_module("production.migrations.0023_search_index").backfill_documents
+        batch = ToolChangeBatch.objects.create(machine=self.machine, note="Zımba kırıldı")
+        ToolChangeBatch.objects.create(machine=self.machine, note="")
+        absence = Absence.objects.create(user=self.user, absence_date=timezone.localdate(), reason="Rapor", note="Grip")
+        SearchDocument.objects.all().delete()
+
+        backfill_documents(apps, None)
+        self.assertEqual(
+            set(SearchDocument.objects.values_list("kind", "object_id", "body")),
+            {("tool_change", batch.id, "Zımba kırıldı"), ("absence", absence.id, "Rapor\nGrip")},
+        )
+        self.assertEqual(self.found("grip"), {("absence", absence.id)})
+
+
+@override_settings(OUTBOX_SETTLE_SECONDS=60)
+class OutboxTests(TestCase):
+    """The change feed only hands out settled events; consumers only move forward and keep unread events alive."""
+
+    def event(self, age, topic="tool_change"):
+        event = OutboxEvent.objects.create(topic=topic, action="created", object_id=1, payload={})
+        OutboxEvent.objects.filter(pk=event.pk).update(created_at=timezone.now() - age)
+        return event.pk
+
+    def test_feed_waits_for_the_settle_window(self):
+        old = [self.event(timedelta(minutes=5)) for _ in range(3)]
+        recent = self.event(timedelta(seconds=10))
+
+        rows, next_after, has_more = outbox.read_feed(0, 2)
+        self.assertEqual(([row["id"] for row in rows], next_after, has_more), (old[:2], old[1], True))
+        rows, next_after, has_more = outbox.read_feed(next_after, 2)
+        self.assertEqual(([row["id"] for row in rows], next_after, has_more), (old[2:], old[2], False))
+        # Yerleşmemiş olay verilmez; imleç yerinde kalır
+        self.assertEqual(outbox.read_feed(old[2], 2), ([], old[2], False))
+
+        OutboxEvent.objects.filter(pk=recent).update(created_at=timezone.now() - timedelta(minutes=1, seconds=1))
+        self.assertEqual([row["id"] for row in outbox.read_feed(old[2], 2)[0]], [recent])
+
+    def test_feed_stops_at_the_oldest_open_transaction(self):
+        before = self.event(timedelta(minutes=10))
+        after = self.event(timedelta(minutes=5))
+        # Yedi dakika önce başlamış, hâlâ açık bir transaction: sonraki olaylar onu beklemeli
+        with mock.patch.object(outbox, "_oldest_open_transaction", return_value=timezone.now() - timedelta(minutes=7)):
+            self.assertEqual([row["id"] for row in outbox.read_feed(0, 10)[0]], [before])
+        self.assertEqual([row["id"] for row in outbox.read_feed(0, 10)[0]], [before, after])
+
+    def test_topic_filter(self):
+        batch = self.event(timedelta(minutes=5))
+        self.event(timedelta(minutes=5), topic="absence")
+        self.assertEqual([row["id"] for row in outbox.read_feed(0, 10, ["tool_change"])[0]], [batch])
+
+    def test_ack_only_moves_forward(self):
+        self.assertEqual(outbox.consumer_position("erp"), 0)
+        self.assertEqual(outbox.ack("erp", 5), 5)
+        self.assertEqual(outbox.ack("erp", 3), 5)
+        self.assertEqual(outbox.ack("erp", 9), 9)
+        self.assertEqual(outbox.consumer_position("erp"), 9)
+
+    def test_prune_keeps_what_the_slowest_consumer_has_not_read(self):
+        old = [self.event(timedelta(days=40)) for _ in range(4)]
+        recent = self.event(timedelta(days=1))
+        outbox.ack("erp", old[3])
+        outbox.ack("mes", old[1])
+
+        self.assertEqual(outbox.prune(30), 2)
+        self.assertEqual(list(OutboxEvent.objects.order_by("id").values_list("id", flat=True)), [*old[2:], recent])
+
+        # Kayıtlı tüketici yoksa yalnızca yaş belirleyicidir
+        OutboxConsumer.objects.all().delete()
+        self.assertEqual(outbox.prune(30), 2)
+        self.assertEqual(list(OutboxEvent.objects.values_list("id", flat=True)), [recent])
+
+    def test_feed_api(self):
+        event = self.event(timedelta(minutes=5))
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="usta", password=None))
+        self.assertEqual(client.get("/api/feed/", secure=True).status_code, 403)
+
+        client.force_authenticate(User.objects.create_user(username="sef", password=None, is_staff=True))
+        response = client.post("/api/feed/ack/", {"consumer": "erp", "position": event}, format="json", secure=True)
+        self.assertEqual(response.json(), {"consumer": "erp", "position": event})
+        body = client.get("/api/feed/", {"consumer": "erp"}, secure=True).json()
+        self.assertEqual((body["events"], body["next_after"], body["has_more"]), ([], event, False))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], AUTH_USER_CACHE_TTL=60)
+class AuthCacheTests(TestCase):
+    """The session user comes from the worker cache until its shared version moves."""
+
+    def setUp(self):
+        cache.clear()
+        auth.clear_user_cache()
+        self.user = User.objects.create_user(username="usta", password="sifre-1234")
+        self.client.force_login(self.user)
+
+    def whoami(self):
+        return self.client.get("/api/whoami/", secure=True).json()
+
+    def deactivate_elsewhere(self):
+        # Başka bir worker'daki yazma: bu worker'da sinyal çalışmaz, yalnızca paylaşılan sürüm artar
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+    def test_cached_user_skips_the_query(self):
+        self.assertTrue(self.whoami()["is_authenticated"])
+        self.deactivate_elsewhere()
+        self.assertTrue(self.whoami()["is_authenticated"])
+
+    def test_deactivation_takes_effect_on_the_next_request(self):
+        self.assertTrue(self.whoami()["is_authenticated"])
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.whoami()["is_authenticated"])
+
+    def test_version_bump_from_another_worker(self):
+        self.assertTrue(self.whoami()["is_authenticated"])
+        self.deactivate_elsewhere()
+        bump_version(auth.version_name(self.user.pk))
+        self.assertFalse(self.whoami()["is_authenticated"])
+
+    def test_bulk_admin_action_invalidates(self):
+        self.assertTrue(self.whoami()["is_authenticated"])
+        self.deactivate_elsewhere()
+        auth.invalidate_cached_users(User.objects.values_list("pk", flat=True))
+        self.assertFalse(self.whoami()["is_authenticated"])
+
+    def test_logout_bumps_the_version(self):
+        self.whoami()
+        version = get_version(auth.version_name(self.user.pk))
+        self.client.logout()
+        self.assertEqual(get_version(auth.version_name(self.user.pk)), version + 1)
+
+
+class RefdataInvalidationTests(TestCase):
+    """Renaming a reference row drops the per-worker name table, so ValuesSerializer output shows the new name."""
+
+    def setUp(self):
+        cache.clear()
+        refdata.clear()
+        self.user = User.objects.create_user(username="usta", password=None)
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        self.tool_type = ToolType.objects.create(machine=self.machine, name="Zımba")
+        self.material = MaterialType.objects.create(name="Vida")
+        ActivityLog.objects.create(user=self.user, action="tool_change", machine=self.machine)
+        MaterialEntry.objects.create(material_type=self.material, boxes_count=1, units_per_box=10, created_by=self.user)
+
+    def names(self):
+        [activity] = activity_log_rows.serialize(ActivityLog.objects.all())
+        [entry] = material_entry_rows.serialize(MaterialEntry.objects.all())
+        return (
+            activity["user_username"], activity["machine_short_name"],
+            entry["material_type_name"], entry["created_by_username"],
+            refdata.lookup(ToolType, self.tool_type.pk, "name"),
+        )
+
+    def test_rename_invalidates_the_table(self):
+        self.assertEqual(self.names(), ("usta", "P1", "Vida", "usta", "Zımba"))
+        # Tablolar ısındı: adlar artık sorgusuz çözülür
+        with self.assertNumQueries(2):
+            self.names()
+
+        self.user.username = "kalfa"
+        self.user.save(update_fields=["username"])
+        self.machine.short_name = "PR1"
+        self.machine.save()
+        self.material.name = "Cıvata"
+        self.material.save()
+        self.tool_type.name = "Kalıp"
+        self.tool_type.save()
+        self.assertEqual(self.names(), ("kalfa", "PR1", "Cıvata", "kalfa", "Kalıp"))
+
+    def test_login_does_not_invalidate_user_names(self):
+        self.names()
+        version = get_version(refdata.version_name(User))
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=["last_login"])
+        self.assertEqual(get_version(refdata.version_name(User)), version)
+
+
+class PayrollCloseTests(TestCase):
+    """A write that commits while a month is being closed must not leave stale stored totals."""
+
+    def test_write_during_close_is_picked_up(self):
+        user = User.objects.create_user(username="worker", password=None)
+        month = payroll.add_months(payroll.month_start(timezone.localdate()), -1)
+        Advance.objects.create(user=user, amount=Decimal("50.00"), date=month)
+        aggregate = payroll._aggregate
+        # İlk hesaplama avans commit olmadan yapılmış gibi: ay boş kaydedilir, kontrol hesabı düzeltir
+        with mock.patch.object(payroll, "_aggregate", side_effect=[{}, aggregate(month, payroll.add_months(month, 1))]):
+            self.assertEqual(payroll.close_months([month]), [month])
+        self.assertEqual(
+            list(PayrollTotal.objects.filter(period__month=month).values_list("user_id", "advance_total")),
+            [(user.id, Decimal("50.00"))],
+        )
+
+
+class StockAlertTests(TestCase):
+    """stock.evaluate() opens, updates and resolves one alert per low-stock episode."""
+
+    def setUp(self):
+        self.material = MaterialType.objects.create(name="Vida", reorder_level=100)
+
+    def add_stock(self, boxes):
+        MaterialEntry.objects.create(material_type=self.material, boxes_count=boxes, units_per_box=10)
+
+    def open_alert(self):
+        return StockAlert.objects.filter(material_type=self.material, resolved_at__isnull=True).values_list(
+            "stock_units", "reorder_level"
+        ).first()
+
+    def test_open_update_resolve(self):
+        self.add_stock(5)
+        self.assertEqual(stock.evaluate(self.material.id), "opened")
+        self.assertEqual(self.open_alert(), (50, 100))
+
+        self.add_stock(2)
+        self.assertIsNone(stock.evaluate(self.material.id))
+        self.assertEqual(self.open_alert(), (70, 100))
+
+        self.add_stock(10)
+        self.assertEqual(stock.evaluate(self.material.id), "resolved")
+        self.assertIsNone(self.open_alert())
+        self.assertEqual(StockAlert.objects.get(material_type=self.material).stock_units, 170)
+
+    def test_repeat_evaluate_is_no_transition(self):
+        self.add_stock(5)
+        stock.evaluate(self.material.id)
+        self.assertIsNone(stock.evaluate(self.material.id))
+        self.assertEqual(StockAlert.objects.filter(material_type=self.material).count(), 1)
+
+        self.add_stock(10)
+        stock.evaluate(self.material.id)
+        self.assertIsNone(stock.evaluate(self.material.id))
+        self.assertEqual(StockAlert.objects.filter(material_type=self.material).count(), 1)
+
+    def test_concurrently_opened_alert_is_kept(self):
+        # Başka bir değerlendirme uyarıyı kilit okunduktan sonra açmış gibi
+        self.add_stock(5)
+        StockAlert.objects.create(material_type=self.material, stock_units=50, reorder_level=100)
+        with mock.patch.object(StockAlert.objects, "select_for_update", return_value=StockAlert.objects.none()):
+            self.assertIsNone(stock.evaluate(self.material.id))
+        self.assertEqual(StockAlert.objects.filter(material_type=self.material).count(), 1)
+
+
+class LotAllocationTests(TestCase):
+    """FIFO allocation of shipments to material lots (lots.py, wired up in signals.py)."""
+
+    def setUp(self):
+        self.material = MaterialType.objects.create(name="Vida")
+        self.lots = [
+            MaterialEntry.objects.create(material_type=self.material, boxes_count=1, units_per_box=10) for _ in range(3)
+        ]
+
+    def ship(self, units, material=None):
+        return MaterialShipment.objects.create(material_type=material or self.material, boxes_count=1, units_per_box=units)
+
+    def remaining(self):
+        return list(MaterialEntry.objects.filter(pk__in=[lot.pk for lot in self.lots]).order_by("id")
+                    .values_list("remaining_units", flat=True))
+
+    def allocations(self, shipment):
+        return list(ShipmentAllocation.objects.filter(shipment=shipment).order_by("lot_id").values_list("lot_id", "units"))
+
+    def test_shipment_spans_lots_in_fifo_order(self):
+        shipment = self.ship(25)
+        self.assertEqual(self.remaining(), [0, 0, 5])
+        self.assertEqual(self.allocations(shipment), [(self.lots[0].pk, 10), (self.lots[1].pk, 10), (self.lots[2].pk, 5)])
+        self.assertEqual(shipment.unallocated_units, 0)
+        # Sonraki çıkış kalan lottan devam eder
+        self.assertEqual(self.allocations(self.ship(3)), [(self.lots[2].pk, 3)])
+        self.assertEqual(self.remaining(), [0, 0, 2])
+
+    def test_shortfall_goes_to_unallocated_units(self):
+        shipment = self.ship(45)
+        self.assertEqual(self.remaining(), [0, 0, 0])
+        shipment.refresh_from_db()
+        self.assertEqual(shipment.unallocated_units, 15)
+        self.assertEqual(sum(units for _, units in self.allocations(shipment)), 30)
+
+    def test_delete_releases_lots(self):
+        first = self.ship(15)
+        self.ship(10)
+        self.assertEqual(self.remaining(), [0, 0, 5])
+        first.delete()
+        self.assertEqual(self.remaining(), [10, 5, 5])
+        self.assertFalse(ShipmentAllocation.objects.filter(shipment_id=first.pk).exists())
+
+    def test_quantity_edit_releases_and_replans(self):
+        shipment = self.ship(15)
+        shipment.units_per_box = 5
+        shipment.save()
+        self.assertEqual(self.remaining(), [5, 10, 10])
+        self.assertEqual(self.allocations(shipment), [(self.lots[0].pk, 5)])
+
+        shipment.note = "not"
+        shipment.save()  # miktar aynı: dağıtıma dokunulmaz
+        self.assertEqual(self.remaining(), [5, 10, 10])
+
+    def test_material_edit_moves_allocation(self):
+        other = MaterialType.objects.create(name="Somun")
+        other_lot = MaterialEntry.objects.create(material_type=other, boxes_count=1, units_per_box=10)
+        shipment = self.ship(8)
+        shipment.material_type = other
+        shipment.save()
+        self.assertEqual(self.remaining(), [10, 10, 10])
+        self.assertEqual(self.allocations(shipment), [(other_lot.pk, 8)])
+
+    def test_entry_edit_keeps_consumed_units(self):
+        lot = MaterialEntry.objects.create(material_type=MaterialType.objects.create(name="Pul"), boxes_count=2, units_per_box=10)
+        self.ship(15, material=lot.material_type)
+        lot.refresh_from_db()
+        self.assertEqual(lot.remaining_units, 5)
+
+        lot.units_per_box = 5  # 10 adetlik lottan 15 adet çıkmış: kalan eksiye düşmez
+        lot.save()
+        lot.refresh_from_db()
+        self.assertEqual(lot.remaining_units, 0)
+
+        lot.units_per_box = 20
+        lot.save()
+        lot.refresh_from_db()
+        self.assertEqual(lot.remaining_units, 25)
+
+    def test_backfill_migration(self):
+        backfill_lots = importlib.import_module("production.migrations.0021_backfill_lots").backfill_lots
+        # Lotlardan önceki veri: dağıtım yok, kalanlar tam
+        early = self.ship(4)
+        later = self.ship(25)
+        ShipmentAllocation.objects.all().delete()
+        MaterialEntry.objects.update(remaining_units=0)
+        MaterialShipment.objects.update(unallocated_units=0)
+        start = timezone.now() - timedelta(days=1)
+        MaterialShipment.objects.filter(pk=early.pk).update(created_at=start)  # hiçbir lottan önce
+        for i, lot in enumerate(self.lots):
+            MaterialEntry.objects.filter(pk=lot.pk).update(created_at=start + timedelta(hours=i + 1))
+        MaterialShipment.objects.filter(pk=later.pk).update(created_at=start + timedelta(hours=2, minutes=30))
+
+        backfill_lots(apps, None)
+
+        # Geç çıkış yalnızca kendisinden önce girilmiş iki lottan düşer
+        self.assertEqual(self.remaining(), [0, 0, 10])
+        self.assertEqual(self.allocations(early), [])
+        self.assertEqual(self.allocations(later), [(self.lots[0].pk, 10), (self.lots[1].pk, 10)])
+        self.assertEqual(
+            dict(MaterialShipment.objects.filter(pk__in=[early.pk, later.pk]).values_list("pk", "unallocated_units")),
+            {early.pk: 4, later.pk: 5},
+        )
+
+
+class FakeJobContext:
+    """Records ctx.progress() calls; raises JobCancelled after `cancel_after` calls."""
+
+    def __init__(self, cancel_after=None):
+        self.calls = []
+        self.cancel_after = cancel_after
+
+    def progress(self, percent, message=""):
+        self.calls.append(percent)
+        if self.cancel_after is not None and len(self.calls) >= self.cancel_after:
+            raise JobCancelled()
+
+
+@override_settings(PURGE_CHUNK_SIZE=2)
+class PurgeTests(TestCase):
+    """Chunked background delete of machines and tool types (purge.py) and the soft-delete API around it."""
+
+    def setUp(self):
+        cache.clear()
+        caches["throttle"].clear()
+        self.admin = User.objects.create_user(username="admin", password=None, is_staff=True)
+        Shift.objects.create(name="Gün", start_time=time(0), end_time=time(0))
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        self.kept, self.purged = (ToolType.objects.create(machine=self.machine, name=name) for name in ("A", "B"))
+        for _ in range(3):
+            batch = ToolChangeBatch.objects.create(machine=self.machine)
+            for tool_type in (self.kept, self.purged):
+                ToolChangeBatchItem.objects.create(batch=batch, tool_type=tool_type)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def rollup(self):
+        return ShiftRollup.objects.filter(machine=self.machine).values_list("tool_changes", "tool_items").get()
+
+    def test_tool_type_purge(self):
+        self.assertEqual(self.rollup(), (3, 6))
+        purge.mark_tool_type_deleted(self.purged)
+        ctx = FakeJobContext()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = purge.purge_tool_type(ctx, self.purged.id)
+        self.assertEqual(result, {"rows": 3 + 1})
+        self.assertEqual(ctx.calls, [66, 99])
+        self.assertFalse(ToolType.objects.filter(pk=self.purged.pk).exists())
+        self.assertEqual(ToolChangeBatchItem.objects.filter(batch__machine=self.machine).count(), 3)
+        # Sinyalsiz silinen kalemler vardiya özetinden ve dashboard kartından düşer
+        self.assertEqual(self.rollup(), (3, 3))
+        self.assertTrue(DashboardChange.objects.filter(card="machine", object_id=self.machine.id).exists())
+
+    def test_resume_after_interruption(self):
+        purge.mark_tool_type_deleted(self.purged)
+        with self.assertRaises(JobCancelled):
+            purge.purge_tool_type(FakeJobContext(cancel_after=1), self.purged.id)
+        # İlk parça kendi transaction'ında kaldı; tekrar çalıştırma kalandan devam eder
+        self.assertEqual(ToolChangeBatchItem.objects.filter(tool_type=self.purged).count(), 1)
+        self.assertEqual(self.rollup(), (3, 4))
+        ctx = FakeJobContext()
+        self.assertEqual(purge.purge_tool_type(ctx, self.purged.id), {"rows": 1 + 1})
+        self.assertEqual(ctx.calls, [99])
+        self.assertEqual(self.rollup(), (3, 3))
+        # Silinmemiş (ya da zaten silinmiş) kayıt için iş bir şey yapmaz
+        self.assertEqual(purge.purge_tool_type(FakeJobContext(), self.purged.id), {"rows": 0})
+        self.assertEqual(purge.purge_tool_type(FakeJobContext(), self.kept.id), {"rows": 0})
+
+    def test_machine_purge(self):
+        log = ActivityLog.objects.create(user=self.admin, action="tool_change", machine=self.machine)
+        purge.mark_machine_deleted(self.machine)
+        ctx = FakeJobContext()
+        result = purge.purge_machine(ctx, self.machine.id)
+        # 6 kalem + 3 batch + 1 vardiya özeti + 1 aktivite bağlantısı + makinenin kendisi
+        self.assertEqual(result, {"rows": 6 + 3 + 1 + 1 + 1})
+        self.assertEqual(ctx.calls[-1], 99)
+        self.assertEqual(ctx.calls, sorted(ctx.calls))
+        self.assertFalse(Machine.objects.filter(pk=self.machine.pk).exists())
+        self.assertFalse(ToolType.objects.filter(pk__in=[self.kept.pk, self.purged.pk]).exists())
+        log.refresh_from_db()
+        self.assertIsNone(log.machine_id)
+
+    def delete(self, url):
+        return self.client.delete(url, secure=True)
+
+    def test_delete_machine_enqueues_purge(self):
+        response = self.delete(f"/api/admin/machines/{self.machine.id}/delete/")
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()["job_id"])
+        self.assertEqual((job.kind, job.params, job.status), ("purge_machine", {"machine_id": self.machine.id}, "queued"))
+        self.machine.refresh_from_db()
+        self.assertIsNotNone(self.machine.deleted_at)
+        self.assertFalse(self.machine.is_active)
+        self.assertEqual(ToolType.objects.filter(machine=self.machine, deleted_at__isnull=True).count(), 0)
+        self.assertEqual(self.delete(f"/api/admin/machines/{self.machine.id}/delete/").status_code, 404)
+
+    def test_delete_tool_type_enqueues_purge(self):
+        response = self.delete(f"/api/admin/tooltypes/{self.purged.id}/delete/")
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get(pk=response.json()["job_id"])
+        self.assertEqual((job.kind, job.params), ("purge_tool_type", {"tool_type_id": self.purged.id}))
+        self.assertEqual(self.delete(f"/api/admin/tooltypes/{self.purged.id}/delete/").status_code, 404)
+
+    def test_delete_requires_admin(self):
+        self.client.force_authenticate(User.objects.create_user(username="worker", password=None))
+        self.assertEqual(self.delete(f"/api/admin/machines/{self.machine.id}/delete/").status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def post(self, url, data):
+        return self.client.post(url, data, format="json", secure=True)
+
+    def test_writes_to_deleted_records_are_rejected(self):
+        purge.mark_tool_type_deleted(self.purged)
+        response = self.post("/api/tool-change/", {"machine_id": self.machine.id, "tool_type_ids": [self.purged.id]})
+        self.assertEqual(response.status_code, 400)
+
+        purge.mark_machine_deleted(self.machine)
+        now = timezone.now().isoformat()
+        for url, data in (
+            ("/api/tool-change/", {"machine_id": self.machine.id, "tool_type_ids": [self.kept.id]}),
+            ("/api/daily-production/", {"machine_id": self.machine.id, "total_count": 10}),
+            ("/api/work-session/", {"user_id": self.admin.id, "machine_id": self.machine.id, "start_time": now, "end_time": now}),
+        ):
+            self.assertEqual(self.post(url, data).status_code, 404, url)
+        self.assertEqual(ToolChangeBatch.objects.filter(machine=self.machine).count(), 3)
+
+
+class ShiftRollupTests(TestCase):
+    """Incremental shift rollups (shifts.py): upsert, counter deltas, midnight attribution, recompute parity."""
+
+    def setUp(self):
+        cache.clear()
+        self.day = Shift.objects.create(name="Gündüz", start_time=time(6), end_time=time(22))
+        self.night = Shift.objects.create(name="Gece", start_time=time(22), end_time=time(6))
+        self.machine = Machine.objects.create(name="Pres 1", short_name="P1", order_in_line=1)
+        self.user = User.objects.create_user(username="worker", password=None)
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def rollups(self, model=ShiftRollup, **filters):
+        fields = [f.name for f in model._meta.concrete_fields if f.name != "id"]
+        return sorted(model.objects.filter(**filters).values_list(*fields))
+
+    def test_night_shift_is_attributed_to_its_start_day(self):
+        self.assertEqual(shifts.shift_at(self.at(date(2026, 3, 9), 23)), (self.night.id, date(2026, 3, 9)))
+        self.assertEqual(shifts.shift_at(self.at(date(2026, 3, 10), 2)), (self.night.id, date(2026, 3, 9)))
+        self.assertEqual(shifts.shift_at(self.at(date(2026, 3, 10), 6)), (self.day.id, date(2026, 3, 10)))
+
+        start = self.at(date(2026, 3, 10), 2)
+        WorkSession.objects.create(user=self.user, machine=self.machine, start_time=start, end_time=start + timedelta(hours=1))
+        self.assertEqual(
+            list(ShiftRollup.objects.values_list("shift_id", "shift_date", "work_sessions", "work_seconds")),
+            [(self.night.id, date(2026, 3, 9), 1, 3600)],
+        )
+
+    def test_upsert_accumulates_into_one_row(self):
+        start = self.at(date(2026, 3, 10), 8)
+        for minutes in (30, 45):
+            WorkSession.objects.create(
+                user=self.user, machine=self.machine, start_time=start, end_time=start + timedelta(minutes=minutes),
+                produced_count=10,
+            )
+        self.assertEqual(
+            list(ShiftRollup.objects.values_list("work_sessions", "work_seconds", "session_produced")),
+            [(2, 75 * 60, 20)],
+        )
+        self.assertEqual(
+            list(ShiftOperatorRollup.objects.values_list("user_id", "work_sessions", "produced_count")),
+            [(self.user.id, 2, 20)],
+        )
+
+    def test_cumulative_readings_count_their_delta(self):
+        today = timezone.localdate()
+        for total in (100, 250, 300):
+            DailyProduction.objects.create(machine=self.machine, date=today, total_count=total)
+        self.assertEqual(sum(ShiftRollup.objects.values_list("produced_count", flat=True)), 300)
+        # Başka günün sayacı sıfırdan başlar
+        DailyProduction.objects.create(machine=self.machine, date=today - timedelta(days=1), total_count=40)
+        self.assertEqual(sum(ShiftRollup.objects.values_list("produced_count", flat=True)), 340)
+
+    def test_recompute_matches_incremental_rollups(self):
+        today = timezone.localdate()
+        other = Machine.objects.create(name="Pres 2", short_name="P2", order_in_line=2)
+        tool_type = ToolType.objects.create(machine=self.machine, name="Zımba")
+        for total in (100, 180):
+            DailyProduction.objects.create(machine=self.machine, date=today, total_count=total)
+        DailyProduction.objects.create(machine=other, date=today, total_count=70)
+        batch = ToolChangeBatch.objects.create(machine=self.machine)
+        ToolChangeBatchItem.objects.create(batch=batch, tool_type=tool_type)
+        ToolChangeBatchItem.objects.create(batch=batch, tool_type=tool_type)
+        for start in (self.at(today, 23), self.at(today - timedelta(days=1), 10), timezone.now() - timedelta(hours=1)):
+            WorkSession.objects.create(
+                user=self.user, machine=self.machine, start_time=start, end_time=start + timedelta(minutes=50),
+                produced_count=5,
+            )
+        incremental = self.rollups(), self.rollups(ShiftOperatorRollup)
+        self.assertTrue(incremental[0])
+
+        ShiftRollup.objects.update(produced_count=0, tool_items=99)
+        ShiftOperatorRollup.objects.all().delete()
+        shifts.recompute([self.machine.id, other.id], timezone.now() - timedelta(days=2), timezone.now() + timedelta(days=1))
+        self.assertEqual((self.rollups(), self.rollups(ShiftOperatorRollup)), incremental)
+
+
+@override_settings(OPERATOR_PIN_MAX_FAILURES=3)
+class DeviceTests(TestCase):
+    """Tablet keys (DeviceTokenAuthentication) and operator switching with a PIN."""
+
+    def setUp(self):
+        caches["throttle"].clear()
+        self.device = DeviceToken(name="Tablet 1")
+        self.key = devices.issue_key(self.device)
+        self.device.save()
+        self.operator = User.objects.create_user(username="operator", password=None)
+        devices.set_operator_pin(self.operator, "246810")
+        self.client = APIClient(HTTP_AUTHORIZATION=f"Device {self.key}")
+
+    def whoami(self, client=None):
+        return (client or self.client).get("/api/whoami/", secure=True)
+
+    def switch(self, user, pin):
+        return self.client.post("/api/devices/operator/", {"user_id": user.id, "pin": pin}, format="json", secure=True)
+
+    def test_key_authenticates_as_current_operator(self):
+        self.assertFalse(self.whoami().json().get("is_authenticated", False))
+        self.assertEqual(self.switch(self.operator, "246810").status_code, 200)
+        self.assertEqual(self.whoami().json()["username"], "operator")
+        self.device.refresh_from_db()
+        self.assertEqual(self.device.current_user_id, self.operator.id)
+        self.assertIsNotNone(self.device.last_seen_at)
+
+    def test_invalid_and_revoked_keys_are_rejected(self):
+        # İlk kimlik doğrulayıcı (oturum) WWW-Authenticate vermediğinden DRF 403 döner
+        bad = APIClient(HTTP_AUTHORIZATION="Device yanlis")
+        self.assertEqual(self.whoami(bad).status_code, 403)
+        DeviceToken.objects.filter(pk=self.device.pk).update(revoked_at=timezone.now())
+        self.assertEqual(self.whoami().status_code, 403)
+        self.assertIn("iptal", self.whoami().json()["detail"])
+
+    def test_wrong_pin(self):
+        response = self.switch(self.operator, "000000")
+        self.assertEqual(response.status_code, 401)
+        self.device.refresh_from_db()
+        self.assertIsNone(self.device.current_user_id)
+
+    def test_user_is_locked_after_repeated_failures(self):
+        for _ in range(3):
+            self.assertEqual(self.switch(self.operator, "000000").status_code, 401)
+        # Kilit kullanıcıdadır: doğru PIN de, başka tabletten gelen deneme de reddedilir
+        response = self.switch(self.operator, "246810")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response)
+        other = DeviceToken(name="Tablet 2")
+        self.client = APIClient(HTTP_AUTHORIZATION=f"Device {devices.issue_key(other)}")
+        other.save()
+        self.assertEqual(self.switch(self.operator, "246810").status_code, 429)
+
+        OperatorPin.objects.filter(user=self.operator).update(
+            locked_until=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.switch(self.operator, "246810").status_code, 200)
+
+    def test_success_resets_failure_count(self):
+        for _ in range(2):
+            self.switch(self.operator, "000000")
+        self.assertEqual(self.switch(self.operator, "246810").status_code, 200)
+        for _ in range(2):
+            self.assertEqual(self.switch(self.operator, "000000").status_code, 401)
+        self.assertEqual(self.switch(self.operator, "246810").status_code, 200)
+
+    def test_staff_cannot_become_operator(self):
+        staff = User.objects.create_user(username="admin", password=None, is_staff=True)
+        devices.set_operator_pin(staff, "135790")
+        self.assertEqual(self.switch(staff, "135790").status_code, 401)
+        # Önceden atanmış yönetici operatör de cihaza yetki vermez
+        DeviceToken.objects.filter(pk=self.device.pk).update(current_user=staff)
+        self.assertFalse(self.whoami().json().get("is_authenticated", False))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ThrottleTests(TestCase):
+    """Token bucket throttles on login (throttling.py): 10/min per IP, 5/min per username by default."""
+
+    def setUp(self):
+        caches["throttle"].clear()
+        self.client = APIClient()
+
+    def login(self, username, ip):
+        return self.client.post(
+            "/api/login/", {"username": username, "password": "yanlis"}, format="json", secure=True, REMOTE_ADDR=ip
+        )
+
+    def test_username_bucket_spans_ips(self):
+        for i in range(5):
+            self.assertEqual(self.login("Ali", f"10.0.0.{i}").status_code, 401)
+        # Kullanıcı adı büyük/küçük harf ve boşluk farkıyla da aynı kovadır
+        response = self.login(" ali ", "10.0.0.99")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(self.login("veli", "10.0.0.99").status_code, 401)
+
+    def test_ip_bucket_spans_usernames(self):
+        for i in range(10):
+            self.assertEqual(self.login(f"user{i}", "10.0.0.1").status_code, 401)
+        self.assertEqual(self.login("user99", "10.0.0.1").status_code, 429)
+        self.assertEqual(self.login("user99", "10.0.0.2").status_code, 401)
+
+    def test_bucket_refills_over_time(self):
+        throttle = LoginUsernameThrottle()
+        request = mock.Mock(data={"username": "ali"})
+        with mock.patch("production.throttling.time.time", return_value=1000.0):
+            self.assertEqual([throttle.allow_request(request, None) for _ in range(6)], [True] * 5 + [False])
+            self.assertAlmostEqual(throttle.wait(), 12.0)
+        # 5/dk: 12 sn'de bir jeton
+        with mock.patch("production.throttling.time.time", return_value=1012.0):
+            self.assertEqual([throttle.allow_request(request, None) for _ in range(2)], [True, False])
+
+
+class LoadSheddingTests(TestCase):
+    """LoadSheddingMiddleware rejects requests that queued too long; it is not loaded without limits."""
+
+    def get(self, url, queued_ms):
+        start = f"t={int((time_module.time() * 1000) - queued_ms)}"
+        return self.client.get(url, secure=True, HTTP_X_REQUEST_START=start)
+
+    def test_not_loaded_by_default(self):
+        self.assertNotEqual(self.get("/api/whoami/", 60_000).status_code, 503)
+
+    @override_settings(LOAD_SHED_MAX_QUEUE_MS=1000, LOAD_SHED_RETRY_AFTER=7)
+    def test_sheds_requests_that_waited_too_long(self):
+        response = self.get("/api/whoami/", 5_000)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(self.get("/api/whoami/", 10).status_code, 200)
+        self.assertEqual(self.get("/api/health/", 5_000).status_code, 200)
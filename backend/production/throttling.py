@@ -0,0 +1,96 @@
+"""
+Token bucket throttles for login and write endpoints.
+
+Oranlar DRF'in DEFAULT_THROTTLE_RATES ayarından okunur ("10/min" gibi):
+kova kapasitesi sayı kadardır ve süre boyunca eşit hızla dolar; yani
+boştaki bir istemci bir anda kapasite kadar istek atabilir, sonra orana
+iner. Durum worker başına yerel önbellekte ("throttle" önbelleği) tutulur;
+worker sayısı kadar gevşeklik kabul edilir.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+from .models import DeviceToken
+
+
+_lock = threading.Lock()
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[getattr(settings, "THROTTLE_CACHE", "default")]
+        self._wait = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        capacity, period = self.num_requests, self.duration
+        refill = capacity / period
+        now = time.time()
+        with _lock:
+            tokens, stamp = self.cache.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - stamp) * refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(key, (tokens, now), period)
+        if not allowed:
+            self._wait = (1 - tokens) / refill
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    """Login attempts per client IP."""
+    scope = "login"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {"scope": self.scope, "ident": self.get_ident(request)}
+
+
+class LoginUsernameThrottle(TokenBucketThrottle):
+    """Login attempts per submitted username, whichever IP they come from."""
+    scope = "login_user"
+
+    def get_cache_key(self, request, view):
+        username = request.data.get("username")
+        if not isinstance(username, str) or not username:
+            return None
+        ident = hashlib.sha1(username.strip().lower().encode()).hexdigest()
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Create endpoints, per user (per IP when anonymous)."""
+    scope = "write"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f"user:{request.user.pk}"
+        else:
+            ident = f"ip:{self.get_ident(request)}"
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class DeviceSwitchThrottle(TokenBucketThrottle):
+    """Operator switches (PIN attempts) per device."""
+    scope = "device_switch"
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.auth, DeviceToken):
+            return self.cache_format % {"scope": self.scope, "ident": f"ip:{self.get_ident(request)}"}
+        return self.cache_format % {"scope": self.scope, "ident": f"device:{request.auth.pk}"}
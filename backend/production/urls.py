@@ -1,15 +1,21 @@
 from django.urls import path
 from .views import (
     health_check,
+    metrics_view,
     dashboard_data,
     whoami,
     login_view,
     logout_view,
+    device_operator,
     machines_list,
+    lines_list,
+    shifts_list,
+    shift_summary,
     create_tool_change,
     create_daily_production,
     create_work_session,
     machine_detail,
+    machine_history,
     admin_create_machine,
     admin_update_machine,
     admin_delete_machine,
@@ -18,7 +24,9 @@ from .views import (
     admin_activity_logs,
     material_types,
     material_stock_summary,
+    material_stock_alerts,
     material_detail,
+    material_lots,
     create_material_entry,
     create_material_shipment,
     personnel_absences,
@@ -28,19 +36,31 @@ from .views import (
     create_advance,
     delete_advance,
     personnel_users,
+    payroll_summary,
+    search_notes,
+    change_feed,
+    change_feed_ack,
+    jobs_list,
+    job_detail,
 )
 
 urlpatterns = [
     path("health/", health_check, name="health-check"),
+    path("metrics/", metrics_view, name="metrics"),
     path("whoami/", whoami, name="whoami"),
     path("login/", login_view, name="login"),
     path("logout/", logout_view, name="logout"),
+    path("devices/operator/", device_operator, name="device-operator"),
     path("dashboard/", dashboard_data, name="dashboard-data"),
     path("machines/", machines_list, name="machines-list"),
+    path("lines/", lines_list, name="lines-list"),
+    path("shifts/", shifts_list, name="shifts-list"),
+    path("shifts/summary/", shift_summary, name="shift-summary"),
     path("tool-change/", create_tool_change, name="create-tool-change"),
     path("daily-production/", create_daily_production, name="create-daily-production"),
     path("work-session/", create_work_session, name="create-work-session"),
     path("machines/<int:machine_id>/", machine_detail, name="machine-detail"),
+    path("machines/<int:machine_id>/history/", machine_history, name="machine-history"),
     # Admin endpoints
     path("admin/machines/", admin_create_machine, name="admin-create-machine"),
     path("admin/machines/<int:machine_id>/", admin_update_machine, name="admin-update-machine"),
@@ -51,7 +71,9 @@ urlpatterns = [
     # Material endpoints
     path("materials/types/", material_types, name="material-types"),
     path("materials/stock/", material_stock_summary, name="material-stock"),
+    path("materials/alerts/", material_stock_alerts, name="material-alerts"),
     path("materials/<int:material_id>/", material_detail, name="material-detail"),
+    path("materials/<int:material_id>/lots/", material_lots, name="material-lots"),
     path("materials/entry/", create_material_entry, name="material-entry"),
     path("materials/shipment/", create_material_shipment, name="material-shipment"),
     # Personnel endpoints
@@ -62,6 +84,15 @@ urlpatterns = [
     path("personnel/advances/", personnel_advances, name="personnel-advances"),
     path("personnel/advances/create/", create_advance, name="create-advance"),
     path("personnel/advances/<int:advance_id>/delete/", delete_advance, name="delete-advance"),
+    path("personnel/payroll/", payroll_summary, name="payroll-summary"),
+    # Full-text search over notes and activity details
+    path("search/", search_notes, name="search"),
+    # Integration change feed
+    path("feed/", change_feed, name="change-feed"),
+    path("feed/ack/", change_feed_ack, name="change-feed-ack"),
+    # Background jobs
+    path("jobs/", jobs_list, name="jobs-list"),
+    path("jobs/<int:job_id>/", job_detail, name="job-detail"),
 ]
 
 
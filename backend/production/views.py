@@ -1,31 +1,58 @@
-from django.utils import timezone
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import authenticate, login, logout
 from django.views.decorators.csrf import csrf_exempt
-from django.db import models
+from django.db import models, transaction
 from .models import (
     Machine,
     ToolType,
-    ToolChangeBatch,
-    ToolChangeBatchItem,
-    DailyProduction,
-    WorkSession,
     ActivityLog,
     MaterialType,
     MaterialEntry,
     MaterialShipment,
     Absence,
     Advance,
+    DeviceToken,
+    Job,
+    Shift,
+)
+from .builders import (
+    active_material_types,
+    build_whoami,
+    build_dashboard,
+    build_dashboard_delta,
+    build_machines,
+    build_lines,
+    build_machine_detail,
+    build_material_detail,
+    build_material_lots,
+    build_activity_logs,
+    build_absences,
+    build_advances,
+    build_personnel_users,
+    build_search,
+    build_payroll_summary,
+    build_shift_summary,
+    build_stock_alerts,
 )
+from .devices import OperatorLocked, check_operator_pin
+from .history import InvalidCursor, history_page
+from . import metrics, services
+from .jobs import enqueue
+from .outbox import ack, consumer_position, read_feed
+from .purge import mark_machine_deleted, mark_tool_type_deleted
+from .routers import replica_ok
+from .shifts import current_shift
 from .serializers import (
-    MachineDashboardSerializer,
-    MachineDetailSerializer,
-    MachineWithToolTypesSerializer,
     MachineSerializer,
     CreateToolChangeSerializer,
     ToolChangeBatchSerializer,
@@ -33,6 +60,20 @@ from .serializers import (
     DailyProductionSerializer,
     CreateWorkSessionSerializer,
     WorkSessionSerializer,
+    MachineHistoryQuerySerializer,
+    PayrollSummaryQuerySerializer,
+    ShiftSerializer,
+    ShiftSummaryQuerySerializer,
+    StockAlertQuerySerializer,
+    MaterialLotsQuerySerializer,
+    UserDirectoryQuerySerializer,
+    SearchQuerySerializer,
+    ChangeFeedQuerySerializer,
+    ChangeFeedAckSerializer,
+    JobSerializer,
+    CreateJobSerializer,
+    JobListQuerySerializer,
+    DeviceOperatorSerializer,
     CreateMachineSerializer,
     CreateToolTypeAdminSerializer,
     ToolTypeSerializer,
@@ -46,6 +87,18 @@ from .serializers import (
     AdvanceSerializer,
     CreateAdvanceSerializer,
 )
+from .throttling import DeviceSwitchThrottle, LoginIPThrottle, LoginUsernameThrottle, WriteThrottle
+
+
+def _line_id(request):
+    """?line=<id>; without it, the line of the requesting tablet (device key), else None (all lines)."""
+    raw = request.query_params.get("line")
+    if not raw:
+        return request.auth.line_id if isinstance(request.auth, DeviceToken) else None
+    try:
+        return int(raw)
+    except ValueError:
+        raise ParseError("Geçersiz hat")
 
 
 @api_view(["GET"])
@@ -68,135 +121,45 @@ def health_check(request):
         }, status=503)
 
 
-@api_view(["GET"])
-def dashboard_data(request):
-    today = timezone.localdate()
-
-    machines = Machine.objects.filter(is_active=True).order_by("order_in_line")
-
-    machine_cards = []
-
-    # Prefetch to reduce queries
-    batch_qs = (
-        ToolChangeBatch.objects
-        .filter(machine__in=machines)
-        .order_by("-timestamp")
+def metrics_view(request):
+    """
+    Prometheus text format. Scrapers send `Authorization: Bearer <METRICS_TOKEN>`;
+    admins can also open it with their session.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    allowed = (token and constant_time_compare(header, f"Bearer {token}")) or (
+        request.user.is_staff or request.user.is_superuser
     )
-    last_batch_map = {}
-    for b in batch_qs.select_related("machine").prefetch_related("items", "items__tool_type"):
-        if b.machine_id not in last_batch_map:
-            last_batch_map[b.machine_id] = b
-
-    dp_today_map = {dp.machine_id: dp for dp in DailyProduction.objects.filter(machine__in=machines, date=today)}
-    last_sessions_map = {}
-    for s in WorkSession.objects.filter(machine__in=machines).order_by("-end_time"):
-        if s.machine_id not in last_sessions_map:
-            last_sessions_map[s.machine_id] = s
-
-    for m in machines:
-        last_batch = last_batch_map.get(m.id)
-
-        if last_batch:
-            item_names = [item.tool_type.name for item in last_batch.items.all()]
-            last_change_teams = " + ".join(item_names)
-            last_counter = last_batch.current_counter
-            last_change_time = last_batch.timestamp
-            last_change_user = last_batch.changed_by.username if last_batch.changed_by else ""
-        else:
-            last_change_teams = ""
-            last_counter = None
-            last_change_time = None
-            last_change_user = ""
-
-        dp = dp_today_map.get(m.id)
-        today_total = dp.total_count if dp else None
-
-        last_session = last_sessions_map.get(m.id)
-        if last_session:
-            last_session_user = last_session.user.username
-            last_session_range = f"{last_session.start_time.strftime('%H:%M')}–{last_session.end_time.strftime('%H:%M')}"
-        else:
-            last_session_user = ""
-            last_session_range = ""
-
-        machine_cards.append({
-            "machine_id": m.id,
-            "machine_name": m.name,
-            "machine_short_name": m.short_name,
-            "last_counter": last_counter,
-            "last_change_teams": last_change_teams,
-            "last_change_time": last_change_time,
-            "last_change_user": last_change_user,
-            "today_total": today_total,
-            "last_session_user": last_session_user,
-            "last_session_range": last_session_range,
-        })
+    if not allowed:
+        return JsonResponse({"detail": "Yetki yok"}, status=403)
+    if not metrics.ENABLED:
+        return JsonResponse({"detail": "prometheus-client kurulu değil"}, status=503)
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
-    # Get material summary by grouping entries by material type
-    from django.db.models import Sum, Count
-    
-    material_types = MaterialType.objects.filter(is_active=True)
-    material_summary = []
-    
-    for mat_type in material_types:
-        entries = MaterialEntry.objects.filter(material_type=mat_type)
-        if not entries.exists():
-            continue
-            
-        total_boxes = entries.aggregate(Sum('boxes_count'))['boxes_count__sum'] or 0
-        
-        # Calculate total units (units_per_box is now always set)
-        total_units = sum(entry.boxes_count * entry.units_per_box for entry in entries)
-        
-        # Get latest entry for additional info
-        latest_entry = entries.order_by('-created_at').first()
-        
-        material_summary.append({
-            "material_id": mat_type.id,
-            "material_name": mat_type.name,
-            "material_code": mat_type.code or "",
-            "total_boxes": total_boxes,
-            "total_units": total_units,
-            "entry_count": entries.count(),
-            "last_updated": latest_entry.created_at if latest_entry else None,
-            "last_updated_by": latest_entry.created_by.username if latest_entry and latest_entry.created_by else "—",
-        })
-    
-    # Sort by last updated (most recent first)
-    material_summary.sort(key=lambda x: x['last_updated'] if x['last_updated'] else timezone.datetime.min.replace(tzinfo=timezone.utc), reverse=True)
-    
-    response_data = {
-        "machines": machine_cards,
-        "material_summary": material_summary
-    }
 
-    return Response(response_data)
+@replica_ok
+@api_view(["GET"])
+def dashboard_data(request):
+    line_id = _line_id(request)
+    since = request.query_params.get("since")
+    if since is None:
+        return Response(build_dashboard(line_id=line_id))
+    try:
+        since = int(since)
+    except ValueError:
+        return Response({"detail": "Geçersiz sürüm"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(build_dashboard_delta(since, line_id=line_id))
 
 
 @api_view(["GET"])
 def whoami(request):
-    user = request.user if request.user and request.user.is_authenticated else None
-    if user:
-        return Response({
-            "is_authenticated": True,
-            "id": user.id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "is_admin": bool(user.is_staff or user.is_superuser),
-        })
-    return Response({
-        "is_authenticated": False,
-        "id": None,
-        "username": "anonymous",
-        "first_name": "",
-        "last_name": "",
-        "is_admin": False,
-    })
+    return Response(build_whoami(request.user))
 
 
 @csrf_exempt
 @api_view(["POST"])
+@throttle_classes([LoginIPThrottle, LoginUsernameThrottle])
 def login_view(request):
     username = request.data.get("username")
     password = request.data.get("password")
@@ -208,6 +171,43 @@ def login_view(request):
     return Response({"detail": "Geçersiz kullanıcı adı veya şifre"}, status=401)
 
 
+@api_view(["POST", "DELETE"])
+@throttle_classes([DeviceSwitchThrottle])
+def device_operator(request):
+    """
+    Switch the operator on a shop-floor tablet (device key auth only).
+    POST {user_id, pin} sets the operator; DELETE clears it at the end of a shift.
+    """
+    device = request.auth
+    if not isinstance(device, DeviceToken):
+        return Response({"detail": "Yalnızca cihaz anahtarıyla kullanılabilir"}, status=403)
+
+    if request.method == "DELETE":
+        device.current_user = None
+        device.save(update_fields=["current_user"])
+        return Response(status=204)
+
+    serializer = DeviceOperatorSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    # Yönetici hesapları tablete geçemez: PIN'i tahmin edilen tablet yönetici yetkisi almasın
+    user = User.objects.filter(
+        id=serializer.validated_data["user_id"], is_active=True, is_staff=False, is_superuser=False
+    ).first()
+    try:
+        valid = user is not None and check_operator_pin(user.id, serializer.validated_data["pin"])
+    except OperatorLocked as locked:
+        wait = max(int((locked.until - timezone.now()).total_seconds()), 1)
+        response = Response({"detail": "Çok fazla hatalı PIN denemesi, daha sonra tekrar deneyin"}, status=429)
+        response["Retry-After"] = str(wait)
+        return response
+    if not valid:
+        return Response({"detail": "Geçersiz kullanıcı veya PIN"}, status=401)
+
+    device.current_user = user
+    device.save(update_fields=["current_user"])
+    return Response({"device": device.name, **build_whoami(user)})
+
+
 @api_view(["POST"])
 def logout_view(request):
     if request.user.is_authenticated:
@@ -215,147 +215,146 @@ def logout_view(request):
     return Response({"detail": "ok"})
 
 
+@replica_ok
 @api_view(["GET"])
 def machines_list(request):
-    machines = Machine.objects.filter(is_active=True).order_by("order_in_line").prefetch_related("tool_types")
-    return Response(MachineWithToolTypesSerializer(machines, many=True).data)
+    return Response(build_machines(_line_id(request)))
+
+
+@replica_ok
+@api_view(["GET"])
+def lines_list(request):
+    """Active plants with their active lines"""
+    return Response(build_lines())
+
+@replica_ok
+@api_view(["GET"])
+def shifts_list(request):
+    """Active shifts and the shift running now (null if none)"""
+    shifts = Shift.objects.filter(is_active=True)
+    return Response({"current": current_shift(), "results": ShiftSerializer(shifts, many=True).data})
+
 
+@replica_ok
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def shift_summary(request):
+    """
+    Per-shift production, tool change and work session totals per machine.
+    ?start=&end= (YYYY-MM-DD, shift dates, inclusive; default last 7 days), ?machine_id=, ?line=
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response({"detail": "Yetki yok"}, status=403)
+    params = ShiftSummaryQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    return Response(build_shift_summary(data.get("start"), data.get("end"), _line_id(request), data.get("machine_id")))
+
+
+def _actor(request):
+    return request.user if request.user and request.user.is_authenticated else None
+
+
+# Yazma endpoint'leri: doğrulama burada, transaction ve kayıtlar services.py'de
 @api_view(["POST"])
+@throttle_classes([WriteThrottle])
 def create_tool_change(request):
     serializer = CreateToolChangeSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-
-    machine = get_object_or_404(Machine, id=serializer.validated_data["machine_id"])
-    tool_types = list(
-        ToolType.objects.filter(id__in=serializer.validated_data["tool_type_ids"], machine=machine)
-    )
-    if not tool_types:
+    data = serializer.validated_data
+    try:
+        batch = services.create_tool_change(
+            _actor(request), data["machine_id"], data["tool_type_ids"],
+            current_counter=data.get("current_counter"), note=data.get("note", ""),
+        )
+    except services.NoValidToolTypes:
         return Response({"detail": "Geçerli takım seçilmedi."}, status=status.HTTP_400_BAD_REQUEST)
-
-    batch = ToolChangeBatch.objects.create(
-        machine=machine,
-        changed_by=request.user if request.user and request.user.is_authenticated else None,
-        current_counter=serializer.validated_data.get("current_counter"),
-        note=serializer.validated_data.get("note", ""),
-    )
-    ToolChangeBatchItem.objects.bulk_create([
-        ToolChangeBatchItem(batch=batch, tool_type=tt) for tt in tool_types
-    ])
-
-    # Log activity
-    ActivityLog.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        action="tool_change",
-        machine=machine,
-        details=f"tools={[tt.name for tt in tool_types]} counter={serializer.validated_data.get('current_counter')}"
-    )
-
     return Response(ToolChangeBatchSerializer(batch).data, status=status.HTTP_201_CREATED)
 
 
 @api_view(["POST"])
+@throttle_classes([WriteThrottle])
 def create_daily_production(request):
     serializer = CreateDailyProductionSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-
-    machine = get_object_or_404(Machine, id=serializer.validated_data["machine_id"])
-    date = serializer.validated_data.get("date") or timezone.localdate()
-    total_count = serializer.validated_data["total_count"]
-
-    # Değişen davranış: her çağrıda yeni kayıt oluştur (kümülatif log)
-    dp = DailyProduction.objects.create(
-        machine=machine,
-        date=date,
-        total_count=total_count,
-        recorded_by=request.user if request.user and request.user.is_authenticated else None,
-    )
-    ActivityLog.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        action="daily_production",
-        machine=machine,
-        details=f"date={date} count={total_count} (incremental)"
-    )
+    data = serializer.validated_data
+    dp = services.create_daily_production(_actor(request), data["machine_id"], data["total_count"], date=data.get("date"))
     return Response(DailyProductionSerializer(dp).data, status=status.HTTP_201_CREATED)
 
 
 @api_view(["POST"])
+@throttle_classes([WriteThrottle])
 def create_work_session(request):
     serializer = CreateWorkSessionSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-
-    user = get_object_or_404(User, id=serializer.validated_data["user_id"])
-    machine = get_object_or_404(Machine, id=serializer.validated_data["machine_id"])
-
-    ws = WorkSession.objects.create(
-        user=user,
-        machine=machine,
-        start_time=serializer.validated_data["start_time"],
-        end_time=serializer.validated_data["end_time"],
-        produced_count=serializer.validated_data.get("produced_count"),
-        note=serializer.validated_data.get("note", ""),
-    )
-    ActivityLog.objects.create(
-        user=user,
-        action="work_session",
-        machine=machine,
-        details=f"produced={serializer.validated_data.get('produced_count')}"
+    data = serializer.validated_data
+    ws = services.create_work_session(
+        data["user_id"], data["machine_id"], data["start_time"], data["end_time"],
+        produced_count=data.get("produced_count"), note=data.get("note", ""),
     )
     return Response(WorkSessionSerializer(ws).data, status=status.HTTP_201_CREATED)
 
 
+@replica_ok
 @api_view(["GET"])
 def machine_detail(request, machine_id: int):
-    machine = get_object_or_404(Machine, id=machine_id)
-    today = timezone.localdate()
-
-    last_batches = list(
-        ToolChangeBatch.objects.filter(machine=machine).order_by("-timestamp").prefetch_related("items", "items__tool_type")[:10]
-    )
-    dp_today = DailyProduction.objects.filter(machine=machine, date=today).first()
-    recent_daily = list(
-        DailyProduction.objects.filter(machine=machine).order_by("-date")[:14]
-    )
-    recent_sessions = list(
-        WorkSession.objects.filter(machine=machine).order_by("-end_time")[:10]
-    )
-
-    payload = {
-        "machine": machine,
-        "tool_types": list(machine.tool_types.filter(is_active=True)),
-        "last_batches": last_batches,
-        "today_total": dp_today.total_count if dp_today else None,
-        "recent_daily": recent_daily,
-        "recent_sessions": recent_sessions,
-    }
-    serializer = MachineDetailSerializer(payload)
-    return Response(serializer.data)
+    machine = get_object_or_404(Machine, id=machine_id, deleted_at__isnull=True)
+    return Response(build_machine_detail(machine))
 
 
+@replica_ok
+@api_view(["GET"])
+def machine_history(request, machine_id: int):
+    """
+    Paged machine history for one section (batches / daily / sessions).
+    ?start=&end= (YYYY-MM-DD, inclusive), ?limit= (max 100), ?cursor= from the previous page.
+    """
+    params = MachineHistoryQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    get_object_or_404(Machine, id=machine_id, deleted_at__isnull=True)
+    try:
+        page = history_page(
+            machine_id,
+            data["section"],
+            data["limit"],
+            cursor=data.get("cursor"),
+            start=data.get("start"),
+            end=data.get("end"),
+        )
+    except InvalidCursor:
+        return Response({"detail": "Geçersiz cursor"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"section": data["section"], **page})
+
+
+@replica_ok
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def admin_activity_logs(request):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
-    logs = ActivityLog.objects.all()[:200]
-    from .serializers import ActivityLogSerializer
-    return Response(ActivityLogSerializer(logs, many=True).data)
+    return Response(build_activity_logs(_line_id(request)))
 
 
 # Material endpoints
+@replica_ok
 @api_view(["GET"])
 def material_types(request):
-    types = MaterialType.objects.filter(is_active=True).order_by("name")
+    types = active_material_types(_line_id(request)).order_by("name")
     return Response(MaterialTypeSerializer(types, many=True).data)
 
 
+@replica_ok
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def material_stock_summary(request):
     # compute boxes in - out per type
     data = []
-    types = MaterialType.objects.filter(is_active=True)
-    entries = MaterialEntry.objects.values("material_type").annotate(total=models.Sum("boxes_count"))
-    shipments = MaterialShipment.objects.values("material_type").annotate(total=models.Sum("boxes_count"))
+    types = list(active_material_types(_line_id(request)))
+    # Yalnızca hattın (ve ortak) malzemelerinin hareketleri toplanır; ortak malzemenin stoğu tüm hatlarındır
+    type_ids = [t.id for t in types]
+    entries = MaterialEntry.objects.filter(material_type__in=type_ids).values("material_type").annotate(total=models.Sum("boxes_count"))
+    shipments = MaterialShipment.objects.filter(material_type__in=type_ids).values("material_type").annotate(total=models.Sum("boxes_count"))
     entry_map = {e["material_type"]: e["total"] for e in entries}
     ship_map = {s["material_type"]: s["total"] for s in shipments}
     for t in types:
@@ -366,86 +365,72 @@ def material_stock_summary(request):
             "in_boxes": int(entry_map.get(t.id, 0) or 0),
             "out_boxes": int(ship_map.get(t.id, 0) or 0),
             "stock_boxes": int(entry_map.get(t.id, 0) or 0) - int(ship_map.get(t.id, 0) or 0),
+            "reorder_level": t.reorder_level,
         })
     return Response(data)
 
 
+@replica_ok
+@api_view(["GET"])
+def material_stock_alerts(request):
+    """Low-stock alerts (see stock.py). ?status=open (default) | all, ?line="""
+    params = StockAlertQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    return Response(build_stock_alerts(_line_id(request), params.validated_data["status"]))
+
+
+@replica_ok
 @api_view(["GET"])
 def material_detail(request, material_id: int):
     """Material detay sayfası - tüm giriş ve çıkışları gösterir"""
     material = get_object_or_404(MaterialType, id=material_id)
-    
-    # Get all entries and shipments
-    entries = MaterialEntry.objects.filter(material_type=material).select_related("created_by").order_by("-created_at")[:50]
-    shipments = MaterialShipment.objects.filter(material_type=material).select_related("created_by").order_by("-created_at")[:50]
-    
-    # Calculate totals
-    total_entries = MaterialEntry.objects.filter(material_type=material)
-    total_shipments = MaterialShipment.objects.filter(material_type=material)
-    
-    total_boxes_in = sum(e.boxes_count for e in total_entries)
-    total_units_in = sum(e.boxes_count * e.units_per_box for e in total_entries)
-    
-    total_boxes_out = sum(s.boxes_count for s in total_shipments)
-    total_units_out = sum(s.boxes_count * s.units_per_box for s in total_shipments)
-    
-    stock_boxes = total_boxes_in - total_boxes_out
-    stock_units = total_units_in - total_units_out
-    
-    return Response({
-        "material": MaterialTypeSerializer(material).data,
-        "entries": MaterialEntrySerializer(entries, many=True).data,
-        "shipments": MaterialShipmentSerializer(shipments, many=True).data,
-        "summary": {
-            "total_boxes_in": total_boxes_in,
-            "total_units_in": total_units_in,
-            "total_boxes_out": total_boxes_out,
-            "total_units_out": total_units_out,
-            "stock_boxes": stock_boxes,
-            "stock_units": stock_units,
-        }
-    })
+    return Response(build_material_detail(material))
+
+
+@replica_ok
+@api_view(["GET"])
+def material_lots(request, material_id: int):
+    """Open lots of a material, oldest first (FIFO). ?after=<next_after>&limit= (max 200)"""
+    params = MaterialLotsQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    get_object_or_404(MaterialType.objects.only("id"), id=material_id)
+    return Response(build_material_lots(material_id, data["after"], data["limit"]))
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
 def create_material_entry(request):
     serializer = CreateMaterialEntrySerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    mt = get_object_or_404(MaterialType, id=serializer.validated_data["material_type_id"]) 
-    entry = MaterialEntry.objects.create(
-        material_type=mt,
-        boxes_count=serializer.validated_data["boxes_count"],
-        units_per_box=serializer.validated_data.get("units_per_box"),
-        created_by=request.user if request.user.is_authenticated else None,
+    data = serializer.validated_data
+    entry = services.create_material_entry(
+        request.user, data["material_type_id"], data["boxes_count"], data.get("units_per_box"),
     )
-    ActivityLog.objects.create(user=request.user, action="work_session", machine=None, details=f"material_in {mt.name} +{entry.boxes_count} kutu")
     return Response(MaterialEntrySerializer(entry).data, status=201)
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
 def create_material_shipment(request):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
     serializer = CreateMaterialShipmentSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    mt = get_object_or_404(MaterialType, id=serializer.validated_data["material_type_id"]) 
-    ship = MaterialShipment.objects.create(
-        material_type=mt,
-        boxes_count=serializer.validated_data["boxes_count"],
-        units_per_box=serializer.validated_data["units_per_box"],
-        note=serializer.validated_data.get("note", ""),
-        created_by=request.user,
+    data = serializer.validated_data
+    ship = services.create_material_shipment(
+        request.user, data["material_type_id"], data["boxes_count"], data["units_per_box"], note=data.get("note", ""),
     )
-    total_units = ship.boxes_count * ship.units_per_box
-    ActivityLog.objects.create(user=request.user, action="work_session", machine=None, details=f"material_out {mt.name} -{ship.boxes_count} kutu ({total_units} adet)")
     return Response(MaterialShipmentSerializer(ship).data, status=201)
 
 
 # Admin-only endpoints
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
+@transaction.atomic
 def admin_create_machine(request):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
@@ -458,20 +443,22 @@ def admin_create_machine(request):
         order_in_line=data["order_in_line"],
         location=data.get("location", ""),
         is_active=data.get("is_active", True),
+        line_id=data.get("line_id"),
     )
     return Response(MachineSerializer(m).data, status=201)
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def admin_update_machine(request, machine_id: int):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
-    m = get_object_or_404(Machine, id=machine_id)
+    m = get_object_or_404(Machine, id=machine_id, deleted_at__isnull=True)
     serializer = CreateMachineSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     data = serializer.validated_data
-    for field in ["name", "short_name", "order_in_line", "location", "is_active"]:
+    for field in ["name", "short_name", "order_in_line", "location", "is_active", "line_id"]:
         setattr(m, field, data.get(field, getattr(m, field)))
     m.save()
     return Response(MachineSerializer(m).data)
@@ -479,35 +466,42 @@ def admin_update_machine(request, machine_id: int):
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def admin_delete_machine(request, machine_id: int):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
-    m = get_object_or_404(Machine, id=machine_id)
-    m.delete()
-    return Response(status=204)
+    m = get_object_or_404(Machine, id=machine_id, deleted_at__isnull=True)
+    # Makine hemen pasif olur; geçmişi arka planda parça parça silinir (bkz. purge.py)
+    mark_machine_deleted(m)
+    job = enqueue("purge_machine", {"machine_id": m.id}, user=request.user)
+    return Response({"job_id": job.id}, status=202)
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
+@transaction.atomic
 def admin_create_tooltype(request):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
     serializer = CreateToolTypeAdminSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
     data = serializer.validated_data
-    machine = get_object_or_404(Machine, id=data["machine_id"]) 
+    machine = get_object_or_404(Machine, id=data["machine_id"], deleted_at__isnull=True)
     tt = ToolType.objects.create(machine=machine, name=data["name"], is_active=data.get("is_active", True))
     return Response(ToolTypeSerializer(tt).data, status=201)
 
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def admin_delete_tooltype(request, tooltype_id: int):
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
-    tt = get_object_or_404(ToolType, id=tooltype_id)
-    tt.delete()
-    return Response(status=204)
+    tt = get_object_or_404(ToolType, id=tooltype_id, deleted_at__isnull=True)
+    mark_tool_type_deleted(tt)
+    job = enqueue("purge_tool_type", {"tool_type_id": tt.id}, user=request.user)
+    return Response({"job_id": job.id}, status=202)
 
 
 # Personnel tracking endpoints
@@ -519,23 +513,12 @@ def personnel_absences(request):
     - Admins see all absences
     - Regular users see only their own
     """
-    user_id = request.query_params.get('user_id')
-    
-    if request.user.is_staff or request.user.is_superuser:
-        # Admin can see all or filter by user
-        if user_id:
-            absences = Absence.objects.filter(user_id=user_id).select_related("user", "recorded_by")
-        else:
-            absences = Absence.objects.all().select_related("user", "recorded_by")
-    else:
-        # Regular users only see their own
-        absences = Absence.objects.filter(user=request.user).select_related("user", "recorded_by")
-    
-    return Response(AbsenceSerializer(absences[:100], many=True).data)
+    return Response(build_absences(request.user, request.query_params.get('user_id')))
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
 def create_absence(request):
     """Create absence record. Only admins can create."""
     if not (request.user.is_staff or request.user.is_superuser):
@@ -543,29 +526,16 @@ def create_absence(request):
     
     serializer = CreateAbsenceSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    
-    user = get_object_or_404(User, id=serializer.validated_data["user_id"])
-    
-    absence = Absence.objects.create(
-        user=user,
-        absence_date=serializer.validated_data["absence_date"],
-        reason=serializer.validated_data.get("reason", ""),
-        note=serializer.validated_data.get("note", ""),
-        recorded_by=request.user
-    )
-    
-    ActivityLog.objects.create(
-        user=request.user,
-        action="work_session",
-        machine=None,
-        details=f"absence_recorded {user.username} {absence.absence_date}"
+    data = serializer.validated_data
+    absence = services.create_absence(
+        request.user, data["user_id"], data["absence_date"], reason=data.get("reason", ""), note=data.get("note", ""),
     )
-    
     return Response(AbsenceSerializer(absence).data, status=201)
 
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def delete_absence(request, absence_id: int):
     """Delete absence record. Only admins can delete."""
     if not (request.user.is_staff or request.user.is_superuser):
@@ -584,23 +554,12 @@ def personnel_advances(request):
     - Admins see all advances
     - Regular users see only their own
     """
-    user_id = request.query_params.get('user_id')
-    
-    if request.user.is_staff or request.user.is_superuser:
-        # Admin can see all or filter by user
-        if user_id:
-            advances = Advance.objects.filter(user_id=user_id).select_related("user", "recorded_by")
-        else:
-            advances = Advance.objects.all().select_related("user", "recorded_by")
-    else:
-        # Regular users only see their own
-        advances = Advance.objects.filter(user=request.user).select_related("user", "recorded_by")
-    
-    return Response(AdvanceSerializer(advances[:100], many=True).data)
+    return Response(build_advances(request.user, request.query_params.get('user_id')))
 
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([WriteThrottle])
 def create_advance(request):
     """Create advance record. Only admins can create."""
     if not (request.user.is_staff or request.user.is_superuser):
@@ -608,29 +567,14 @@ def create_advance(request):
     
     serializer = CreateAdvanceSerializer(data=request.data)
     serializer.is_valid(raise_exception=True)
-    
-    user = get_object_or_404(User, id=serializer.validated_data["user_id"])
-    
-    advance = Advance.objects.create(
-        user=user,
-        amount=serializer.validated_data["amount"],
-        date=serializer.validated_data["date"],
-        note=serializer.validated_data.get("note", ""),
-        recorded_by=request.user
-    )
-    
-    ActivityLog.objects.create(
-        user=request.user,
-        action="work_session",
-        machine=None,
-        details=f"advance_recorded {user.username} {advance.amount} TL"
-    )
-    
+    data = serializer.validated_data
+    advance = services.create_advance(request.user, data["user_id"], data["amount"], data["date"], note=data.get("note", ""))
     return Response(AdvanceSerializer(advance).data, status=201)
 
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
+@transaction.atomic
 def delete_advance(request, advance_id: int):
     """Delete advance record. Only admins can delete."""
     if not (request.user.is_staff or request.user.is_superuser):
@@ -641,21 +585,117 @@ def delete_advance(request, advance_id: int):
     return Response(status=204)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def payroll_summary(request):
+    """
+    Monthly payroll totals (sum of advances, count of absence days) per user.
+    - Admins see all users (?user_id= to filter)
+    - Regular users see only their own
+    """
+    params = PayrollSummaryQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    return Response(build_payroll_summary(request.user, data.get("start"), data.get("end"), data.get("user_id")))
+
+
+@replica_ok
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def personnel_users(request):
-    """Get list of all users for admin dropdowns"""
+    """
+    Searchable user directory for admin dropdowns.
+    ?q= (words matched against username / first / last name), ?limit= (max 200), ?after= from next_cursor
+    """
     if not (request.user.is_staff or request.user.is_superuser):
         return Response({"detail": "Yetki yok"}, status=403)
     
-    users = User.objects.all().order_by('username')
-    return Response([
-        {
-            "id": u.id,
-            "username": u.username,
-            "first_name": u.first_name,
-            "last_name": u.last_name,
-            "full_name": f"{u.first_name} {u.last_name}".strip() or u.username
-        }
-        for u in users
-    ])
+    params = UserDirectoryQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    return Response(build_personnel_users(data["q"], data.get("after"), data["limit"]))
+
+
+@replica_ok
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_notes(request):
+    """
+    Ranked full-text search over notes and activity details (see search.py).
+    ?q=, ?kind=tool_change,work_session,... , ?offset= from next_offset, ?limit= (max 50).
+    Non-admins only see machine/material notes and their own absences/advances.
+    """
+    params = SearchQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    return Response(build_search(request.user, data["q"], data["kind"], data["offset"], data["limit"]))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def change_feed(request):
+    """
+    Outbox change feed for integrations (MES/ERP), oldest first.
+    Read from the primary: a lagging replica would hand out a cursor past unseen events.
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response({"detail": "Yetki yok"}, status=403)
+
+    params = ChangeFeedQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    after = data.get("after")
+    if after is None:
+        after = consumer_position(data["consumer"]) if data.get("consumer") else 0
+    events, next_after, has_more = read_feed(after, data["limit"], data["topics"])
+    return Response({"events": events, "next_after": next_after, "has_more": has_more})
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def change_feed_ack(request):
+    """Store a consumer's position (last processed event id); it only moves forward."""
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response({"detail": "Yetki yok"}, status=403)
+
+    serializer = ChangeFeedAckSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    return Response({"consumer": data["consumer"], "position": ack(data["consumer"], data["position"])})
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def jobs_list(request):
+    """
+    GET: recent background jobs (?status=, ?kind=, ?limit=)
+    POST: enqueue a job ({"kind", "params"}); returns 202, poll /api/jobs/<id>/ for progress
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return Response({"detail": "Yetki yok"}, status=403)
+
+    if request.method == "POST":
+        serializer = CreateJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = enqueue(serializer.validated_data["kind"], serializer.validated_data["params"], user=request.user)
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    params = JobListQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    data = params.validated_data
+    jobs = Job.objects.all()
+    if data.get("status"):
+        jobs = jobs.filter(status=data["status"])
+    if data.get("kind"):
+        jobs = jobs.filter(kind=data["kind"])
+    return Response(JobSerializer(jobs[:data["limit"]], many=True).data)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def job_detail(request, job_id: int):
+    """Status and progress of a job (its creator or admins)."""
+    job = get_object_or_404(Job, id=job_id)
+    if job.created_by_id != request.user.id and not (request.user.is_staff or request.user.is_superuser):
+        return Response({"detail": "Yetki yok"}, status=403)
+    return Response(JobSerializer(job).data)
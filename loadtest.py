@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+"""
+AYD Robotic load test: mixed workload against a running (or locally started) server.
+
+Scenarios, modeled on the shop floor:
+  tablets   post daily-production every --tablet-interval seconds, a tool change every --tool-change-every posts
+  displays  poll /api/dashboard/ every --display-interval seconds (full load first, then ?since= deltas, like index.html)
+  admins    read activity logs, page a machine's history and export the change feed (/api/feed/) in 5000-event pages
+
+Reports requests/s, p50/p95/p99 latency and error rate per endpoint. Standard library only.
+
+    python manage.py seed_production && python manage.py createsuperuser      # once, in backend/
+    python loadtest.py --serve --tablets 20 --displays 10 --admins 2 --duration 120 --user admin --password ...
+
+--serve starts gunicorn from backend/ like start.sh (THROTTLE_WRITE_RATE disabled, since all tablets share one login).
+Against another server pass --url; note that per-user write throttling then applies.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+class HttpError(Exception):
+    pass
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client (Content-Length and chunked bodies)."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.host_header = parts.netloc
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=b""):
+        for attempt in (1, 2):
+            if self.writer is None:
+                await self._connect()
+            try:
+                return await self._exchange(method, path, headers, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Sunucu keep-alive bağlantısını kapatmış olabilir; bir kez yeniden bağlan
+                await self.close()
+                if attempt == 2:
+                    raise
+
+    async def _exchange(self, method, path, headers, body):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host_header}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readuntil(b"\r\n")
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        response_headers = []
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers.append((name.strip().lower(), value.strip()))
+        header_map = dict(response_headers)
+
+        if header_map.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b"\r\n")
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            payload = b"".join(chunks)
+        elif "content-length" in header_map:
+            payload = await self.reader.readexactly(int(header_map["content-length"]))
+        else:
+            payload = await self.reader.read()
+            await self.close()
+        if header_map.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response_headers, payload
+
+
+class Session:
+    """Cookies (session + CSRF) shared by the virtual users of one role."""
+
+    def __init__(self, base_url, forwarded_proto):
+        self.base_url = base_url
+        self.cookies = {}
+        self.forwarded_proto = forwarded_proto
+
+    def headers(self, method):
+        headers = {"Accept": "application/json", "Connection": "keep-alive"}
+        if self.forwarded_proto:
+            # SECURE_SSL_REDIRECT: yerel http sunucusu proxy arkasındaymış gibi
+            headers["X-Forwarded-Proto"] = "https"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if method not in ("GET", "HEAD") and "csrftoken" in self.cookies:
+            headers["X-CSRFToken"] = self.cookies["csrftoken"]
+            headers["Origin"] = ("https://" if self.forwarded_proto else f"{urlsplit(self.base_url).scheme}://") + urlsplit(self.base_url).netloc
+        return headers
+
+    def store_cookies(self, response_headers):
+        for name, value in response_headers:
+            if name == "set-cookie":
+                key, _, rest = value.partition("=")
+                self.cookies[key.strip()] = rest.split(";", 1)[0]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+
+    def add(self, name, seconds, status):
+        if self.recording:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status] += 1
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        if not sorted_values:
+            return 0.0
+        index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+        return sorted_values[index]
+
+    def report(self, duration):
+        rows = []
+        for name in sorted(self.latencies):
+            values = sorted(self.latencies[name])
+            statuses = self.statuses[name]
+            errors = sum(count for status, count in statuses.items() if status == "error" or status >= 400)
+            rows.append({
+                "endpoint": name,
+                "requests": len(values),
+                "rps": len(values) / duration,
+                "error_rate": errors / len(values) if values else 0.0,
+                "p50_ms": self.percentile(values, 50) * 1000,
+                "p95_ms": self.percentile(values, 95) * 1000,
+                "p99_ms": self.percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000 if values else 0.0,
+                "statuses": {str(k): v for k, v in sorted(statuses.items(), key=lambda item: str(item[0]))},
+            })
+        return rows
+
+
+class VirtualUser:
+    def __init__(self, session, stats, url):
+        self.session = session
+        self.stats = stats
+        self.conn = Connection(url)
+
+    async def call(self, name, method, path, data=None):
+        body = json.dumps(data).encode() if data is not None else b""
+        headers = self.session.headers(method)
+        if data is not None:
+            headers["Content-Type"] = "application/json"
+        start = time.perf_counter()
+        try:
+            status, response_headers, payload = await self.conn.request(method, path, headers, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.stats.add(name, time.perf_counter() - start, "error")
+            await self.conn.close()
+            return None, None
+        self.stats.add(name, time.perf_counter() - start, status)
+        self.session.store_cookies(response_headers)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+async def login(url, session, username, password):
+    user = VirtualUser(session, Stats(), url)
+    status, _ = await user.call("login", "POST", "/api/login/", {"username": username, "password": password})
+    await user.conn.close()
+    if status != 200:
+        raise HttpError(f"login as {username!r} failed with status {status}")
+
+
+async def fetch_fixtures(url, session):
+    """Active machines with their tool type ids (what a tablet offers)."""
+    user = VirtualUser(session, Stats(), url)
+    _, machines = await user.call("setup", "GET", "/api/machines/")
+    fixtures = []
+    for machine in machines or []:
+        _, detail = await user.call("setup", "GET", f"/api/machines/{machine['id']}/")
+        fixtures.append((machine["id"], [tool["id"] for tool in (detail or {}).get("tool_types", [])]))
+    await user.conn.close()
+    if not fixtures:
+        raise HttpError("no active machines; run `python manage.py seed_production` first")
+    return fixtures
+
+
+async def jittered_sleep(interval, deadline):
+    await asyncio.sleep(min(max(deadline - time.monotonic(), 0), interval * random.uniform(0.8, 1.2)))
+
+
+async def tablet(user, fixtures, args, deadline):
+    machine_id, tool_ids = random.choice(fixtures)
+    counter = random.randint(1000, 5000)
+    posts = 0
+    await jittered_sleep(args.tablet_interval, deadline)
+    while time.monotonic() < deadline:
+        counter += random.randint(5, 50)
+        await user.call("POST daily-production", "POST", "/api/daily-production/",
+                        {"machine_id": machine_id, "total_count": counter})
+        posts += 1
+        if tool_ids and posts % args.tool_change_every == 0:
+            await user.call("POST tool-change", "POST", "/api/tool-change/", {
+                "machine_id": machine_id,
+                "tool_type_ids": random.sample(tool_ids, k=random.randint(1, len(tool_ids))),
+                "current_counter": counter,
+            })
+        await jittered_sleep(args.tablet_interval, deadline)
+
+
+async def display(user, args, deadline):
+    version = None
+    await jittered_sleep(args.display_interval, deadline)
+    while time.monotonic() < deadline:
+        if version is None:
+            _, data = await user.call("GET dashboard (full)", "GET", "/api/dashboard/")
+        else:
+            _, data = await user.call("GET dashboard (delta)", "GET", f"/api/dashboard/?since={version}")
+        if isinstance(data, dict) and "version" in data:
+            version = data["version"]
+        await jittered_sleep(args.display_interval, deadline)
+
+
+async def admin(user, fixtures, args, deadline):
+    feed_after = 0
+    while time.monotonic() < deadline:
+        await user.call("GET activity-logs", "GET", "/api/admin/activity-logs/")
+
+        machine_id, _ = random.choice(fixtures)
+        section = random.choice(("batches", "daily", "sessions"))
+        path = f"/api/machines/{machine_id}/history/?section={section}&limit=50"
+        for _ in range(args.history_pages):
+            _, page = await user.call("GET machine history", "GET", path)
+            cursor = (page or {}).get("next_cursor")
+            if not cursor:
+                break
+            path = f"/api/machines/{machine_id}/history/?section={section}&limit=50&cursor={cursor}"
+
+        # Entegrasyon dışa aktarımı: değişiklik akışını büyük partilerle baştan sona oku
+        for _ in range(args.export_pages):
+            _, feed = await user.call("GET feed (export)", "GET", f"/api/feed/?after={feed_after}&limit=5000")
+            if not isinstance(feed, dict):
+                break
+            feed_after = feed["next_after"]
+            if not feed["has_more"]:
+                break
+        await jittered_sleep(args.admin_interval, deadline)
+
+
+async def run(args):
+    url = args.url.rstrip("/")
+    forwarded = urlsplit(url).scheme == "http"
+    tablet_session, admin_session = Session(url, forwarded), Session(url, forwarded)
+    await login(url, tablet_session, args.tablet_user or args.user, args.tablet_password or args.password)
+    await login(url, admin_session, args.user, args.password)
+    fixtures = await fetch_fixtures(url, admin_session)
+
+    stats = Stats()
+    deadline = time.monotonic() + args.warmup + args.duration
+    users = (
+        [tablet(VirtualUser(tablet_session, stats, url), fixtures, args, deadline) for _ in range(args.tablets)]
+        + [display(VirtualUser(admin_session, stats, url), args, deadline) for _ in range(args.displays)]
+        + [admin(VirtualUser(admin_session, stats, url), fixtures, args, deadline) for _ in range(args.admins)]
+    )
+
+    async def start_recording():
+        await asyncio.sleep(args.warmup)
+        stats.recording = True
+
+    print(f"{args.tablets} tablets, {args.displays} displays, {args.admins} admins -> {url} "
+          f"({args.warmup}s warmup, {args.duration}s measured)", file=sys.stderr)
+    await asyncio.gather(start_recording(), *users)
+    return stats.report(args.duration)
+
+
+def print_report(rows):
+    header = f"{'endpoint':<24}{'requests':>9}{'req/s':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  statuses"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        statuses = " ".join(f"{k}:{v}" for k, v in row["statuses"].items())
+        print(f"{row['endpoint']:<24}{row['requests']:>9}{row['rps']:>9.1f}{row['error_rate']:>7.1%}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}  {statuses}")
+    total = sum(row["requests"] for row in rows)
+    print(f"{'total':<24}{total:>9}{sum(row['rps'] for row in rows):>9.1f}")
+
+
+def start_server(args):
+    backend = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    port = urlsplit(args.url).port or 8000
+    env = {**os.environ, "THROTTLE_WRITE_RATE": "", "PORT": str(port)}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "core.wsgi:application", "--bind", f"127.0.0.1:{port}",
+         "--workers", str(args.workers), "--threads", str(args.threads), "--timeout", "120", "--log-level", "warning"],
+        cwd=backend, env=env,
+    )
+    health = urllib.request.Request(f"{args.url.rstrip('/')}/api/health/", headers={"X-Forwarded-Proto": "https"})
+    for _ in range(100):
+        try:
+            with urllib.request.urlopen(health, timeout=1):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                sys.exit("gunicorn exited during startup")
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("server did not become healthy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--serve", action="store_true", help="start gunicorn from backend/ on --url's port")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers with --serve (start.sh: 4)")
+    parser.add_argument("--threads", type=int, default=2, help="gunicorn threads with --serve (start.sh: 2)")
+    parser.add_argument("--user", required=True, help="admin username (displays and admins)")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--tablet-user", help="tablet username (default: --user)")
+    parser.add_argument("--tablet-password")
+    parser.add_argument("--tablets", type=int, default=10)
+    parser.add_argument("--displays", type=int, default=5)
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--tablet-interval", type=float, default=10.0, help="seconds between a tablet's production posts")
+    parser.add_argument("--tool-change-every", type=int, default=5, help="a tool change every N production posts")
+    parser.add_argument("--display-interval", type=float, default=30.0, help="seconds between dashboard polls (index.html: 30)")
+    parser.add_argument("--admin-interval", type=float, default=15.0)
+    parser.add_argument("--history-pages", type=int, default=3)
+    parser.add_argument("--export-pages", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=60.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds before recording starts")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = start_server(args) if args.serve else None
+    try:
+        rows = asyncio.run(run(args))
+    except HttpError as exc:
+        sys.exit(str(exc))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print_report(rows)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "endpoints": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
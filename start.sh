@@ -20,12 +20,25 @@ python manage.py migrate --noinput
 echo "👤 Creating superuser (if needed)..."
 python manage.py create_superuser || echo "Superuser already exists"
 
+# Prometheus metrics: gunicorn workers share counters through files in this directory
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-multiproc}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Background job worker (jobs.py): purges of deleted machines, payroll closes, rollup rebuilds.
+# railway.toml runs only this script, so the worker starts here unless a separate worker
+# service is deployed (Procfile "worker") and JOB_WORKER=external is set on the web service.
+if [ "${JOB_WORKER:-embedded}" != "external" ]; then
+    echo "⚙️ Starting background job worker..."
+    python manage.py run_jobs --concurrency "${JOB_WORKER_CONCURRENCY:-2}" &
+fi
+
 # Start Gunicorn
 echo "🌐 Starting Gunicorn server..."
 exec gunicorn core.wsgi:application \
     --bind 0.0.0.0:$PORT \
     --workers 4 \
-    --threads 2 \
+    --threads "${WEB_THREADS:-2}" \
     --timeout 120 \
     --log-file - \
     --access-logfile - \